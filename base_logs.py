@@ -0,0 +1,293 @@
+# base_logs.py
+"""
+Base-station log analyzer.
+
+Averages the base position and height over every epoch of each base log
+(UBX NAV-PVT, or the header of a RINEX observation file) and compares the
+result with the base_height_m entered on the reports whose flights used that
+base file (report_flights.drone_base_file_no = file name without extension).
+
+    python base_logs.py /data/base_logs [--workers 8] [--threshold 0.5]
+                        [--field msl|ellipsoid|antenna] [--from 2025-01-01] [--to 2025-03-31]
+                        [--csv flagged.csv]
+
+Files are analyzed in a process pool; the DB is read with one streaming cursor.
+"""
+import os
+import sys
+import csv
+import math
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+import mysql.connector
+
+import ubx_log
+
+logger = logging.getLogger("base_logs")
+
+# ----------------- Config -----------------
+load_dotenv()
+
+MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
+MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+MYSQL_DB   = os.getenv("MYSQL_DB", "tg_staffbot")
+MYSQL_USER = os.getenv("MYSQL_USER", "root")
+MYSQL_PASS = os.getenv("MYSQL_PASS", "")
+
+BASE_HEIGHT_THRESHOLD_M = float(os.getenv("BASE_HEIGHT_THRESHOLD_M", "0.5"))
+
+UBX_EXTS   = (".ubx",)
+RINEX_EXTS = (".obs", ".rnx", ".crx")  # plus RINEX 2 style ".25o"
+
+# WGS84
+WGS84_A  = 6378137.0
+WGS84_F  = 1 / 298.257223563
+WGS84_B  = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+
+def file_key(name: str) -> str:
+    """Normalize a file name / file number for matching: no dir, no extension, lowercase."""
+    base = os.path.basename((name or "").strip())
+    stem, _ = os.path.splitext(base)
+    return (stem or base).lower()
+
+
+def is_rinex(path: str) -> bool:
+    ext = os.path.splitext(path)[1].lower()
+    return ext in RINEX_EXTS or (len(ext) == 4 and ext[1:3].isdigit() and ext[3] == "o")
+
+
+def ecef_to_geodetic(x, y, z):
+    """WGS84 ECEF (m) -> (lat deg, lon deg, ellipsoidal height m). Bowring's method."""
+    x, y, z = np.asarray(x, float), np.asarray(y, float), np.asarray(z, float)
+    ep2 = (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    p = np.hypot(x, y)
+    th = np.arctan2(z * WGS84_A, p * WGS84_B)
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z + ep2 * WGS84_B * np.sin(th) ** 3, p - WGS84_E2 * WGS84_A * np.cos(th) ** 3)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+    h = p / np.cos(lat) - n
+    return np.degrees(lat), np.degrees(lon), h
+
+
+# ----------------- Per-file analysis (runs in worker processes) -----------------
+def _analyze_ubx(path):
+    buf = ubx_log.open_log(path)
+    n = 0
+    sums = np.zeros(4)      # lat, lon, height, hMSL
+    sq_msl = 0.0
+    first = last = None
+    for pvt in ubx_log.read_nav_pvt(buf):
+        # 3D / GNSS+DR fixes with gnssFixOK only
+        ok = np.isin(pvt["fixType"], (3, 4)) & ((pvt["flags"] & 0x01) == 1)
+        pvt = pvt[ok]
+        if not len(pvt):
+            continue
+        lat = pvt["lat"] * 1e-7
+        lon = pvt["lon"] * 1e-7
+        h = pvt["height"] * 1e-3
+        msl = pvt["hMSL"] * 1e-3
+        sums += (lat.sum(), lon.sum(), h.sum(), msl.sum())
+        sq_msl += float((msl * msl).sum())
+        n += len(pvt)
+        ms = ubx_log._epoch_ms(pvt)
+        first = int(ms.min()) if first is None else min(first, int(ms.min()))
+        last = int(ms.max()) if last is None else max(last, int(ms.max()))
+
+    if not n:
+        return {"status": "no_fix", "epochs": 0}
+    lat, lon, h, msl = sums / n
+    std = math.sqrt(max(sq_msl / n - msl * msl, 0.0))
+    return {
+        "status": "ok",
+        "format": "ubx",
+        "epochs": n,
+        "lat": round(float(lat), 8),
+        "lon": round(float(lon), 8),
+        "height_ellipsoid_m": round(float(h), 3),
+        "height_msl_m": round(float(msl), 3),
+        "height_std_m": round(std, 3),
+        "antenna_height_m": None,
+        "first_epoch": ubx_log._iso(first),
+        "last_epoch": ubx_log._iso(last),
+    }
+
+
+def _analyze_rinex(path, chunk=4 * 1024 * 1024):
+    xyz = None
+    antenna_h = None
+    version = None
+    epochs = 0
+    with open(path, "rb") as fh:
+        for raw in fh:
+            line = raw.decode("ascii", "replace").rstrip("\r\n")
+            label = line[60:].strip()
+            if label == "RINEX VERSION / TYPE":
+                version = line[:9].strip()
+            elif label == "APPROX POSITION XYZ":
+                xyz = [float(v) for v in line[:42].split()[:3]]
+            elif label == "ANTENNA: DELTA H/E/N":
+                antenna_h = float(line[:14])
+            elif label == "END OF HEADER":
+                break
+        # RINEX 3 epoch records start with '>' at column 0; count them chunk by chunk.
+        if version and version.startswith("3"):
+            prev = b"\n"
+            while True:
+                block = fh.read(chunk)
+                if not block:
+                    break
+                epochs += (prev + block).count(b"\n>")
+                prev = block[-1:]
+
+    if not xyz or not any(xyz):
+        return {"status": "no_position", "epochs": epochs}
+    lat, lon, h = ecef_to_geodetic(*xyz)
+    return {
+        "status": "ok",
+        "format": f"rinex {version or '?'}",
+        "epochs": epochs,
+        "lat": round(float(lat), 8),
+        "lon": round(float(lon), 8),
+        "height_ellipsoid_m": round(float(h), 3),
+        "height_msl_m": None,  # header position only; no geoid model applied
+        "height_std_m": None,
+        "antenna_height_m": antenna_h,
+        "first_epoch": None,
+        "last_epoch": None,
+    }
+
+
+def analyze_file(path):
+    """Analyze one base log; never raises (errors come back in the result)."""
+    res = {"path": path, "key": file_key(path)}
+    try:
+        res.update(_analyze_rinex(path) if is_rinex(path) else _analyze_ubx(path))
+    except Exception as e:
+        res.update({"status": "error", "error": str(e), "epochs": 0})
+    return res
+
+
+def find_logs(root):
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if name.lower().endswith(UBX_EXTS) or is_rinex(path):
+                yield path
+
+
+def analyze_all(paths, workers=None):
+    """Analyze many logs in a process pool. Returns {file_key: result}."""
+    paths = list(paths)
+    results = {}
+    t0 = time.perf_counter()
+    chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, res in enumerate(pool.map(analyze_file, paths, chunksize=chunksize), start=1):
+            if res["key"] in results:
+                logger.warning("Duplicate base file key %s (%s)", res["key"], res["path"])
+            results[res["key"]] = res
+            if i % 500 == 0:
+                logger.info("Analyzed %s/%s logs", i, len(paths))
+    logger.info("Analyzed %s logs in %.1fs", len(paths), time.perf_counter() - t0)
+    return results
+
+
+# ----------------- Report comparison -----------------
+def measured_height(res, field):
+    if field == "antenna":
+        return res.get("antenna_height_m")
+    if field == "ellipsoid":
+        return res.get("height_ellipsoid_m")
+    return res.get("height_msl_m")
+
+
+def compare_reports(results, field="msl", threshold=BASE_HEIGHT_THRESHOLD_M, date_from=None, date_to=None):
+    """Stream report flights and yield a row per flight whose base file was analyzed."""
+    conn = mysql.connector.connect(
+        host=MYSQL_HOST, port=MYSQL_PORT, database=MYSQL_DB,
+        user=MYSQL_USER, password=MYSQL_PASS,
+    )
+    try:
+        cur = conn.cursor(dictionary=True)  # unbuffered: rows are streamed
+        conds, params = [], []
+        if date_from:
+            conds.append("r.report_date >= %s")
+            params.append(date_from)
+        if date_to:
+            conds.append("r.report_date <= %s")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conds)}" if conds else ""
+        cur.execute(
+            "SELECT r.id AS report_id, r.report_date, r.employee_telegram_id, r.base_height_m, "
+            "rf.drone_base_file_no "
+            "FROM report_flights rf JOIN reports r ON r.id = rf.report_id "
+            f"{where} ORDER BY r.id, rf.id",
+            params,
+        )
+        for row in cur:
+            res = results.get(file_key(row["drone_base_file_no"]))
+            if not res or res.get("status") != "ok":
+                continue
+            measured = measured_height(res, field)
+            if measured is None or row["base_height_m"] is None:
+                continue
+            delta = float(row["base_height_m"]) - float(measured)
+            yield {
+                "report_id": row["report_id"],
+                "report_date": row["report_date"],
+                "employee_telegram_id": row["employee_telegram_id"],
+                "base_file": row["drone_base_file_no"],
+                "entered_m": float(row["base_height_m"]),
+                "measured_m": measured,
+                "delta_m": round(delta, 3),
+                "epochs": res["epochs"],
+                "flagged": abs(delta) > threshold,
+                "path": res["path"],
+            }
+        cur.close()
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Validate report base heights against base-station logs.")
+    ap.add_argument("root", help="directory containing base logs (searched recursively)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--threshold", type=float, default=BASE_HEIGHT_THRESHOLD_M, help="allowed |entered - measured| in metres")
+    ap.add_argument("--field", choices=("msl", "ellipsoid", "antenna"), default="msl",
+                    help="which measured height base_height_m is compared with")
+    ap.add_argument("--from", dest="date_from", help="first report date (inclusive)")
+    ap.add_argument("--to", dest="date_to", help="last report date (inclusive)")
+    ap.add_argument("--csv", default="base_height_flags.csv", help="where flagged reports are written")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    results = analyze_all(find_logs(args.root), workers=args.workers)
+    bad = [r for r in results.values() if r["status"] != "ok"]
+    if bad:
+        logger.warning("%s logs could not be used (no fix / no position / errors)", len(bad))
+
+    checked = flagged = 0
+    fields = ["report_id", "report_date", "employee_telegram_id", "base_file",
+              "entered_m", "measured_m", "delta_m", "epochs", "path"]
+    with open(args.csv, "w", newline="", encoding="utf-8") as fh:
+        w = csv.DictWriter(fh, fieldnames=fields, extrasaction="ignore")
+        w.writeheader()
+        for row in compare_reports(results, args.field, args.threshold, args.date_from, args.date_to):
+            checked += 1
+            if row["flagged"]:
+                flagged += 1
+                w.writerow(row)
+    logger.info("Checked %s flights, flagged %s (|delta| > %.2f m) -> %s", checked, flagged, args.threshold, args.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
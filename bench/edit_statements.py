@@ -0,0 +1,116 @@
+"""
+Statements sent to MySQL by the report_edit writes for typical edits: the
+old full rewrite (UPDATE every column, DELETE all flights, one INSERT per
+flight) vs the diff of dgps_data.report_edit.
+
+No database needed: a recording cursor counts the statements (an executemany
+counts once, it's one multi-row INSERT on the wire) and the rows each would
+write. Child lists, coverage and rollups are skipped by the new path too when
+their inputs didn't change; they aren't counted here.
+
+    python bench/edit_statements.py --flights 6
+"""
+import os
+import sys
+import argparse
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data import report_edit
+
+
+class Recorder:
+    def __init__(self):
+        self.statements, self.rows = 0, 0
+
+    def execute(self, sql, params=()):
+        self.statements += 1
+        self.rows += 1
+
+    def executemany(self, sql, seq):
+        self.statements += 1
+        self.rows += len(seq)
+
+
+def stored(n):
+    report = {
+        "report_date": date(2024, 6, 3), "site_id": 17, "site_name": "Site 0017", "drone_id": 5,
+        "drone_name": "Drone 005", "pilot_name": "P", "copilot_name": "C", "base_height_m": Decimal("12.500"),
+        "dgps_used_json": '["D1"]', "dgps_operators_json": '["O1"]', "grid_numbers_json": '["G1"]',
+        "gcp_points_json": '["P1"]', "remark": "ok", "total_time_min": 20 * n,
+        "total_area_sq_km": Decimal("1.500") * n,
+    }
+    flights = [{"id": 100 + i, "flight_time_min": 20, "area_sq_km": Decimal("1.500"),
+                "uav_rover_file": f"R{i}.ubx", "drone_base_file_no": f"B{i}"} for i in range(n)]
+    return report, flights
+
+
+def submitted(report, flights):
+    """What the edit form posts back for an unchanged report (strings/floats, like request.form)."""
+    values = {k: v for k, v in report.items()}
+    values["report_date"] = report["report_date"].isoformat()
+    values["base_height_m"] = float(report["base_height_m"])
+    form = [{"id": str(f["id"]), "flight_time_min": float(f["flight_time_min"]),
+             "area_sq_km": float(f["area_sq_km"]), "uav_rover_file": f["uav_rover_file"],
+             "drone_base_file_no": f["drone_base_file_no"]} for f in flights]
+    return values, form
+
+
+def scenarios(n):
+    def unchanged(v, f):
+        pass
+
+    def remark(v, f):
+        v["remark"] = "fixed typo"
+
+    def one_time(v, f):
+        f[0]["flight_time_min"] = 25.0
+
+    def add_one(v, f):
+        f.append({"id": None, "flight_time_min": 15.0, "area_sq_km": 1.0,
+                  "uav_rover_file": "Rn.ubx", "drone_base_file_no": "Bn"})
+
+    def drop_one(v, f):
+        f.pop()
+
+    def replace_all(v, f):
+        for x in f:
+            x["id"] = None
+
+    return {"save unchanged": unchanged, "fix remark": remark, "fix one flight time": one_time,
+            "add a flight": add_one, "remove a flight": drop_one, f"replace all {n} flights": replace_all}
+
+
+def full_rewrite(cur, values, form):
+    cur.execute("UPDATE reports SET ... WHERE id = %s", list(values.values()))
+    cur.execute("DELETE FROM report_flights WHERE report_id = %s", (1,))
+    for f in form:
+        cur.execute("INSERT INTO report_flights ...", tuple(f.values()))
+
+
+def diff(cur, report, flights, values, form):
+    touched = report_edit.save_flights(cur, 1, flights, form)
+    report_edit.update_report(cur, 1, report_edit.changed_columns(report, values), touched)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Count the statements of report edits, full rewrite vs diff")
+    ap.add_argument("--flights", type=int, default=6)
+    args = ap.parse_args()
+
+    print(f"{'edit':<26} {'rewrite stmts/rows':>20} {'diff stmts/rows':>17}")
+    for label, change in scenarios(args.flights).items():
+        report, flights = stored(args.flights)
+        values, form = submitted(report, flights)
+        change(values, form)
+        values["total_time_min"] = sum(f["flight_time_min"] for f in form)  # as the route recomputes them
+        values["total_area_sq_km"] = sum(f["area_sq_km"] for f in form)
+        old, new = Recorder(), Recorder()
+        full_rewrite(old, values, form)
+        diff(new, report, flights, values, form)
+        print(f"{label:<26} {old.statements:>12} / {old.rows:<5} {new.statements:>9} / {new.rows:<5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Peak memory of the View Reports Excel export: the old in-memory build
+(fetchall + regular Workbook + BytesIO) vs dgps_data.report_export (write-only
+workbook fed by unbuffered cursors).
+
+Seeds a scratch schema in BENCH_DB (never the live MYSQL_DB) with one manager's
+team and --flights flight rows, then runs each variant in a fresh process and
+prints wall time, peak Python allocations (tracemalloc) and peak RSS:
+
+    python bench/export_memory.py --flights 500000
+    python bench/export_memory.py --skip-seed --flights 500000
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data.config import connect, MYSQL_DB
+
+BENCH_DB = os.getenv("BENCH_DB", "dgps_bench")
+FLIGHTS_PER_REPORT = 5
+EMPLOYEES = 40
+
+SCHEMA = [
+    "DROP TABLE IF EXISTS report_flights",
+    "DROP TABLE IF EXISTS reports",
+    "DROP TABLE IF EXISTS master_sites",
+    "DROP TABLE IF EXISTS master_drones",
+    "CREATE TABLE master_sites (id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE) ENGINE=InnoDB",
+    "CREATE TABLE master_drones (id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE) ENGINE=InnoDB",
+    "CREATE TABLE reports (id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY, employee_telegram_id BIGINT NOT NULL, "
+    "report_date DATE NOT NULL, site_id INT UNSIGNED NULL, site_name VARCHAR(100) NOT NULL, "
+    "drone_id INT UNSIGNED NULL, drone_name VARCHAR(100) NOT NULL, pilot_name VARCHAR(100), copilot_name VARCHAR(100), "
+    "dgps_used_json JSON, dgps_operators_json JSON, grid_numbers_json JSON, gcp_points_json JSON, "
+    "base_height_m DECIMAL(8,3), total_area_sq_km DECIMAL(10,3), total_time_min INT, remark TEXT, "
+    "created_at DATETIME NOT NULL, KEY (report_date), KEY (employee_telegram_id)) ENGINE=InnoDB",
+    "CREATE TABLE report_flights (id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY, report_id BIGINT UNSIGNED NOT NULL, "
+    "flight_time_min INT, area_sq_km DECIMAL(10,3), uav_rover_file VARCHAR(200), drone_base_file_no VARCHAR(100), "
+    "KEY (report_id)) ENGINE=InnoDB",
+]
+
+
+def team():
+    return [{"telegram_id": 100000 + e, "first_name": "Emp", "last_name": str(e), "username": None}
+            for e in range(EMPLOYEES)]
+
+
+def seed(conn, flights, batch=5000):
+    rnd = random.Random(7)
+    reports = flights // FLIGHTS_PER_REPORT
+    start = date(2024, 1, 1)
+    with conn.cursor() as cur:
+        for stmt in SCHEMA:
+            cur.execute(stmt)
+        cur.execute("INSERT INTO master_sites (name) VALUES ('Site 0001')")
+        cur.execute("INSERT INTO master_drones (name) VALUES ('Drone 001')")
+        for i in range(0, reports, batch):
+            n = min(batch, reports - i)
+            rows = []
+            for k in range(n):
+                d = start + timedelta(days=rnd.randrange(365))
+                rows.append((
+                    100000 + rnd.randrange(EMPLOYEES), d, 1, "Site 0001", 1, "Drone 001", "Pilot", "Copilot",
+                    json.dumps(["R4S - 314", "DA2 - 739"]), json.dumps(["Alice", "Bob"]),
+                    json.dumps([f"H43R12A{j}" for j in range(8)]), json.dumps(["CP1", "CP2", "CP3"]),
+                    61.42, 0.6, 95, "bench", datetime(d.year, d.month, d.day, 18, rnd.randrange(60)),
+                ))
+            cur.executemany(
+                "INSERT INTO reports (employee_telegram_id, report_date, site_id, site_name, drone_id, drone_name, "
+                "pilot_name, copilot_name, dgps_used_json, dgps_operators_json, grid_numbers_json, gcp_points_json, "
+                "base_height_m, total_area_sq_km, total_time_min, remark, created_at) "
+                "VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)",
+                rows,
+            )
+            first = cur.lastrowid  # first id of a multi-row insert
+            cur.executemany(
+                "INSERT INTO report_flights (report_id, flight_time_min, area_sq_km, uav_rover_file, drone_base_file_no) "
+                "VALUES (%s,%s,%s,%s,%s)",
+                [(first + k, 19, 0.12, f"ROVER_{f:03d}.ubx", f"BASE_{f:03d}")
+                 for k in range(n) for f in range(FLIGHTS_PER_REPORT)],
+            )
+            print(f"  seeded {(i + n) * FLIGHTS_PER_REPORT}/{flights} flights", end="\r")
+        print()
+
+
+# ----------------- the two variants -----------------
+def legacy(conn, args):
+    """The pre-streaming build: every row in memory, then Workbook -> BytesIO."""
+    from openpyxl import Workbook
+    tgs = [e["telegram_id"] for e in team()]
+    ph = ",".join(["%s"] * len(tgs))
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute(f"SELECT r.id FROM reports r WHERE r.report_date BETWEEN %s AND %s "
+                    f"AND r.employee_telegram_id IN ({ph}) ORDER BY r.created_at DESC",
+                    [args["from"], args["to"]] + tgs)
+        ids = [r["id"] for r in cur.fetchall()]
+        ph2 = ",".join(["%s"] * len(ids))
+        cur.execute(f"SELECT * FROM reports r WHERE r.id IN ({ph2})", ids)
+        rep_map = {r["id"]: r for r in cur.fetchall()}
+        cur.execute(f"SELECT * FROM report_flights rf WHERE rf.report_id IN ({ph2}) ORDER BY rf.report_id, rf.id", ids)
+        fl = {}
+        for rf in cur.fetchall():
+            fl.setdefault(rf["report_id"], []).append(rf)
+    wb = Workbook()
+    ws1, ws2 = wb.active, wb.create_sheet("Detailed Info")
+    for i, rid in enumerate(ids, start=1):
+        ws1.append([i, "Emp", "x", str(rep_map[rid]["created_at"]), rid])
+    for rid in ids:
+        r = rep_map[rid]
+        for f in fl.get(rid, [None]):
+            ws2.append([r["id"], r["report_date"], r["site_name"], r["drone_name"], r["pilot_name"],
+                        r["copilot_name"], r["dgps_used_json"], r["dgps_operators_json"], r["grid_numbers_json"],
+                        r["gcp_points_json"], r["base_height_m"], r["total_area_sq_km"], r["total_time_min"],
+                        r["remark"], str(r["created_at"]),
+                        *((f["flight_time_min"], f["area_sq_km"], f["uav_rover_file"], f["drone_base_file_no"])
+                          if f else ("", "", "", ""))])
+    out = io.BytesIO()
+    wb.save(out)
+    return len(ids), out.tell()
+
+
+def streaming(conn, args):
+    import tempfile
+    from dgps_data import report_export
+    plan = report_export.build_plan("date", {"mode": "range", **args}, team(), "9999-12-31")
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        n = report_export.write_xlsx(conn, plan, path)
+        return n, os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def child(variant):
+    import tracemalloc
+    conn = connect(database=BENCH_DB)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n, size = (legacy if variant == "legacy" else streaming)(conn, {"from": "2024-01-01", "to": "2024-12-31"})
+    wall = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    conn.close()
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 * 1024)
+    except ImportError:  # Windows
+        rss = float("nan")
+    print(json.dumps({"reports": n, "bytes": size, "wall_s": wall, "peak_mb": peak / 2**20, "rss_mb": rss}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Excel export peak memory: in-memory vs streaming")
+    ap.add_argument("--flights", type=int, default=500_000)
+    ap.add_argument("--skip-seed", action="store_true")
+    ap.add_argument("--variants", default="legacy,streaming")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if BENCH_DB == MYSQL_DB:
+        sys.exit("BENCH_DB must not be the live database.")
+    if args.child:
+        return child(args.child)
+
+    if not args.skip_seed:
+        conn = connect(database=None)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+            conn.database = BENCH_DB
+            seed(conn, args.flights)
+        finally:
+            conn.close()
+
+    for variant in args.variants.split(","):
+        out = subprocess.run([sys.executable, __file__, "--child", variant],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{variant:<10} reports={r['reports']} file={r['bytes'] / 2**20:.1f} MB "
+              f"wall={r['wall_s']:.1f}s peak_alloc={r['peak_mb']:.1f} MB peak_rss={r['rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+CPU cost per /api/reports request (10 flights), excluding the DB round trips:
+body parse + initData check + validation + JSON columns + response rendering.
+
+  legacy: json.loads, manual dict walking, json.dumps x4, stdlib JSON response
+  typed:  CreateReportIn.model_validate_json, orjson columns, ORJSONResponse
+
+    python bench/intake_json.py [--n 20000]
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import hashlib
+import argparse
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import server
+
+TOKEN = os.environ["BOT_TOKEN"]
+
+
+def _init_data(tg_id=111):
+    pairs = {"auth_date": str(int(time.time())), "user": json.dumps({"id": tg_id, "first_name": "Bench"})}
+    dcs = "\n".join(f"{k}={pairs[k]}" for k in sorted(pairs))
+    secret = hmac.new(b"WebAppData", TOKEN.encode(), hashlib.sha256).digest()
+    pairs["hash"] = hmac.new(secret, dcs.encode(), hashlib.sha256).hexdigest()
+    return urlencode(pairs)
+
+
+def make_body(flights=10):
+    return json.dumps({
+        "init_data": _init_data(),
+        "report": {
+            "report_date": "2025-03-14", "site_id": 3, "drone_id": 7, "base_height_m": 61.42,
+            "pilot_name": "Ravi Kumar", "copilot_name": "Anil Das",
+            "dgps_used": ["R4S - 314", "DA2 - 739", "R4S - 188"],
+            "dgps_operators": ["Alice", "Bob", "Chandra"],
+            "grid_numbers": [f"H43R12A{17 + i}" for i in range(12)],
+            "gcp_points": [f"CP{i}" for i in range(1, 9)],
+            "remark": "Survey completed, light wind; base set up on BM-12.",
+        },
+        "flights": [
+            {"flight_time_min": 18 + i, "area_sq_km": 0.12 + i / 100, "uav_rover_file": f"ROVER_{i:03d}.ubx",
+             "drone_base_file_no": f"BASE_{i:03d}"}
+            for i in range(flights)
+        ],
+    }).encode()
+
+
+def legacy(raw):
+    body = json.loads(raw)
+    verified = server.verify_init_data(body.get("init_data", ""), TOKEN)
+    tg_id = int(verified["user"]["id"])
+    payload = body.get("report") or {}
+    flights = body.get("flights") or []
+    required = ["report_date", "base_height_m", "pilot_name", "copilot_name", "dgps_used",
+                "dgps_operators", "grid_numbers", "gcp_points", "remark"]
+    if [f for f in required if f not in payload]:
+        raise ValueError("missing")
+    if not (("site_id" in payload and "drone_id" in payload) or ("site_name" in payload and "drone_name" in payload)):
+        raise ValueError("site/drone")
+    norm = []
+    for f in flights:
+        t = int(f.get("flight_time_min", 0))
+        a = float(f.get("area_sq_km", 0.0))
+        u = (f.get("uav_rover_file") or "").strip()
+        b = (f.get("drone_base_file_no") or "").strip()
+        norm.append((t, a, u, b))
+    row = (
+        tg_id, payload["report_date"], float(payload["base_height_m"]),
+        payload["pilot_name"].strip(), payload["copilot_name"].strip(),
+        json.dumps(payload["dgps_used"], ensure_ascii=False),
+        json.dumps(payload["dgps_operators"], ensure_ascii=False),
+        json.dumps(payload["grid_numbers"], ensure_ascii=False),
+        json.dumps(payload["gcp_points"], ensure_ascii=False),
+        (payload.get("remark") or "").strip(),
+    )
+    return JSONResponse({"ok": True, "report_id": 123456}).body, row, norm
+
+
+def typed(raw):
+    body = server.CreateReportIn.model_validate_json(raw)
+    verified = server.verify_init_data(body.init_data, TOKEN)
+    tg_id = int(verified["user"]["id"])
+    payload = body.report.model_dump()
+    norm = [(int(f.flight_time_min), f.area_sq_km, f.uav_rover_file, f.drone_base_file_no) for f in body.flights]
+    row = (
+        tg_id, payload["report_date"], payload["base_height_m"],
+        payload["pilot_name"], payload["copilot_name"],
+        server.json_col(payload["dgps_used"]),
+        server.json_col(payload["dgps_operators"]),
+        server.json_col(payload["grid_numbers"]),
+        server.json_col(payload["gcp_points"]),
+        payload["remark"],
+    )
+    return ORJSONResponse({"ok": True, "report_id": 123456}).body, row, norm
+
+
+def timeit(fn, raw, n):
+    for _ in range(min(n, 1000)):
+        fn(raw)
+    t0 = time.process_time()
+    for _ in range(n):
+        fn(raw)
+    return (time.process_time() - t0) / n * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="create_report CPU cost: legacy vs typed/orjson")
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--flights", type=int, default=10)
+    args = ap.parse_args()
+
+    raw = make_body(args.flights)
+    a, b = legacy(raw), typed(raw)
+    assert [json.loads(x) for x in a[1][5:9]] == [json.loads(x) for x in b[1][5:9]]
+
+    us_legacy = timeit(legacy, raw, args.n)
+    us_typed = timeit(typed, raw, args.n)
+    print(f"body {len(raw)} bytes, {args.flights} flights, n={args.n}")
+    print(f"legacy: {us_legacy:8.1f} us/request")
+    print(f"typed:  {us_typed:8.1f} us/request  ({us_legacy - us_typed:+.1f} us saved, "
+          f"{(1 - us_typed / us_legacy) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Closed-loop load generator for server.py (see README "Production server").
+
+    python bench/load_webapp.py --url http://127.0.0.1:8000 --path /api/verify --concurrency 64 --seconds 30
+
+/api/verify is signed for --tg-id with BOT_TOKEN from .env (that user must be an
+active employee), so each request does the HMAC check plus one DB lookup;
+--path /api/health measures the bare framework. Prints requests/s and latency
+percentiles; run it once per WEB_WORKERS value to see how throughput scales.
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from urllib.parse import urlencode
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def signed_init_data(bot_token, tg_id):
+    """initData the way Telegram signs it (fresh auth_date)."""
+    pairs = {"auth_date": str(int(time.time())), "user": json.dumps({"id": tg_id, "first_name": "Load"})}
+    dcs = "\n".join(f"{k}={pairs[k]}" for k in sorted(pairs))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    pairs["hash"] = hmac.new(secret, dcs.encode(), hashlib.sha256).hexdigest()
+    return urlencode(pairs)
+
+
+async def worker(client, path, body, deadline, lat, errors):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            if body is None:
+                r = await client.get(path)
+            else:
+                r = await client.post(path, json=body)
+            if r.status_code != 200:
+                errors[r.status_code] = errors.get(r.status_code, 0) + 1
+                continue
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        lat.append(time.perf_counter() - t0)
+
+
+async def main_async(args):
+    body = None
+    if args.path == "/api/verify":
+        token = os.getenv("BOT_TOKEN", "")
+        if not token:
+            sys.exit("BOT_TOKEN is required to sign /api/verify requests.")
+        body = {"init_data": signed_init_data(token, args.tg_id)}
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        r = await client.get("/api/ready")
+        print(f"ready: {r.status_code} {r.text}")
+
+        # warm-up (pools, keep-alive connections)
+        await asyncio.gather(*[worker(client, args.path, body, time.perf_counter() + 2, [], {})
+                               for _ in range(args.concurrency)])
+
+        lat, errors = [], {}
+        t0 = time.perf_counter()
+        deadline = t0 + args.seconds
+        await asyncio.gather(*[worker(client, args.path, body, deadline, lat, errors)
+                               for _ in range(args.concurrency)])
+        wall = time.perf_counter() - t0
+
+    lat.sort()
+    pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1000 if lat else 0.0
+    print(f"{args.path} c={args.concurrency} {args.seconds}s: {len(lat) / wall:.0f} req/s "
+          f"p50={pct(0.50):.1f}ms p95={pct(0.95):.1f}ms p99={pct(0.99):.1f}ms errors={errors or 0}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test for the report WebApp API")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--path", default="/api/verify", choices=("/api/verify", "/api/health", "/api/ready"))
+    ap.add_argument("--tg-id", type=int, default=int(os.getenv("LOAD_TG_ID", "0")))
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--seconds", type=int, default=30)
+    asyncio.run(main_async(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Latency of the per-request lookups as text-protocol queries (a fresh cursor per
+call, what the apps did before) vs server-side prepared statements reused from
+dgps_data.repos.
+
+Uses the scratch schema of bench/reports_fk_explain.py in BENCH_DB (never the
+live MYSQL_DB) and prints the median and p95 per query:
+
+    python bench/prepared_statements.py --rows 200000 --iterations 2000
+    python bench/prepared_statements.py --skip-seed
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data.config import connect, MYSQL_DB
+from dgps_data import repos
+from reports_fk_explain import BENCH_DB, seed
+
+TEAM = [100000 + e for e in range(0, 400, 20)]  # employees of manager 1
+
+QUERIES = {
+    "user by telegram id": ("SELECT * FROM users WHERE telegram_id = %s", lambda i: (100000 + i % 400,)),
+    "reports of employee on date": (
+        "SELECT id, report_date, site_name, drone_name FROM reports WHERE employee_telegram_id = %s AND report_date = %s",
+        lambda i: (TEAM[i % len(TEAM)], "2024-06-03")),
+    "tracking (date + team)": (
+        f"SELECT id, employee_telegram_id FROM reports WHERE report_date = %s "
+        f"AND employee_telegram_id IN ({','.join(['%s'] * len(TEAM))})",
+        lambda i: ("2024-06-03", *TEAM)),
+    "active sites": ("SELECT id, name FROM master_sites ORDER BY name", lambda i: ()),
+}
+
+
+def _ms(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def text(conn, sql, args, n):
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(sql, args(i))
+            cur.fetchall()
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def prepared(conn, sql, args, n):
+    st = repos.statements(conn)
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        st.all(sql, args(i))
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Text protocol vs prepared statements for the hot lookups")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--iterations", type=int, default=2000)
+    ap.add_argument("--skip-seed", action="store_true")
+    args = ap.parse_args()
+
+    if BENCH_DB == MYSQL_DB:
+        sys.exit("BENCH_DB must not be the live database.")
+    conn = connect(database=None)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+        conn.database = BENCH_DB
+        if not args.skip_seed:
+            seed(conn, args.rows)
+        print(f"{'query':<30} {'text median/p95':>18} {'prepared median/p95':>22}")
+        for label, (sql, params) in QUERIES.items():
+            t = _ms(text(conn, sql, params, args.iterations))
+            p = _ms(prepared(conn, sql, params, args.iterations))
+            print(f"{label:<30} {t[0]:>8.3f} /{t[1]:>7.3f} ms {p[0]:>10.3f} /{p[1]:>7.3f} ms")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
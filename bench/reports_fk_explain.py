@@ -0,0 +1,146 @@
+"""
+EXPLAIN / timing comparison of the Sites and Drones view queries: string
+predicates on site_name/drone_name (before) vs integer site_id/drone_id with the
+composite indexes of migration 3 (after).
+
+Builds a scratch schema in BENCH_DB (never the live MYSQL_DB), seeds it, then
+prints the plan and the median runtime of each query:
+
+    python bench/reports_fk_explain.py --rows 1000000
+    python bench/reports_fk_explain.py --skip-seed      # reuse the seeded data
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data.config import connect, MYSQL_DB
+
+BENCH_DB = os.getenv("BENCH_DB", "dgps_bench")
+
+SCHEMA = [
+    "DROP TABLE IF EXISTS reports",
+    "DROP TABLE IF EXISTS users",
+    "DROP TABLE IF EXISTS master_sites",
+    "DROP TABLE IF EXISTS master_drones",
+    "CREATE TABLE users (id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY, telegram_id BIGINT NOT NULL, "
+    "manager_id INT UNSIGNED NULL, role TINYINT NOT NULL, first_name VARCHAR(100), last_name VARCHAR(100), "
+    "UNIQUE KEY (telegram_id), KEY (manager_id)) ENGINE=InnoDB",
+    "CREATE TABLE master_sites (id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE) ENGINE=InnoDB",
+    "CREATE TABLE master_drones (id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE) ENGINE=InnoDB",
+    "CREATE TABLE reports (id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY, employee_telegram_id BIGINT NOT NULL, "
+    "report_date DATE NOT NULL, site_id INT UNSIGNED NULL, site_name VARCHAR(100) NOT NULL, "
+    "drone_id INT UNSIGNED NULL, drone_name VARCHAR(100) NOT NULL, remark VARCHAR(255), "
+    "KEY idx_reports_emp_site_date (employee_telegram_id, site_id, report_date), "
+    "KEY idx_reports_emp_drone_date (employee_telegram_id, drone_id, report_date), "
+    "KEY idx_reports_site_date (site_id, report_date), "
+    "KEY idx_reports_drone_date (drone_id, report_date)) ENGINE=InnoDB",
+]
+
+QUERIES = {
+    "sites / name": (
+        "SELECT r.id, r.report_date, u.first_name, u.last_name FROM reports r "
+        "JOIN users u ON u.telegram_id = r.employee_telegram_id "
+        "WHERE u.manager_id = %s AND r.site_name = %s ORDER BY r.report_date DESC, r.id DESC",
+        lambda p: (p["mgr"], p["site_name"]),
+    ),
+    "sites / id": (
+        "SELECT r.id, r.report_date, u.first_name, u.last_name FROM reports r "
+        "JOIN users u ON u.telegram_id = r.employee_telegram_id "
+        "WHERE u.manager_id = %s AND r.site_id = %s ORDER BY r.report_date DESC, r.id DESC",
+        lambda p: (p["mgr"], p["site_id"]),
+    ),
+    "drones+date / name": (
+        "SELECT r.id, r.report_date, u.first_name, u.last_name FROM reports r "
+        "JOIN users u ON u.telegram_id = r.employee_telegram_id "
+        "WHERE u.manager_id = %s AND r.drone_name = %s AND r.report_date = %s",
+        lambda p: (p["mgr"], p["drone_name"], p["date"]),
+    ),
+    "drones+date / id": (
+        "SELECT r.id, r.report_date, u.first_name, u.last_name FROM reports r "
+        "JOIN users u ON u.telegram_id = r.employee_telegram_id "
+        "WHERE u.manager_id = %s AND r.drone_id = %s AND r.report_date = %s",
+        lambda p: (p["mgr"], p["drone_id"], p["date"]),
+    ),
+}
+
+
+def seed(conn, rows, sites=200, drones=80, managers=20, employees=400, batch=10000):
+    rnd = random.Random(42)
+    with conn.cursor() as cur:
+        for stmt in SCHEMA:
+            cur.execute(stmt)
+        cur.executemany("INSERT INTO master_sites (name) VALUES (%s)", [(f"Site {i:04d}",) for i in range(1, sites + 1)])
+        cur.executemany("INSERT INTO master_drones (name) VALUES (%s)", [(f"Drone {i:03d}",) for i in range(1, drones + 1)])
+        cur.executemany(
+            "INSERT INTO users (telegram_id, manager_id, role, first_name, last_name) VALUES (%s, NULL, 1, 'M', %s)",
+            [(900000 + m, str(m)) for m in range(1, managers + 1)],
+        )
+        cur.executemany(
+            "INSERT INTO users (telegram_id, manager_id, role, first_name, last_name) VALUES (%s, %s, 2, 'E', %s)",
+            [(100000 + e, 1 + e % managers, str(e)) for e in range(employees)],
+        )
+        start = date(2023, 1, 1)
+        for i in range(0, rows, batch):
+            chunk = []
+            for _ in range(min(batch, rows - i)):
+                s, d = rnd.randint(1, sites), rnd.randint(1, drones)
+                chunk.append((100000 + rnd.randrange(employees), start + timedelta(days=rnd.randrange(1000)),
+                              s, f"Site {s:04d}", d, f"Drone {d:03d}"))
+            cur.executemany(
+                "INSERT INTO reports (employee_telegram_id, report_date, site_id, site_name, drone_id, drone_name) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                chunk,
+            )
+            print(f"  seeded {i + len(chunk)}/{rows}", end="\r")
+        print()
+        cur.execute("ANALYZE TABLE reports, users")
+        cur.fetchall()
+
+
+def run(conn, repeat):
+    params = {"mgr": 1, "site_id": 17, "site_name": "Site 0017", "drone_id": 5, "drone_name": "Drone 005",
+              "date": date(2024, 6, 3)}
+    with conn.cursor() as cur:
+        for label, (sql, args) in QUERIES.items():
+            cur.execute("EXPLAIN " + sql, args(params))
+            cols = [c[0] for c in cur.description]
+            plan = [dict(zip(cols, r)) for r in cur.fetchall()]
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                cur.execute(sql, args(params))
+                n = len(cur.fetchall())
+                times.append((time.perf_counter() - t0) * 1000)
+            print(f"\n== {label}: {n} rows, median {statistics.median(times):.1f} ms")
+            for p in plan:
+                print(f"   {p['table']:<3} type={p['type']:<6} key={p['key']} rows={p['rows']} extra={p['Extra']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--skip-seed", action="store_true")
+    args = ap.parse_args()
+
+    if BENCH_DB == MYSQL_DB:
+        sys.exit("BENCH_DB must not be the live database.")
+    conn = connect(database=None)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+        conn.database = BENCH_DB
+        if not args.skip_seed:
+            seed(conn, args.rows)
+        run(conn, args.repeat)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Plan check for /api/view/search: EXPLAINs the page and facet queries of every
+filter combination (employee, site, drone, from, to) and fails if any of them
+reads reports with a full table or full index scan.
+
+Uses the scratch schema of bench/reports_fk_explain.py in BENCH_DB (never the
+live MYSQL_DB); exits 1 when a plan regresses, so it can run after schema
+changes:
+
+    python bench/search_plans.py --rows 200000
+    python bench/search_plans.py --skip-seed
+"""
+import os
+import sys
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data.config import connect, MYSQL_DB
+from dgps_data import report_search
+from reports_fk_explain import BENCH_DB, seed
+
+FULL_SCANS = ("ALL", "index")
+SAMPLE = {"employee": [100000, 100020], "site_id": [17], "drone_id": [5, 6], "from": "2024-01-01", "to": "2024-03-31"}
+
+
+def combos():
+    keys = list(SAMPLE)
+    for n in range(len(keys) + 1):
+        for chosen in itertools.combinations(keys, n):
+            filters = {"employee": [], "site_id": [], "drone_id": [], "from": None, "to": None}
+            for k in chosen:
+                filters[k] = SAMPLE[k]
+            yield "+".join(chosen) or "(team only)", filters
+
+
+def team(cur, manager_id):
+    cur.execute("SELECT telegram_id FROM users WHERE manager_id = %s AND role = 2", (manager_id,))
+    return [r[0] for r in cur.fetchall()]
+
+
+def check(conn, manager_id=1):
+    bad = 0
+    with conn.cursor() as cur:
+        team_ids = team(cur, manager_id)
+        for label, filters in combos():
+            where, params = report_search.where(filters, team_ids)
+            for kind, sql, args in (
+                ("page", report_search.page_sql(where), params + [51]),
+                ("facets", report_search.facet_sql(where), params),
+            ):
+                cur.execute("EXPLAIN " + sql, args)
+                cols = [c[0] for c in cur.description]
+                for p in (dict(zip(cols, r)) for r in cur.fetchall()):
+                    if p["table"] != "r":
+                        continue
+                    ok = p["type"] not in FULL_SCANS
+                    bad += not ok
+                    print(f"{'ok ' if ok else 'BAD'} {label:<38} {kind:<6} type={p['type']:<6} "
+                          f"key={p['key']} rows={p['rows']}")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="EXPLAIN every /api/view/search filter combination")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--skip-seed", action="store_true")
+    args = ap.parse_args()
+
+    if BENCH_DB == MYSQL_DB:
+        sys.exit("BENCH_DB must not be the live database.")
+    conn = connect(database=None)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+        conn.database = BENCH_DB
+        if not args.skip_seed:
+            seed(conn, args.rows)
+        bad = check(conn)
+    finally:
+        conn.close()
+    if bad:
+        sys.exit(f"{bad} plan(s) scan reports in full.")
+    print("All plans use an index range.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Latency of the dashboard's free-text search (/api/view/find, dgps_data.text_search)
+on a synthetic table: remark / pilot words through the FULLTEXT index and flight
+file name prefixes, next to the LIKE '%word%' scan they replace.
+
+Extends the scratch schema of bench/reports_fk_explain.py in BENCH_DB (never the
+live MYSQL_DB) with pilots, remarks and two flights per report, applies the
+indexes of migration 12, then prints each query's plan and its median / p95:
+
+    python bench/text_search.py --rows 1000000
+    python bench/text_search.py --skip-seed --repeat 50
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data.config import connect, MYSQL_DB
+from dgps_data import text_search
+from dgps_data.migrations import MIGRATIONS
+from reports_fk_explain import BENCH_DB, seed
+
+WORDS = ("rain", "delay", "battery", "swap", "wind", "gusty", "base", "station", "reset", "rover", "fix",
+         "float", "lost", "signal", "tree", "cover", "village", "road", "canal", "boundary", "resurvey",
+         "partial", "complete", "permission", "pending", "farmer", "objection", "propeller", "crash",
+         "landing", "sheet", "grid", "overlap", "sidelap", "gcp", "marked", "missing", "upload", "slow")
+PILOTS = ("Arjun Patil", "Ravi Kumar", "Sneha Joshi", "Imran Shaikh", "Kiran Rao", "Pooja Nair",
+          "Vikas Yadav", "Meera Iyer", "Sanjay Gupta", "Anita Desai", "Rahul Verma", "Deepa Menon")
+
+QUERIES = [
+    # (label, "text" | "files" | "like", query)
+    ("common word", "text", "battery"),
+    ("two words", "text", "rain delay"),
+    ("prefix", "text", "resur"),
+    ("phrase", "text", '"farmer objection"'),
+    ("pilot", "text", "Imran"),
+    ("rover file", "files", "R20240603"),
+    ("base file", "files", "B20231115_0"),
+    ("LIKE scan (before)", "like", "objection"),
+]
+
+
+def _elt(n_words, salt):
+    return f"ELT(1 + MOD(CRC32(CONCAT(id, '{salt}')), {n_words}), " + ", ".join(["%s"] * n_words) + ")"
+
+
+def seed_text(conn):
+    """Pilots, remarks (3-6 words) and two flights on every report of the base seed."""
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS report_flights")
+        cur.execute(
+            "CREATE TABLE report_flights (id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY, "
+            "report_id BIGINT UNSIGNED NOT NULL, uav_rover_file VARCHAR(200) NOT NULL, "
+            "drone_base_file_no VARCHAR(100) NOT NULL, KEY idx_report_flights_report (report_id)) ENGINE=InnoDB"
+        )
+        cur.execute("ALTER TABLE reports MODIFY remark TEXT NULL, "
+                    "ADD COLUMN pilot_name VARCHAR(100) NULL, ADD COLUMN copilot_name VARCHAR(100) NULL")
+        words = [_elt(len(WORDS), f"w{i}") for i in range(6)]
+        remark = (f"CONCAT_WS(' ', {words[0]}, {words[1]}, {words[2]}, "
+                  f"IF(MOD(id, 2), {words[3]}, NULL), IF(MOD(id, 3), {words[4]}, NULL), IF(MOD(id, 5), {words[5]}, NULL))")
+        cur.execute(
+            f"UPDATE reports SET remark = {remark}, pilot_name = {_elt(len(PILOTS), 'p')}, "
+            f"copilot_name = IF(MOD(id, 4), {_elt(len(PILOTS), 'c')}, NULL)",
+            list(WORDS) * 6 + list(PILOTS) * 2,
+        )
+        for n in (1, 2):
+            cur.execute(
+                "INSERT INTO report_flights (report_id, uav_rover_file, drone_base_file_no) "
+                "SELECT id, CONCAT('R', DATE_FORMAT(report_date, '%%Y%%m%%d'), '_', LPAD(id %% 10000, 4, '0'), '_', %s, '.ubx'), "
+                "CONCAT('B', DATE_FORMAT(report_date, '%%Y%%m%%d'), '_', LPAD(employee_telegram_id %% 1000, 3, '0'), %s) "
+                "FROM reports",
+                (n, n),
+            )
+        conn.commit()
+        print("  adding migration 12 indexes ...")
+        for step in dict((v, s) for v, _, s in MIGRATIONS)[12]:
+            if callable(step):
+                step(cur)
+            else:
+                cur.execute(step)
+        cur.execute("ANALYZE TABLE reports, report_flights")
+        cur.fetchall()
+
+
+def statement(kind, q, team_ids, limit):
+    if kind == "text":
+        against = text_search.boolean_query(q)
+        return text_search.text_sql(len(team_ids)), [against, against] + team_ids + [limit + 1, 0]
+    if kind == "files":
+        like = text_search.file_prefix(q)
+        return text_search.files_sql(len(team_ids)), [like, like] + team_ids + [limit + 1]
+    team = ",".join(["%s"] * len(team_ids))
+    return (
+        "SELECT r.id FROM reports r WHERE (r.remark LIKE %s OR r.pilot_name LIKE %s OR r.copilot_name LIKE %s) "
+        f"AND r.employee_telegram_id IN ({team}) ORDER BY r.report_date DESC, r.id DESC LIMIT %s",
+        [f"%{q}%"] * 3 + team_ids + [limit + 1],
+    )
+
+
+def run(conn, repeat, limit, manager_id=1):
+    with conn.cursor() as cur:
+        cur.execute("SELECT telegram_id FROM users WHERE manager_id = %s AND role = 2", (manager_id,))
+        team_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT COUNT(*) FROM reports")
+        print(f"{cur.fetchone()[0]} reports, team of {len(team_ids)}, page of {limit}")
+        for label, kind, q in QUERIES:
+            sql, args = statement(kind, q, team_ids, limit)
+            cur.execute("EXPLAIN " + sql, args)
+            cols = [c[0] for c in cur.description]
+            plan = [dict(zip(cols, r)) for r in cur.fetchall()]
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                cur.execute(sql, args)
+                n = len(cur.fetchall())
+                times.append((time.perf_counter() - t0) * 1000)
+            times.sort()
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            print(f"\n== {label} ({kind} {q!r}): {n} rows, median {statistics.median(times):.1f} ms, p95 {p95:.1f} ms")
+            for p in plan:
+                print(f"   {p['table']:<10} type={p['type']:<8} key={p['key']} rows={p['rows']} extra={p['Extra']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--skip-seed", action="store_true")
+    args = ap.parse_args()
+
+    if BENCH_DB == MYSQL_DB:
+        sys.exit("BENCH_DB must not be the live database.")
+    conn = connect(database=None)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+        conn.database = BENCH_DB
+        if not args.skip_seed:
+            seed(conn, args.rows)
+            seed_text(conn)
+        run(conn, args.repeat, args.limit)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import os
 import re
 import uuid
 import logging
+import time
 import asyncio
 from datetime import datetime, timedelta, timezone
 
@@ -25,7 +26,10 @@ from telegram.ext import (
     filters,
 )
 from telegram.request import HTTPXRequest
-from telegram.error import TimedOut, RetryAfter, NetworkError
+from telegram.error import TimedOut, RetryAfter, NetworkError, Forbidden, BadRequest
+
+from dgps_data import masters, outbox, querylog, repos, teams
+from dgps_data.config import connect as db_connect_plain
 
 # ----------------- Logging -----------------
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -47,6 +51,10 @@ MYSQL_USER = os.getenv("MYSQL_USER", "root")
 MYSQL_PASS = os.getenv("MYSQL_PASS", "")
 
 INVITE_DAYS_VALID = int(os.getenv("INVITE_DAYS_VALID", "1"))
+# New-report messages to managers, from the report outbox (dgps_data.outbox)
+NOTIFY_NEW_REPORTS = os.getenv("NOTIFY_NEW_REPORTS", "1") != "0"
+OUTBOX_POLL_S      = float(os.getenv("OUTBOX_POLL_S", "2"))
+OUTBOX_LAG_LOG_S   = float(os.getenv("OUTBOX_LAG_LOG_S", "600"))
 WEBAPP_URL        = os.getenv("WEBAPP_URL", "").strip()
 
 # Timezones
@@ -62,10 +70,12 @@ dbconfig = {
     "password": MYSQL_PASS,
     "autocommit": True,
 }
-cnxpool = pooling.MySQLConnectionPool(pool_name="staffpool", pool_size=5, **dbconfig)
+# No session reset on checkout: it would drop the prepared statements of dgps_data.repos.
+cnxpool = pooling.MySQLConnectionPool(pool_name="staffpool", pool_size=5, pool_reset_session=False, **dbconfig)
 
 def db_conn():
-    return cnxpool.get_connection()
+    # Tracked: every statement feeds the query fingerprint stats (dgps_data.querylog).
+    return querylog.track(cnxpool.get_connection())
 
 # ----------------- Constants -----------------
 ROLE_ADMIN    = 0
@@ -81,19 +91,16 @@ MASTERS_ADD_NAME, MASTERS_RENAME_NAME = range(100, 102)
 
 # ----------------- DB helpers -----------------
 def get_user_by_tg(telegram_id):
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute("SELECT * FROM users WHERE telegram_id=%s", (telegram_id,))
-        return cur.fetchone()
+    with db_conn() as conn:
+        return repos.Users(conn).by_telegram(telegram_id)
 
 def get_user_by_id(user_id):
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute("SELECT * FROM users WHERE id=%s", (user_id,))
-        return cur.fetchone()
+    with db_conn() as conn:
+        return repos.Users(conn).by_id(user_id)
 
 def user_active_by_tg(telegram_id):
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute("SELECT * FROM users WHERE telegram_id=%s AND is_active=1", (telegram_id,))
-        return cur.fetchone()
+    with db_conn() as conn:
+        return repos.Users(conn).active_by_telegram(telegram_id)
 
 def is_admin(telegram_id):
     u = get_user_by_tg(telegram_id)
@@ -108,12 +115,8 @@ def has_staff_privileges(telegram_id):
     return bool(u and u["is_active"] == 1 and u["role"] in (ROLE_ADMIN, ROLE_MANAGER))
 
 def get_staff_record(telegram_id):
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(
-            "SELECT * FROM users WHERE telegram_id=%s AND is_active=1 AND role IN (%s,%s)",
-            (telegram_id, ROLE_ADMIN, ROLE_MANAGER),
-        )
-        return cur.fetchone()
+    with db_conn() as conn:
+        return repos.Users(conn).staff_by_telegram(telegram_id, (ROLE_ADMIN, ROLE_MANAGER))
 
 def manager_login_by_tg(telegram_id):
     with db_conn() as conn, conn.cursor(dictionary=True) as cur:
@@ -143,15 +146,20 @@ def create_invitation(manager_id, invite_role=ROLE_EMPLOYEE):
         cur.execute(
             "INSERT INTO invitations (token, manager_id, invite_role, expires_at, status) "
             "VALUES (%s,%s,%s,%s,'pending')",
-            (token, manager_id, invite_role, expires_at_db),
+            (uuid.UUID(token).bytes, manager_id, invite_role, expires_at_db),
         )
     logger.info("Invitation created | token=%s manager_id=%s role=%s expires_at_utc=%s",
                 token, manager_id, invite_role, expires_at_utc)
     return token, expires_at_utc
 
 def get_invitation(token):
+    # tokens are stored as BINARY(16) (migration 8)
+    try:
+        token_bytes = uuid.UUID(token).bytes
+    except ValueError:
+        return None
     with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute("SELECT * FROM invitations WHERE token=%s", (token,))
+        cur.execute("SELECT * FROM invitations WHERE token=%s", (token_bytes,))
         return cur.fetchone()
 
 def mark_invitation_used(inv_id, user_id):
@@ -235,13 +243,14 @@ def deactivate_employee(user_id, manager_id):
             "UPDATE users SET is_active=0 WHERE id=%s AND role=%s AND manager_id=%s",
             (user_id, ROLE_EMPLOYEE, manager_id),
         )
-        return cur.rowcount > 0
+        changed = cur.rowcount > 0
+        if changed:
+            teams.bump(cur, manager_id)  # dashboard team caches reload
+        return changed
 
 def get_telegram_id_by_user_row_id(row_id):
-    with db_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT telegram_id FROM users WHERE id=%s", (row_id,))
-        r = cur.fetchone()
-        return r[0] if r else None
+    with db_conn() as conn:
+        return repos.Users(conn).telegram_for_id(row_id)
 
 # -------- Masters (Sites & Drones) helpers --------
 def _table_for(kind: str) -> str:
@@ -263,10 +272,17 @@ def masters_add(kind: str, name: str):
         return cur.lastrowid
 
 def masters_rename(kind: str, rec_id: int, new_name: str):
-    table = _table_for(kind)
-    with db_conn() as conn, conn.cursor() as cur:
-        cur.execute(f"UPDATE {table} SET name=%s WHERE id=%s", (new_name.strip(), rec_id))
-        return cur.rowcount > 0
+    # Reports reference masters by id; their name copy is renamed in the same transaction.
+    with db_conn() as conn:
+        conn.start_transaction()
+        try:
+            with conn.cursor() as cur:
+                ok = masters.rename(cur, "site" if kind == "sites" else "drone", rec_id, new_name.strip())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return ok
 
 def masters_toggle(kind: str, rec_id: int):
     table = _table_for(kind)
@@ -602,10 +618,10 @@ async def ask_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         with db_conn() as conn, conn.cursor() as cur:
-            cur.execute("SELECT id FROM users WHERE telegram_id=%s", (jr["telegram_id"],))
+            cur.execute("SELECT id, manager_id FROM users WHERE telegram_id=%s", (jr["telegram_id"],))
             row = cur.fetchone()
             if row:
-                user_id = row[0]
+                user_id, old_manager_id = row
                 cur.execute(
                     "UPDATE users "
                     "SET role=%s, manager_id=%s, username=%s, first_name=%s, last_name=%s, phone=%s, is_active=1 "
@@ -621,7 +637,9 @@ async def ask_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     (jr["telegram_id"], jr.get("username"), jr["invite_role"], jr["manager_id"],
                      jr.get("first_name"), jr.get("last_name"), phone),
                 )
-                user_id = cur.lastrowid
+                user_id, old_manager_id = cur.lastrowid, None
+            # joined (or moved between) teams: dashboard team caches reload
+            teams.bump(cur, jr["manager_id"], old_manager_id)
 
         mark_invitation_used(jr["invitation_id"], user_id)
 
@@ -1368,6 +1386,75 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await reply_text_safe(update, context, "Canceled.")
     return ConversationHandler.END
 
+# ----------------- New report notifications (outbox) -----------------
+def _report_notice(row):
+    """(manager chat id, text) for a submitted report; None when there is nobody to tell."""
+    if row["kind"] != "submitted" or not row["manager_id"]:
+        return None
+    mgr_tg = get_telegram_id_by_user_row_id(row["manager_id"])
+    if not mgr_tg:
+        return None
+    emp = get_user_by_tg(row["employee_telegram_id"])
+    name = f"{(emp or {}).get('first_name') or ''} {(emp or {}).get('last_name') or ''}".strip()
+    p = row["payload"] or {}
+    text = (
+        f"New report: {name or row['employee_telegram_id']} for {row['report_date']}\n"
+        f"Site: {p.get('site_name', '-')} | Drone: {p.get('drone_name', '-')}\n"
+        f"Flights: {p.get('flights', 0)} | Time: {p.get('total_time_min', 0)} min | "
+        f"Area: {p.get('total_area_sq_km', 0)} sq km"
+    )
+    return mgr_tg, text
+
+def _outbox_lag(name):
+    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+        return next((r for r in outbox.lag(cur) if r["consumer"] == name), None)
+
+async def notify_new_reports(application):
+    """
+    Follows the report outbox and messages the employee's manager. A send that
+    fails on the network is retried on the next poll (at-least-once); a manager
+    who blocked the bot is skipped.
+    """
+    consumer = outbox.Consumer("bot-report-notify")
+    last_lag_log = 0.0
+    while True:
+        rows = []
+        try:
+            rows = await asyncio.to_thread(consumer.fetch)
+            handled = []
+            for row in rows:
+                notice = await asyncio.to_thread(_report_notice, row)
+                if notice:
+                    try:
+                        await safe_send_message(application.bot, chat_id=notice[0], text=notice[1])
+                    except (Forbidden, BadRequest) as e:
+                        logger.warning("Report notice not delivered | report=%s: %s", row["report_id"], e)
+                    except (TimedOut, NetworkError) as e:
+                        logger.warning("Report notice deferred | report=%s: %s", row["report_id"], e)
+                        break
+                handled.append(row)
+            if handled:
+                await asyncio.to_thread(consumer.commit, handled)
+            if time.monotonic() - last_lag_log >= OUTBOX_LAG_LOG_S:
+                last_lag_log = time.monotonic()
+                lag = await asyncio.to_thread(_outbox_lag, consumer.name)
+                logger.info("Report outbox | %s | lag %s", consumer.stats(), lag)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Report outbox poll failed: %s", e)
+        # a full batch means more is waiting
+        await asyncio.sleep(0 if len(rows) >= consumer.batch else OUTBOX_POLL_S)
+
+async def start_background(application):
+    if NOTIFY_NEW_REPORTS:
+        application.bot_data["outbox_task"] = asyncio.create_task(notify_new_reports(application))
+
+async def stop_background(application):
+    task = application.bot_data.pop("outbox_task", None)
+    if task:
+        task.cancel()
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.exception("Unhandled error | update=%s error=%s", update, context.error)
     try:
@@ -1379,6 +1466,7 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
 # ----------------- Main -----------------
 def main():
     logger.info("Starting bot...")
+    querylog.start_flusher("bot", db_connect_plain)
 
     request = HTTPXRequest(
         connect_timeout=20.0,
@@ -1387,7 +1475,11 @@ def main():
         pool_timeout=20.0,
     )
 
-    app = ApplicationBuilder().token(BOT_TOKEN).request(request).build()
+    app = (
+        ApplicationBuilder().token(BOT_TOKEN).request(request)
+        .post_init(start_background).post_shutdown(stop_background)
+        .build()
+    )
 
     # --- Commands
     app.add_handler(CommandHandler("start", start))
@@ -0,0 +1,4 @@
+"""
+Shared data-access helpers for the bot, the report WebApp (server.py) and the
+managers dashboard (managers_report/app.py).
+"""
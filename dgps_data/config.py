@@ -0,0 +1,37 @@
+import os
+import hmac
+
+from dotenv import load_dotenv
+import mysql.connector
+
+# ----------------- Config -----------------
+load_dotenv()
+
+MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
+MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+MYSQL_DB   = os.getenv("MYSQL_DB", "tg_staffbot")
+MYSQL_USER = os.getenv("MYSQL_USER", "root")
+MYSQL_PASS = os.getenv("MYSQL_PASS", "")
+
+# /metrics answers only requests carrying this in X-Metrics-Token (unset: off).
+# Not the peer address: behind ngrok every request comes from 127.0.0.1.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_HEADER = "X-Metrics-Token"
+
+dbconfig = {
+    "host": MYSQL_HOST,
+    "port": MYSQL_PORT,
+    "database": MYSQL_DB,
+    "user": MYSQL_USER,
+    "password": MYSQL_PASS,
+    "autocommit": True,
+}
+
+
+def connect(**overrides):
+    """A plain (non-pooled) connection for scripts and batch jobs."""
+    return mysql.connector.connect(**{**dbconfig, **overrides})
+
+
+def metrics_allowed(token) -> bool:
+    return bool(METRICS_TOKEN) and hmac.compare_digest(METRICS_TOKEN.encode(), (token or "").encode())
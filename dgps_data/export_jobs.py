@@ -0,0 +1,195 @@
+"""
+Background Excel exports with an on-disk result cache.
+
+The dashboard turns a download into a job: submit() keys it by (manager, tab,
+filters, report versions of the employees involved) and queues it. Up to
+EXPORT_WORKERS builds run at once, each in its own Python process
+(`python -m dgps_data.export_jobs build`, fed the plan on stdin), so a long
+export neither holds a request nor competes with the web threads for the GIL.
+The browser polls status() and downloads the file when it is done.
+
+Worker processes are started with subprocess rather than multiprocessing:
+spawn would re-import the dashboard's app.py (pools, threads) in every worker.
+
+Finished files stay in EXPORT_DIR as <job id>.xlsx. The same filters asked
+again before any of those employees' reports change (dgps_data.report_versions)
+hit the same key and are served from disk. Reuse touches the file; when the
+directory grows past EXPORT_CACHE_MB the least recently used files go.
+
+Job states live in the submitting process; other dashboard processes still
+find a finished job through its file.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from dgps_data import report_export, report_versions
+
+logger = logging.getLogger("dgps_data.export_jobs")
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+EXPORT_DIR       = os.getenv("EXPORT_DIR", os.path.join(_ROOT, "exports"))
+EXPORT_WORKERS   = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_CACHE_MB  = float(os.getenv("EXPORT_CACHE_MB", "500"))
+EXPORT_TIMEOUT_S = int(os.getenv("EXPORT_TIMEOUT_S", "1800"))
+_FORGET_S = 3600  # finished / failed job states kept for polling
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+_JOB_ID_RE = re.compile(r"^(\d+)-(?:%s)-[0-9a-f]{20}$" % "|".join(report_export.TABS))
+
+
+# ----------------- Worker process -----------------
+def _worker_main():
+    """`python -m dgps_data.export_jobs build`: job on stdin, one JSON line out."""
+    from dgps_data.config import connect
+
+    job = json.loads(sys.stdin.read())
+    plan, path = job["plan"], job["path"]
+    plan["names"] = {int(k): tuple(v) for k, v in plan["names"].items()}  # JSON keys are strings
+    tmp = f"{path}.{os.getpid()}.tmp"
+    conn = connect(**job["dbconfig"])
+    try:
+        rows = report_export.write_xlsx(conn, plan, tmp)
+        os.replace(tmp, path)
+        print(json.dumps({"ok": True, "rows": rows}))
+    except report_export.ExportError as e:
+        print(json.dumps({"ok": False, "message": str(e)}))
+    finally:
+        conn.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _run_worker(dbconfig, plan, path):
+    job = json.dumps({"dbconfig": dbconfig, "plan": plan, "path": path}, default=str)
+    proc = subprocess.run(
+        [sys.executable, "-m", "dgps_data.export_jobs", "build"],
+        input=job, capture_output=True, text=True, cwd=_ROOT, timeout=EXPORT_TIMEOUT_S,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"export worker exited {proc.returncode}: {proc.stderr.strip()[-500:]}")
+    return json.loads(lines[-1])
+
+
+# ----------------- Dashboard side -----------------
+def job_key(manager_id, plan, version) -> str:
+    """
+    '<manager>-<tab>-<hash>' over the filters, the team's names and the data
+    version. Names are in the file but a rename doesn't bump report_versions.
+    """
+    raw = repr((plan["tab"], plan["where"], [str(p) for p in plan["params"]],
+                sorted(plan["names"].items()), version))
+    return f"{manager_id}-{plan['tab']}-{hashlib.sha1(raw.encode()).hexdigest()[:20]}"
+
+
+def owner_of(job_id):
+    """Manager id of a well-formed job id, else None (ids end up in file paths)."""
+    m = _JOB_ID_RE.match(job_id or "")
+    return int(m.group(1)) if m else None
+
+
+class ExportJobs:
+    def __init__(self, dbconfig, workers=EXPORT_WORKERS, directory=EXPORT_DIR, cache_mb=EXPORT_CACHE_MB):
+        self.dbconfig = dict(dbconfig)
+        self.directory = directory
+        self.cache_bytes = int(cache_mb * 2**20)
+        self._lock = threading.Lock()
+        self._jobs = {}  # job id -> {"status", "message", "rows", "t"}
+        # threads that each wait on one worker process
+        self._runner = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+
+    def path(self, job_id):
+        return os.path.join(self.directory, job_id + ".xlsx")
+
+    def submit(self, conn, manager_id, plan):
+        """(job id, status). A cached file or a job in flight with the same key is reused."""
+        with conn.cursor() as cur:
+            version = report_versions.team_version(cur, plan["names"])
+        job_id = job_key(manager_id, plan, version)
+        path = self.path(job_id)
+        with self._lock:
+            self._forget_old()
+            job = self._jobs.get(job_id)
+            if job and job["status"] in (QUEUED, RUNNING):
+                return job_id, job["status"]
+            if os.path.isfile(path):
+                os.utime(path)  # recently used, evicted last
+                self._jobs[job_id] = {"status": DONE, "message": None, "rows": None, "t": time.time()}
+                return job_id, DONE
+            os.makedirs(self.directory, exist_ok=True)
+            self._jobs[job_id] = {"status": QUEUED, "message": None, "rows": None, "t": time.time()}
+        self._runner.submit(self._run, job_id, plan, path)
+        return job_id, QUEUED
+
+    def _run(self, job_id, plan, path):
+        self._set(job_id, status=RUNNING)
+        try:
+            result = _run_worker(self.dbconfig, plan, path)
+        except Exception as e:
+            logger.error("Export %s failed: %s", job_id, e)
+            self._set(job_id, status=FAILED, message="Export failed due to a server error.")
+            return
+        if result.get("ok"):
+            self._set(job_id, status=DONE, rows=result.get("rows"))
+            self._evict()
+        else:
+            self._set(job_id, status=FAILED, message=result.get("message"))
+
+    def _set(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.setdefault(job_id, {"message": None, "rows": None})
+            job.update(fields, t=time.time())
+
+    def status(self, job_id):
+        with self._lock:
+            job = dict(self._jobs.get(job_id) or {})
+        if not job:
+            if os.path.isfile(self.path(job_id)):
+                return {"status": DONE, "message": None, "rows": None}
+            return None
+        return {"status": job["status"], "message": job.get("message"), "rows": job.get("rows")}
+
+    def _forget_old(self):
+        cutoff = time.time() - _FORGET_S
+        for k in [k for k, j in self._jobs.items() if j["status"] in (DONE, FAILED) and j["t"] < cutoff]:
+            del self._jobs[k]
+
+    def _evict(self):
+        """Drop least recently used files until the directory fits EXPORT_CACHE_MB."""
+        files = []
+        try:
+            for name in os.listdir(self.directory):
+                if name.endswith(".xlsx"):
+                    st = os.stat(os.path.join(self.directory, name))
+                    files.append((st.st_mtime, st.st_size, os.path.join(self.directory, name)))
+        except OSError:
+            return
+        total = sum(f[1] for f in files)
+        for _, size, p in sorted(files):
+            if total <= self.cache_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:  # open for a download (Windows); next time
+                pass
+
+    def stats(self):
+        with self._lock:
+            states = [j["status"] for j in self._jobs.values()]
+        return {s: states.count(s) for s in (QUEUED, RUNNING, DONE, FAILED)}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["build"]:
+        sys.exit("usage: python -m dgps_data.export_jobs build < job.json")
+    _worker_main()
@@ -0,0 +1,181 @@
+"""
+Survey grid codes and per-site coverage.
+
+A grid number such as "H43R12A17" is <sheet letter><sheet no>R<row>A<column>.
+parse_grid() decodes it into integers and a single tile_key; grid_coverage keeps
+one row per (site_id, tile_key) with first/last survey date and report count.
+New reports are folded in incrementally; edits and deletes recompute only the
+tiles they touched.
+
+    python -m dgps_data.grid_coverage rebuild [--batch 5000]
+"""
+import re
+import sys
+import logging
+
+from dgps_data.report_index import as_list, item_key
+
+logger = logging.getLogger("dgps_data.grid_coverage")
+
+GRID_RE = re.compile(r"^([A-Z])(\d{1,4})R(\d{1,5})A(\d{1,5})$")
+
+# tile_key layout (fits BIGINT UNSIGNED):
+#   letter(5 bits) | sheet_no(14 bits) | row(17 bits) | col(17 bits)
+_COL_BITS = 17
+_ROW_BITS = 17
+_SHEET_BITS = 14
+
+
+def parse_grid(code):
+    """Decode a grid code; None when it doesn't follow the sheet/row/column pattern."""
+    m = GRID_RE.match(item_key(code))
+    if not m:
+        return None
+    letter, sheet_no, row, col = m.group(1), int(m.group(2)), int(m.group(3)), int(m.group(4))
+    tile = ((((ord(letter) - ord("A")) << _SHEET_BITS | sheet_no) << _ROW_BITS | row) << _COL_BITS) | col
+    return {
+        "grid_code": f"{letter}{sheet_no}R{row}A{col}",
+        "sheet": f"{letter}{sheet_no}",
+        "row": row,
+        "col": col,
+        "tile_key": tile,
+    }
+
+
+def decode_tile(tile_key):
+    col = tile_key & ((1 << _COL_BITS) - 1)
+    row = (tile_key >> _COL_BITS) & ((1 << _ROW_BITS) - 1)
+    sheet_no = (tile_key >> (_COL_BITS + _ROW_BITS)) & ((1 << _SHEET_BITS) - 1)
+    letter = chr(ord("A") + (tile_key >> (_COL_BITS + _ROW_BITS + _SHEET_BITS)))
+    return {"sheet": f"{letter}{sheet_no}", "row": row, "col": col}
+
+
+def tiles_for(codes):
+    """{tile_key: parsed} for the decodable codes of one report (duplicates collapse)."""
+    out = {}
+    for c in as_list(codes):
+        p = parse_grid(c)
+        if p:
+            out[p["tile_key"]] = p
+    return out
+
+
+# ----------------- Incremental maintenance -----------------
+def add_report(cur, site_id, report_date, codes):
+    """Fold one new report into the coverage rows of its site."""
+    tiles = tiles_for(codes)
+    if site_id is None or not tiles:
+        return
+    cur.executemany(
+        "INSERT INTO grid_coverage (site_id, tile_key, grid_code, first_date, last_date, report_count) "
+        "VALUES (%s, %s, %s, %s, %s, 1) "
+        "ON DUPLICATE KEY UPDATE first_date = LEAST(first_date, VALUES(first_date)), "
+        "last_date = GREATEST(last_date, VALUES(last_date)), report_count = report_count + 1",
+        [(site_id, t, p["grid_code"], report_date, report_date) for t, p in tiles.items()],
+    )
+
+
+def refresh(cur, site_id, codes):
+    """
+    Recompute the coverage rows of the given tiles from report_grids (after an
+    edit or delete). Reports are found by tile_key (migration 14), so every
+    spelling of a tile ("H43R012A17", "H43R12A17") counts.
+    """
+    tiles = tiles_for(codes)
+    if site_id is None or not tiles:
+        return
+    keys = sorted(tiles)
+    placeholders = ",".join(["%s"] * len(keys))
+    cur.execute(
+        f"SELECT g.tile_key, r.id, r.report_date "
+        f"FROM report_grids g JOIN reports r ON r.id = g.report_id "
+        f"WHERE g.tile_key IN ({placeholders}) AND r.site_id = %s",
+        keys + [site_id],
+    )
+    agg = {}
+    for row in cur.fetchall():
+        tile, rid, d = (row["tile_key"], row["id"], row["report_date"]) if isinstance(row, dict) else row
+        tile = int(tile)
+        first, last, ids = agg.get(tile, (d, d, set()))
+        ids.add(rid)
+        agg[tile] = (min(first, d), max(last, d), ids)
+
+    gone = [(site_id, t) for t in tiles if t not in agg]
+    if gone:
+        cur.executemany("DELETE FROM grid_coverage WHERE site_id = %s AND tile_key = %s", gone)
+    if agg:
+        cur.executemany(
+            "INSERT INTO grid_coverage (site_id, tile_key, grid_code, first_date, last_date, report_count) "
+            "VALUES (%s, %s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE first_date = VALUES(first_date), last_date = VALUES(last_date), "
+            "report_count = VALUES(report_count)",
+            [(site_id, t, tiles[t]["grid_code"], f, l, len(ids)) for t, (f, l, ids) in agg.items()],
+        )
+
+
+# ----------------- Full rebuild -----------------
+def rebuild(conn, batch=5000):
+    """Recompute grid_coverage from scratch, streaming report_grids by report id."""
+    agg = {}
+    last_id = 0
+    while True:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT id FROM reports WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch))
+            ids = [r["id"] for r in cur.fetchall()]
+            if not ids:
+                break
+            cur.execute(
+                "SELECT r.id, r.site_id, r.report_date, g.item_key "
+                "FROM reports r JOIN report_grids g ON g.report_id = r.id "
+                "WHERE r.id BETWEEN %s AND %s ORDER BY r.id",
+                (ids[0], ids[-1]),
+            )
+            rows = cur.fetchall()
+        for r in rows:
+            sid = r["site_id"]
+            p = parse_grid(r["item_key"])
+            if sid is None or not p:
+                continue
+            k = (sid, p["tile_key"])
+            d = r["report_date"]
+            first, last, count, last_rid, code = agg.get(k, (d, d, 0, None, p["grid_code"]))
+            if last_rid != r["id"]:  # rows come in report id order; count each report once
+                count += 1
+            agg[k] = (min(first, d), max(last, d), count, r["id"], code)
+        last_id = ids[-1]
+
+    conn.start_transaction()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM grid_coverage")
+            items = [(sid, t, code, f, l, n) for (sid, t), (f, l, n, _, code) in agg.items()]
+            for i in range(0, len(items), batch):
+                cur.executemany(
+                    "INSERT INTO grid_coverage (site_id, tile_key, grid_code, first_date, last_date, report_count) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    items[i:i + batch],
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info("Rebuilt grid_coverage: %s tiles", len(agg))
+    return len(agg)
+
+
+if __name__ == "__main__":
+    import argparse
+    from dgps_data.config import connect
+
+    ap = argparse.ArgumentParser(description="Grid coverage rollup")
+    ap.add_argument("command", choices=("rebuild",))
+    ap.add_argument("--batch", type=int, default=5000)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    conn = connect()
+    try:
+        print(f"Tiles: {rebuild(conn, batch=args.batch)}")
+    finally:
+        conn.close()
+    sys.exit(0)
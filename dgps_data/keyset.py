@@ -0,0 +1,75 @@
+"""
+Keyset (cursor) paging on reports ordered by (report_date, id).
+
+A page is fetched with `WHERE <filters> AND <after> ORDER BY ... LIMIT n + 1`;
+the extra row only says whether there is a next page. The cursor handed to the
+client is the last row's "YYYY-MM-DD.id", so page 50 costs the same index
+range read as page 1 (no OFFSET), and rows inserted meanwhile don't shift it.
+
+    after_sql, after_params = keyset.after(request.args.get("after"), desc=True)
+    cur.execute(f"... WHERE ... {after_sql} ORDER BY {keyset.order(desc=True)} LIMIT %s",
+                params + after_params + [limit + 1])
+    rows, next_cursor = keyset.page(cur.fetchall(), limit)
+
+The secondary indexes the View Reports filters use all end in report_date and
+InnoDB appends the primary key, so the ORDER BY is read from the index.
+"""
+import re
+from datetime import date
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_CURSOR_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.(\d+)$")
+
+
+def limit(value, default=PAGE_SIZE):
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(n, MAX_PAGE_SIZE))
+
+
+def parse(cursor):
+    """'YYYY-MM-DD.id' -> (date string, id); None for a missing or malformed cursor."""
+    m = _CURSOR_RE.match((cursor or "").strip())
+    if not m:
+        return None
+    try:
+        date.fromisoformat(m.group(1))
+    except ValueError:
+        return None
+    return m.group(1), int(m.group(2))
+
+
+def after(cursor, desc=True, alias="r"):
+    """(' AND ...', params) selecting the rows past `cursor`; ('', []) for the first page."""
+    key = parse(cursor)
+    if not key:
+        return "", []
+    op = "<" if desc else ">"
+    d, rid = key
+    # expanded rather than a row constructor, so MySQL plans it as an index range
+    return (
+        f" AND ({alias}.report_date {op} %s OR ({alias}.report_date = %s AND {alias}.id {op} %s))",
+        [d, d, rid],
+    )
+
+
+def order(desc=True, alias="r"):
+    direction = "DESC" if desc else "ASC"
+    return f"{alias}.report_date {direction}, {alias}.id {direction}"
+
+
+def cursor_for(row):
+    d = row["report_date"]
+    return f"{d.isoformat() if hasattr(d, 'isoformat') else d}.{row['id']}"
+
+
+def page(rows, n):
+    """Trim the look-ahead row: (rows, next cursor or None)."""
+    if len(rows) > n:
+        rows = rows[:n]
+        return rows, cursor_for(rows[-1])
+    return rows, None
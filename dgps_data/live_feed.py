@@ -0,0 +1,145 @@
+"""
+Fan-out of the report change log (dgps_data.report_changes) to the dashboard's
+Server-Sent Events clients (managers_report/live.py).
+
+One Hub per process: a single task polls report_changes every `poll_s` seconds
+on one connection (in a worker thread, only while someone is subscribed) and
+puts each change on the queues of the employee's manager. Clients are asyncio
+queues, not threads, so hundreds of idle EventSource connections cost a few KB
+each.
+
+    hub = Hub(poll_s=1.0)
+    asyncio.create_task(hub.run())
+    q = hub.subscribe(manager_id)            # change dicts; None = dropped, reconnect
+    missed = await hub.backlog(manager_id, last_event_id)
+    hub.unsubscribe(manager_id, q)
+
+Ids are allocated at INSERT but become visible at COMMIT, so a slower
+transaction can commit a lower id after a higher one was seen. Each poll
+therefore re-reads the last `lookback` ids and skips the ones already sent.
+
+The dashboard hands the browser a signed, short-lived token naming the manager
+(make_token); the SSE service only checks it (read_token), it has no session.
+"""
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from dgps_data import report_changes
+from dgps_data.config import connect
+
+logger = logging.getLogger("dgps_data.live_feed")
+
+QUEUE_SIZE = 100  # per client; a client this far behind is dropped and reconnects
+_SALT = "dgps-live-feed"
+
+
+# ----------------- Tokens -----------------
+def make_token(secret, manager_id):
+    return URLSafeTimedSerializer(secret, salt=_SALT).dumps({"m": manager_id})
+
+
+def read_token(secret, token, max_age):
+    """manager_id, or None for a bad or expired token."""
+    try:
+        data = URLSafeTimedSerializer(secret, salt=_SALT).loads(token or "", max_age=max_age)
+    except BadSignature:
+        return None
+    return data.get("m") if isinstance(data, dict) else None
+
+
+# ----------------- Hub -----------------
+class Hub:
+    def __init__(self, poll_s=1.0, lookback=100):
+        self.poll_s = poll_s
+        self.lookback = lookback
+        self._subs = {}  # manager_id -> set of asyncio.Queue
+        self._conn = None
+        self._db_lock = threading.Lock()  # the connection is used from worker threads
+        self._last_id = None
+        self._sent = deque(maxlen=lookback * 10)
+        self._sent_ids = set()
+        self.events = 0
+        self.dropped = 0
+
+    def subscribe(self, manager_id):
+        q = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subs.setdefault(manager_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, manager_id, q):
+        subs = self._subs.get(manager_id)
+        if subs:
+            subs.discard(q)
+            if not subs:
+                del self._subs[manager_id]
+
+    def stats(self):
+        return {"managers": len(self._subs), "clients": sum(len(s) for s in self._subs.values()),
+                "last_id": self._last_id, "events": self.events, "dropped": self.dropped}
+
+    # -- DB side (worker threads) --
+    def _query(self, fn):
+        with self._db_lock:
+            try:
+                if self._conn is None or not self._conn.is_connected():
+                    self._conn = connect()  # autocommit: every poll sees the latest commits
+                with self._conn.cursor(dictionary=True) as cur:
+                    return fn(cur)
+            except Exception:
+                self._conn = None
+                raise
+
+    def _mark(self, rows):
+        for r in rows:
+            if len(self._sent) == self._sent.maxlen:
+                self._sent_ids.discard(self._sent[0])
+            self._sent.append(r["id"])
+            self._sent_ids.add(r["id"])
+            self._last_id = max(self._last_id or 0, r["id"])
+
+    def _poll(self, cur):
+        if self._last_id is None:
+            # The feed starts now: what is already in the lookback window counts as sent
+            self._sent.clear()
+            self._sent_ids.clear()
+            self._last_id = report_changes.latest_id(cur)
+            self._mark(report_changes.since(cur, max(0, self._last_id - self.lookback)))
+            return []
+        rows = report_changes.since(cur, max(0, self._last_id - self.lookback))
+        new = [r for r in rows if r["id"] not in self._sent_ids]
+        self._mark(new)
+        return new
+
+    async def backlog(self, manager_id, after_id):
+        """Changes for one manager after after_id (an EventSource reconnecting with Last-Event-ID)."""
+        return await asyncio.to_thread(self._query, lambda cur: report_changes.since(cur, after_id, manager_id))
+
+    # -- event loop side --
+    def _dispatch(self, row):
+        for q in list(self._subs.get(row["manager_id"], ())):
+            try:
+                q.put_nowait(row)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.unsubscribe(row["manager_id"], q)
+                q.get_nowait()
+                q.put_nowait(None)  # tells the stream to close; the browser reconnects
+        self.events += 1
+
+    async def run(self):
+        while True:
+            try:
+                if not self._subs:
+                    self._last_id = None  # nobody listening: restart from the head on the next subscribe
+                else:
+                    for row in await asyncio.to_thread(self._query, self._poll):
+                        self._dispatch(row)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("report_changes poll failed: %s", e)
+            await asyncio.sleep(self.poll_s)
@@ -0,0 +1,123 @@
+"""
+Site and drone masters as integer keys on reports.
+
+reports.site_id / reports.drone_id reference master_sites / master_drones (see
+migration 3). site_name / drone_name stay on the row as the display copy used by
+previews and exports; a rename in the masters updates that copy by id, so old
+reports follow the rename instead of being orphaned.
+
+    python -m dgps_data.masters backfill [--batch 5000]
+"""
+import sys
+import logging
+
+from dgps_data import report_versions
+
+logger = logging.getLogger("dgps_data.masters")
+
+# kind -> (master table, reports id column, reports name column)
+KINDS = {
+    "site":  ("master_sites",  "site_id",  "site_name"),
+    "drone": ("master_drones", "drone_id", "drone_name"),
+}
+
+
+def _val(row, key, idx):
+    return row[key] if isinstance(row, dict) else row[idx]
+
+
+def id_for(cur, kind, name):
+    """Master id for a name (None when the name isn't in the masters)."""
+    table = KINDS[kind][0]
+    cur.execute(f"SELECT id FROM {table} WHERE name = %s LIMIT 1", ((name or "").strip(),))
+    row = cur.fetchone()
+    return _val(row, "id", 0) if row else None
+
+
+def name_for(cur, kind, rec_id):
+    table = KINDS[kind][0]
+    cur.execute(f"SELECT name FROM {table} WHERE id = %s", (rec_id,))
+    row = cur.fetchone()
+    return _val(row, "name", 0) if row else None
+
+
+def parse_id(value):
+    """An id from a query/form value; None for blanks and non-numbers."""
+    try:
+        v = int(str(value or "").strip())
+    except ValueError:
+        return None
+    return v if v > 0 else None
+
+
+def rename(cur, kind, rec_id, new_name):
+    """Rename a master and the name copy on its reports (run in one transaction)."""
+    table, id_col, name_col = KINDS[kind]
+    cur.execute(f"UPDATE {table} SET name = %s WHERE id = %s", (new_name, rec_id))
+    if cur.rowcount <= 0:
+        return False
+    cur.execute(f"UPDATE reports SET {name_col} = %s, version = version + 1 WHERE {id_col} = %s", (new_name, rec_id))
+    report_versions.bump_where(cur, f"r.{id_col} = %s", (rec_id,))
+    return True
+
+
+# ----------------- Backfill -----------------
+def backfill(conn, batch=5000):
+    """
+    Set site_id / drone_id on existing reports by matching the stored names,
+    walking reports by id (one short transaction per batch). Names that don't
+    match a master stay NULL and are counted. Safe to re-run.
+    """
+    last_id = 0
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM reports WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch))
+            ids = [r[0] for r in cur.fetchall()]
+        if not ids:
+            break
+
+        conn.start_transaction()
+        try:
+            with conn.cursor() as cur:
+                for table, id_col, name_col in KINDS.values():
+                    cur.execute(
+                        f"UPDATE reports r JOIN {table} m ON m.name = r.{name_col} "
+                        f"SET r.{id_col} = m.id "
+                        f"WHERE r.id BETWEEN %s AND %s AND r.{id_col} IS NULL",
+                        (ids[0], ids[-1]),
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        total += len(ids)
+        last_id = ids[-1]
+        logger.info("Backfilled %s reports (last id %s)", total, last_id)
+
+    with conn.cursor() as cur:
+        for kind, (_, id_col, name_col) in KINDS.items():
+            cur.execute(f"SELECT COUNT(*) FROM reports WHERE {id_col} IS NULL AND {name_col} <> ''")
+            missing = cur.fetchone()[0]
+            if missing:
+                logger.warning("%s reports have a %s that matches no master", missing, kind)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+    from dgps_data.config import connect
+
+    ap = argparse.ArgumentParser(description="Site/drone keys on reports")
+    ap.add_argument("command", choices=("backfill",))
+    ap.add_argument("--batch", type=int, default=5000)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    conn = connect()
+    try:
+        print(f"Backfilled {backfill(conn, batch=args.batch)} reports.")
+    finally:
+        conn.close()
+    sys.exit(0)
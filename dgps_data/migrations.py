@@ -0,0 +1,454 @@
+"""
+Versioned schema changes.
+
+Each migration is (version, name, steps); a step is a SQL string or a callable
+taking a cursor. Applied versions are recorded in schema_migrations, so running
+this again only applies what is pending.
+
+    python -m dgps_data.migrations            # apply pending migrations
+    python -m dgps_data.migrations --status   # list applied / pending
+"""
+import sys
+import logging
+
+from dgps_data.config import connect
+
+logger = logging.getLogger("dgps_data.migrations")
+
+
+def _list_table(table):
+    # One row per list entry; item keeps the text as entered, item_key is the
+    # normalized form lookups use (see report_index.item_key).
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        "  report_id BIGINT UNSIGNED NOT NULL,"
+        "  seq SMALLINT UNSIGNED NOT NULL,"
+        "  item VARCHAR(100) NOT NULL,"
+        "  item_key VARCHAR(100) NOT NULL,"
+        "  PRIMARY KEY (report_id, seq),"
+        f"  KEY idx_{table}_key (item_key, report_id)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def _add_master_keys(cur):
+    # reports.site_id / drone_id must match the type of the master ids for the FK.
+    adds = []
+    for col, after, table in (("site_id", "site_name", "master_sites"), ("drone_id", "drone_name", "master_drones")):
+        cur.execute(
+            "SELECT COLUMN_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'id'",
+            (table,),
+        )
+        col_type = cur.fetchone()[0]
+        if isinstance(col_type, (bytes, bytearray)):
+            col_type = col_type.decode()
+        adds.append(f"ADD COLUMN {col} {col_type} NULL AFTER {after}")
+    cur.execute("ALTER TABLE reports " + ", ".join(adds))
+
+
+# Tables as they stood before migration 1 (until now they were created by hand
+# in MySQL Workbench). IF NOT EXISTS: on an existing database this is a no-op,
+# on an empty one it creates the base the later migrations alter.
+BASELINE = [
+    "CREATE TABLE IF NOT EXISTS users ("
+    "  id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  telegram_id BIGINT NOT NULL,"
+    "  username VARCHAR(100) NULL,"
+    "  first_name VARCHAR(100) NULL,"
+    "  last_name VARCHAR(100) NULL,"
+    "  phone VARCHAR(32) NULL,"
+    "  role TINYINT NOT NULL,"
+    "  manager_id INT UNSIGNED NULL,"
+    "  is_active TINYINT NOT NULL DEFAULT 1,"
+    "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+    "  UNIQUE KEY uq_users_telegram (telegram_id),"
+    "  KEY idx_users_manager (manager_id)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS manager_logins ("
+    "  id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  login VARCHAR(100) NOT NULL,"
+    "  password VARCHAR(255) NOT NULL,"
+    "  telegram_id BIGINT NOT NULL,"
+    "  is_active TINYINT NOT NULL DEFAULT 1,"
+    "  session_token VARCHAR(64) NULL,"
+    "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+    "  UNIQUE KEY uq_manager_logins_login (login)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS invitations ("
+    "  id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  token CHAR(36) NOT NULL,"
+    "  manager_id INT UNSIGNED NOT NULL,"
+    "  invite_role TINYINT NOT NULL,"
+    "  status VARCHAR(16) NOT NULL DEFAULT 'pending',"
+    "  expires_at DATETIME NOT NULL,"
+    "  used_at DATETIME NULL,"
+    "  redeemed_by_user_id INT UNSIGNED NULL,"
+    "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+    "  UNIQUE KEY uq_invitations_token (token)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS join_requests ("
+    "  id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  telegram_id BIGINT NOT NULL,"
+    "  username VARCHAR(100) NULL,"
+    "  first_name VARCHAR(100) NULL,"
+    "  last_name VARCHAR(100) NULL,"
+    "  phone VARCHAR(32) NULL,"
+    "  manager_id INT UNSIGNED NOT NULL,"
+    "  invite_role TINYINT NOT NULL,"
+    "  invitation_id INT UNSIGNED NOT NULL,"
+    "  status VARCHAR(16) NOT NULL DEFAULT 'pending',"
+    "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+    "  decided_at DATETIME NULL,"
+    "  decided_by INT UNSIGNED NULL"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS master_sites ("
+    "  id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  name VARCHAR(100) NOT NULL,"
+    "  is_active TINYINT NOT NULL DEFAULT 1,"
+    "  UNIQUE KEY uq_master_sites_name (name)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS master_drones ("
+    "  id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  name VARCHAR(100) NOT NULL,"
+    "  is_active TINYINT NOT NULL DEFAULT 1,"
+    "  UNIQUE KEY uq_master_drones_name (name)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS reports ("
+    "  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  employee_telegram_id BIGINT NOT NULL,"
+    "  report_date DATE NOT NULL,"
+    "  site_name VARCHAR(100) NOT NULL,"
+    "  drone_name VARCHAR(100) NOT NULL,"
+    "  base_height_m DECIMAL(8,3) NULL,"
+    "  pilot_name VARCHAR(100) NULL,"
+    "  copilot_name VARCHAR(100) NULL,"
+    "  dgps_used_json JSON NULL,"
+    "  dgps_operators_json JSON NULL,"
+    "  grid_numbers_json JSON NULL,"
+    "  gcp_points_json JSON NULL,"
+    "  total_area_sq_km DECIMAL(10,3) NULL,"
+    "  total_time_min INT NULL,"
+    "  remark TEXT NULL,"
+    "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+    "  UNIQUE KEY uq_emp_date (employee_telegram_id, report_date)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    "CREATE TABLE IF NOT EXISTS report_flights ("
+    "  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+    "  report_id BIGINT UNSIGNED NOT NULL,"
+    "  flight_time_min INT NOT NULL,"
+    "  area_sq_km DECIMAL(10,3) NOT NULL,"
+    "  uav_rover_file VARCHAR(200) NOT NULL,"
+    "  drone_base_file_no VARCHAR(100) NOT NULL,"
+    "  KEY idx_report_flights_report (report_id),"
+    "  CONSTRAINT fk_report_flights_report FOREIGN KEY (report_id) REFERENCES reports (id) ON DELETE CASCADE"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+]
+
+
+def _ensure_index(table, name, cols):
+    """
+    Step adding KEY name (cols) unless an index already starts with those
+    columns: hand-made databases carry their own, differently named ones.
+    """
+    def step(cur):
+        cur.execute(
+            "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (table,),
+        )
+        have = {}
+        for idx, col in cur.fetchall():
+            have.setdefault(idx, []).append(col.decode() if isinstance(col, (bytes, bytearray)) else col)
+        if any(c[:len(cols)] == list(cols) for c in have.values()):
+            return
+        cur.execute(f"ALTER TABLE {table} ADD KEY {name} ({', '.join(cols)})")
+    return step
+
+
+def _ensure_fulltext(table, name, cols):
+    """Step adding FULLTEXT KEY name (cols) unless a FULLTEXT index on exactly those columns exists."""
+    def step(cur):
+        cur.execute(
+            "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_TYPE = 'FULLTEXT' "
+            "ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (table,),
+        )
+        have = {}
+        for idx, col in cur.fetchall():
+            have.setdefault(idx, []).append(col.decode() if isinstance(col, (bytes, bytearray)) else col)
+        if list(cols) in have.values():
+            return
+        cur.execute(f"ALTER TABLE {table} ADD FULLTEXT KEY {name} ({', '.join(cols)})")
+    return step
+
+
+def _report_flights_cascade(cur):
+    # Deleting a report relies on its flights going with it (report_delete only removes reports).
+    cur.execute(
+        "SELECT rc.CONSTRAINT_NAME, rc.DELETE_RULE FROM information_schema.REFERENTIAL_CONSTRAINTS rc "
+        "JOIN information_schema.KEY_COLUMN_USAGE k ON k.CONSTRAINT_SCHEMA = rc.CONSTRAINT_SCHEMA "
+        " AND k.CONSTRAINT_NAME = rc.CONSTRAINT_NAME AND k.TABLE_NAME = rc.TABLE_NAME "
+        "WHERE rc.CONSTRAINT_SCHEMA = DATABASE() AND rc.TABLE_NAME = 'report_flights' "
+        " AND rc.REFERENCED_TABLE_NAME = 'reports' AND k.COLUMN_NAME = 'report_id'"
+    )
+    rows = [[v.decode() if isinstance(v, (bytes, bytearray)) else v for v in r] for r in cur.fetchall()]
+    if any(rule == "CASCADE" for _, rule in rows):
+        return
+    for name, _ in rows:
+        cur.execute(f"ALTER TABLE report_flights DROP FOREIGN KEY `{name}`")
+    # flights of reports deleted before the constraint existed
+    cur.execute("DELETE f FROM report_flights f LEFT JOIN reports r ON r.id = f.report_id WHERE r.id IS NULL")
+    cur.execute(
+        "ALTER TABLE report_flights ADD CONSTRAINT fk_report_flights_report "
+        "FOREIGN KEY (report_id) REFERENCES reports (id) ON DELETE CASCADE"
+    )
+
+
+def _grid_tile_keys(cur):
+    # Decoded tile of every grid entry; one UPDATE per distinct spelling.
+    from dgps_data.grid_coverage import parse_grid
+    cur.execute("SELECT DISTINCT item_key FROM report_grids WHERE tile_key IS NULL")
+    keys = [k.decode() if isinstance(k, (bytes, bytearray)) else k for (k,) in cur.fetchall()]
+    updates = [(p["tile_key"], k) for k, p in ((k, parse_grid(k)) for k in keys) if p]
+    if updates:
+        cur.executemany("UPDATE report_grids SET tile_key = %s WHERE item_key = %s AND tile_key IS NULL", updates)
+
+
+def _invitation_token_binary(cur):
+    # uuid text (36 chars) -> BINARY(16); dropping the old column drops its index.
+    cur.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'invitations' AND COLUMN_NAME = 'token'"
+    )
+    row = cur.fetchone()
+    data_type = row[0].decode() if isinstance(row[0], (bytes, bytearray)) else row[0]
+    if data_type == "binary":
+        return
+    cur.execute("ALTER TABLE invitations ADD COLUMN token_bin BINARY(16) NULL AFTER token")
+    cur.execute("UPDATE invitations SET token_bin = UUID_TO_BIN(token)")
+    cur.execute(
+        "ALTER TABLE invitations DROP COLUMN token, "
+        "CHANGE COLUMN token_bin token BINARY(16) NOT NULL, "
+        "ADD UNIQUE KEY uq_invitations_token (token)"
+    )
+
+
+def _rollup_table(table, col):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        f"  {col} INT UNSIGNED NOT NULL,"
+        "  report_date DATE NOT NULL,"
+        "  employee_telegram_id BIGINT NOT NULL,"
+        "  report_count INT NOT NULL DEFAULT 0,"
+        "  flight_count INT NOT NULL DEFAULT 0,"
+        "  total_min BIGINT NOT NULL DEFAULT 0,"
+        "  total_area DECIMAL(14,3) NOT NULL DEFAULT 0,"
+        f"  PRIMARY KEY ({col}, report_date, employee_telegram_id),"
+        f"  KEY idx_{table}_emp ({col}, employee_telegram_id, report_date)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+MIGRATIONS = [
+    (0, "baseline schema", BASELINE),
+    (1, "report list child tables", [
+        _list_table("report_dgps"),
+        _list_table("report_operators"),
+        _list_table("report_grids"),
+        _list_table("report_gcps"),
+    ]),
+    (2, "grid coverage rollup", [
+        "CREATE TABLE IF NOT EXISTS grid_coverage ("
+        "  site_id INT UNSIGNED NOT NULL,"
+        "  tile_key BIGINT UNSIGNED NOT NULL,"
+        "  grid_code VARCHAR(20) NOT NULL,"
+        "  first_date DATE NOT NULL,"
+        "  last_date DATE NOT NULL,"
+        "  report_count INT UNSIGNED NOT NULL DEFAULT 0,"
+        "  PRIMARY KEY (site_id, tile_key)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    ]),
+    (3, "site/drone keys on reports", [
+        _add_master_keys,
+        # (employee, site|drone, date) serves the team-scoped views and exports;
+        # (site|drone, date) serves the FKs and site-wide lookups.
+        "ALTER TABLE reports"
+        "  ADD KEY idx_reports_emp_site_date (employee_telegram_id, site_id, report_date),"
+        "  ADD KEY idx_reports_emp_drone_date (employee_telegram_id, drone_id, report_date),"
+        "  ADD KEY idx_reports_site_date (site_id, report_date),"
+        "  ADD KEY idx_reports_drone_date (drone_id, report_date)",
+        "ALTER TABLE reports"
+        "  ADD CONSTRAINT fk_reports_site FOREIGN KEY (site_id) REFERENCES master_sites (id),"
+        "  ADD CONSTRAINT fk_reports_drone FOREIGN KEY (drone_id) REFERENCES master_drones (id)",
+    ]),
+    (4, "query stats and slow-query log", [
+        # One row per (process, fingerprint), rewritten by each process's flusher
+        # (dgps_data.querylog); the admin page sums them.
+        "CREATE TABLE IF NOT EXISTS query_stats ("
+        "  source VARCHAR(64) NOT NULL,"
+        "  fp_id CHAR(16) NOT NULL,"
+        "  app VARCHAR(20) NOT NULL,"
+        "  fingerprint TEXT NOT NULL,"
+        "  calls BIGINT UNSIGNED NOT NULL,"
+        "  total_ms DOUBLE NOT NULL,"
+        "  max_ms DOUBLE NOT NULL,"
+        "  p95_ms DOUBLE NOT NULL,"
+        "  updated_at DATETIME NOT NULL,"
+        "  PRIMARY KEY (source, fp_id),"
+        "  KEY idx_query_stats_updated (updated_at)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+        "CREATE TABLE IF NOT EXISTS slow_queries ("
+        "  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        "  app VARCHAR(20) NOT NULL,"
+        "  fp_id CHAR(16) NOT NULL,"
+        "  ms DOUBLE NOT NULL,"
+        "  route VARCHAR(200) NOT NULL DEFAULT '',"
+        "  statement TEXT NOT NULL,"
+        "  params TEXT NULL,"
+        "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        "  KEY idx_slow_queries_fp (fp_id, id)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    ]),
+    (5, "team versions", [
+        # Bumped by the bot whenever a manager's team changes (dgps_data.teams).
+        "CREATE TABLE IF NOT EXISTS team_versions ("
+        "  manager_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,"
+        "  version BIGINT UNSIGNED NOT NULL DEFAULT 0,"
+        "  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    ]),
+    (6, "report versions", [
+        # Bumped on every report write (dgps_data.report_versions); export cache keys.
+        "CREATE TABLE IF NOT EXISTS report_versions ("
+        "  employee_telegram_id BIGINT NOT NULL PRIMARY KEY,"
+        "  version BIGINT UNSIGNED NOT NULL DEFAULT 0,"
+        "  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    ]),
+    (7, "daily site/drone rollups", [
+        # Maintained with each report write (dgps_data.rollups); totals read these.
+        _rollup_table("site_daily", "site_id"),
+        _rollup_table("drone_daily", "drone_id"),
+    ]),
+    (8, "hot query indexes, binary invitation tokens", [
+        # team lists: manager_id = %s AND role = 2 AND is_active = 1
+        _ensure_index("users", "idx_users_manager_role_active", ("manager_id", "role", "is_active")),
+        # tracking / daily lists: report_date = %s AND employee_telegram_id IN (...)
+        _ensure_index("reports", "idx_reports_emp_date", ("employee_telegram_id", "report_date")),
+        _ensure_index("report_flights", "idx_report_flights_report", ("report_id",)),
+        _ensure_index("manager_logins", "idx_manager_logins_login", ("login",)),
+        _ensure_index("manager_logins", "idx_manager_logins_telegram", ("telegram_id", "id")),
+        _ensure_index("join_requests", "idx_join_requests_manager", ("manager_id", "status", "created_at")),
+        _ensure_index("join_requests", "idx_join_requests_telegram", ("telegram_id", "invitation_id", "status")),
+        _invitation_token_binary,
+    ]),
+    (9, "report row version", [
+        # Bumped by every write to a report (edit, master rename); report preview cache key / ETag.
+        "ALTER TABLE reports ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1",
+    ]),
+    (10, "report change log", [
+        # Appended with each report write (dgps_data.report_changes); the dashboard live feed follows it.
+        "CREATE TABLE IF NOT EXISTS report_changes ("
+        "  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        "  kind VARCHAR(16) NOT NULL,"
+        "  report_id BIGINT UNSIGNED NOT NULL,"
+        "  employee_telegram_id BIGINT NOT NULL,"
+        "  report_date DATE NOT NULL,"
+        "  report_created_at DATETIME NULL,"
+        "  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        "  KEY idx_report_changes_created (created_at)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    ]),
+    (11, "report outbox payload and consumer checkpoints", [
+        # report_changes doubles as the outbox; consumers keep their position here (dgps_data.outbox).
+        "ALTER TABLE report_changes ADD COLUMN payload JSON NULL",
+        "CREATE TABLE IF NOT EXISTS outbox_checkpoints ("
+        "  consumer VARCHAR(64) NOT NULL PRIMARY KEY,"
+        "  last_id BIGINT UNSIGNED NOT NULL,"
+        "  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+    ]),
+    (12, "report text search", [
+        # Manager search over remarks, pilots and flight file names (dgps_data.text_search).
+        _ensure_fulltext("reports", "ft_reports_text", ("remark", "pilot_name", "copilot_name")),
+        _ensure_index("report_flights", "idx_report_flights_rover_file", ("uav_rover_file",)),
+        _ensure_index("report_flights", "idx_report_flights_base_file", ("drone_base_file_no",)),
+    ]),
+    (13, "report flights cascade", [
+        _report_flights_cascade,
+    ]),
+    (14, "grid tile keys", [
+        # Coverage refreshes find every spelling of a tile (grid_coverage.refresh).
+        "ALTER TABLE report_grids ADD COLUMN tile_key BIGINT UNSIGNED NULL, "
+        "ADD KEY idx_report_grids_tile (tile_key, report_id)",
+        _grid_tile_keys,
+    ]),
+]
+
+
+def _ensure_table(cur):
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "  version INT NOT NULL PRIMARY KEY,"
+        "  name VARCHAR(200) NOT NULL,"
+        "  applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def applied_versions(cur):
+    _ensure_table(cur)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {r[0] for r in cur.fetchall()}
+
+
+def migrate(conn=None):
+    """Apply every pending migration in version order. Returns the versions applied."""
+    own = conn is None
+    conn = conn or connect()
+    done = []
+    try:
+        with conn.cursor() as cur:
+            have = applied_versions(cur)
+            for version, name, steps in sorted(MIGRATIONS, key=lambda m: m[0]):
+                if version in have:
+                    continue
+                logger.info("Applying migration %s: %s", version, name)
+                for step in steps:
+                    if callable(step):
+                        step(cur)
+                    else:
+                        cur.execute(step)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name),
+                )
+                done.append(version)
+    finally:
+        if own:
+            conn.close()
+    return done
+
+
+def status(conn=None):
+    own = conn is None
+    conn = conn or connect()
+    try:
+        with conn.cursor() as cur:
+            have = applied_versions(cur)
+        return [(v, n, v in have) for v, n, _ in sorted(MIGRATIONS, key=lambda m: m[0])]
+    finally:
+        if own:
+            conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    if "--status" in sys.argv[1:]:
+        for version, name, ok in status():
+            print(f"{version:>4}  {'applied' if ok else 'PENDING':8}  {name}")
+    else:
+        applied = migrate()
+        print(f"Applied: {applied}" if applied else "Nothing to apply.")
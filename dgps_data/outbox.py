@@ -0,0 +1,137 @@
+"""
+Consumers of the report outbox (report_changes, dgps_data.report_changes).
+
+Every report write appends its change row in the same transaction as the
+report, so a change exists exactly when its report does. A Consumer reads the
+log in batches after its checkpoint (outbox_checkpoints, migration 11, one row
+per consumer name) and moves the checkpoint only over rows the caller has
+acknowledged: delivery is at-least-once, a crash between handling and commit
+re-delivers the batch.
+
+    consumer = outbox.Consumer("bot-notify", batch=100)
+    rows = consumer.fetch()              # blocking; from a thread in async code
+    ... handle rows, stop at the first one that should be retried ...
+    consumer.commit(handled_rows)
+
+Ids are allocated at INSERT and become visible at COMMIT, so an id can appear
+after a higher one. The checkpoint therefore only moves over a contiguous run
+of handled ids; a gap is skipped once the row after it is `settle_s` seconds
+old (a rolled-back writer). A new consumer starts at the head of the log.
+
+Lag per consumer (pending rows, age of the oldest one) for /metrics and ops:
+
+    python -m dgps_data.outbox lag
+"""
+import sys
+import logging
+import threading
+
+from dgps_data import report_changes
+from dgps_data.config import connect
+
+logger = logging.getLogger("dgps_data.outbox")
+
+
+class Consumer:
+    def __init__(self, name, batch=100, settle_s=30):
+        self.name = name
+        self.batch = batch
+        self.settle_s = settle_s
+        self.checkpoint = None
+        self._done = set()    # acknowledged ids above the checkpoint
+        self._polled = []     # the last batch, for the gap check
+        self._conn = None
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.polls = 0
+
+    def _query(self, fn):
+        with self._lock:
+            try:
+                if self._conn is None or not self._conn.is_connected():
+                    self._conn = connect()  # autocommit: each read sees the latest commits
+                with self._conn.cursor(dictionary=True) as cur:
+                    return fn(cur)
+            except Exception:
+                self._conn = None
+                raise
+
+    def _load(self, cur):
+        cur.execute("SELECT last_id FROM outbox_checkpoints WHERE consumer = %s", (self.name,))
+        row = cur.fetchone()
+        if row:
+            return int(row["last_id"])
+        head = report_changes.latest_id(cur)
+        cur.execute("INSERT INTO outbox_checkpoints (consumer, last_id) VALUES (%s, %s)", (self.name, head))
+        logger.info("Outbox consumer %s starts at %s", self.name, head)
+        return head
+
+    def _advance(self, cur):
+        """Move the checkpoint over the acknowledged run (and settled gaps) of the last batch."""
+        last = self.checkpoint
+        for r in self._polled:
+            if r["id"] not in self._done:
+                break
+            if r["id"] != last + 1 and r["age_s"] < self.settle_s:
+                break  # a lower id may still commit
+            last = r["id"]
+        if last != self.checkpoint:
+            cur.execute("UPDATE outbox_checkpoints SET last_id = %s WHERE consumer = %s", (last, self.name))
+            self.checkpoint = last
+            self._done = {i for i in self._done if i > last}
+
+    def fetch(self):
+        """The next rows not yet acknowledged, oldest first (at most `batch`)."""
+        def run(cur):
+            if self.checkpoint is None:
+                self.checkpoint = self._load(cur)
+            self._polled = report_changes.since(cur, self.checkpoint, limit=self.batch + len(self._done))
+            self.polls += 1
+            self._advance(cur)  # a gap that has settled since the last commit
+            return [r for r in self._polled if r["id"] not in self._done][:self.batch]
+        return self._query(run)
+
+    def commit(self, rows):
+        """Acknowledge handled rows; persists the checkpoint when it can move."""
+        self._done.update(r["id"] for r in rows)
+        self.delivered += len(rows)
+        self._query(self._advance)
+
+    def stats(self):
+        return {"consumer": self.name, "checkpoint": self.checkpoint, "delivered": self.delivered,
+                "polls": self.polls, "acked_ahead": len(self._done)}
+
+
+def lag(cur):
+    """Per consumer: checkpoint, head of the log, pending rows and the age of the oldest (seconds)."""
+    cur.execute(
+        "SELECT k.consumer, k.last_id, k.updated_at, h.head_id, "
+        "(SELECT COUNT(*) FROM report_changes c WHERE c.id > k.last_id) AS pending, "
+        "(SELECT TIMESTAMPDIFF(SECOND, MIN(c.created_at), NOW()) FROM report_changes c "
+        " WHERE c.id > k.last_id) AS oldest_pending_s "
+        "FROM outbox_checkpoints k CROSS JOIN (SELECT COALESCE(MAX(id), 0) AS head_id FROM report_changes) h "
+        "ORDER BY k.consumer"
+    )
+    rows = cur.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(cur.column_names, r)) for r in rows]
+    return [{**r, "updated_at": str(r["updated_at"])} for r in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Report outbox consumers")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("lag", help="pending rows per consumer")
+    args = ap.parse_args()
+
+    conn = connect()
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            for r in lag(cur):
+                print(f"{r['consumer']:<24} checkpoint={r['last_id']} head={r['head_id']} "
+                      f"pending={r['pending']} oldest={r['oldest_pending_s'] or 0}s")
+    finally:
+        conn.close()
+    sys.exit(0)
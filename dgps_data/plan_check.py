@@ -0,0 +1,232 @@
+"""
+EXPLAIN every known hot query and fail on full scans.
+
+The statements are not copies: QUERIES calls the code the apps run (repos,
+teams, view_tabs, report_search, text_search, rollups, ...) with a recording
+cursor that captures the first statement instead of executing it. The few
+statements still written inline in bot.py / the dashboard are in INLINE with
+the file they come from; tests/test_plan_check.py fails when one of them no
+longer appears there verbatim.
+
+Parameters come from a sample of the live data (EXPLAIN only, nothing is
+executed). A plan that reads a table with type ALL or a full index scan is
+reported; tables smaller than --min-rows are ignored, since MySQL rightly
+scans tiny tables.
+
+    python -m dgps_data.plan_check                 # exit 1 on a full scan
+    python -m dgps_data.plan_check --min-rows 0 -v # every table, every plan
+"""
+import sys
+import logging
+from datetime import date
+
+from dgps_data import (keyset, teams, repos, view_tabs, report_search, text_search, rollups,
+                       grid_coverage, report_changes, report_index)
+
+logger = logging.getLogger("dgps_data.plan_check")
+
+FULL_SCANS = ("ALL", "index")
+ROLE_EMPLOYEE = teams.ROLE_EMPLOYEE
+STAFF_ROLES = (0, 1)  # admin, manager (bot.py)
+
+
+# ----------------- Capturing the real statements -----------------
+class _Captured(Exception):
+    pass
+
+
+class Recorder:
+    """
+    Stands in for a cursor and for a connection's repos.Statements: keeps the
+    first statement and stops the caller there.
+    """
+    connection_id = 0
+
+    def __init__(self):
+        self._dgps_statements = self  # repos.statements(recorder) -> recorder
+        self.sql, self.params = None, None
+
+    def execute(self, sql, params=()):
+        self.sql, self.params = sql, list(params or ())
+        raise _Captured
+
+    run = one = all = write = execute
+
+
+def capture(fn, s):
+    """(sql, params) of the first statement fn(recorder, sample) runs; None if it runs none."""
+    rec = Recorder()
+    try:
+        fn(rec, s)
+    except _Captured:
+        return rec.sql, rec.params
+    return None
+
+
+def _page(tab):
+    return lambda q, s: q.execute(view_tabs.page_sql(tab(s)), tab(s)["params"] + [keyset.PAGE_SIZE + 1])
+
+
+def _search(**filters):
+    f = {"employee": [], "site_id": [], "drone_id": [], "from": None, "to": None}
+    f.update(filters)
+    return lambda s: {k: (v(s) if callable(v) else v) for k, v in f.items()}
+
+
+# label -> fn(recorder, sample), calling the apps' own code
+QUERIES = {
+    # bot / intake
+    "user by telegram id": lambda q, s: repos.Users(q).by_telegram(s["tg"]),
+    "active staff record": lambda q, s: repos.Users(q).staff_by_telegram(s["tg"], STAFF_ROLES),
+    "active team": lambda q, s: teams.load_members(q, s["mgr"]),
+    "report team": lambda q, s: teams.load_members(q, s["mgr"], include_inactive=True),
+    "report changes of manager": lambda q, s: report_changes.since(q, s["change_id"], s["mgr"]),
+    # dashboard
+    "manager user id": lambda q, s: repos.Users(q).id_for_telegram(s["mgr_tg"]),
+    "tracking (date + team)": lambda q, s: repos.Reports(q).submitted_on(s["date"], s["team"]),
+    "reports of employee on date": lambda q, s: repos.Reports(q).of_employee_on(s["date"], s["tg"]),
+    "report flights": lambda q, s: repos.Reports(q).flights(s["report_id"]),
+    "view/date page": _page(lambda s: view_tabs.by_date(s["mgr"], s["date"])),
+    "view/date range page": _page(lambda s: view_tabs.by_date(s["mgr"], d_from=s["date"], d_to=s["date"])),
+    "view/date count": lambda q, s: q.execute(view_tabs.count_sql(view_tabs.by_date(s["mgr"], s["date"])),
+                                              view_tabs.by_date(s["mgr"], s["date"])["params"]),
+    "view/employee page": _page(lambda s: view_tabs.by_employee(s["tg"])),
+    "view/sites page": _page(lambda s: view_tabs.by_site(s["mgr"], s["site_id"])),
+    "view/drones page (date)": _page(lambda s: view_tabs.by_drone(s["mgr"], s["drone_id"], s["date"])),
+    "site rollup total": lambda q, s: rollups.totals(q, "site", s["site_id"], manager_id=s["mgr"]),
+    "grid coverage refresh": lambda q, s: grid_coverage.refresh(q, s["site_id"], [s["grid"]]),
+    "grid lookup": lambda q, s: q.execute(report_index.lookup_sql("grid_numbers"), [s["grid"], s["mgr"]]),
+    "grid lookup (prefix)": lambda q, s: q.execute(report_index.lookup_sql("grid_numbers", prefix=True),
+                                                   [text_search.like_prefix(s["grid"][:3]), s["mgr"]]),
+    "search page (team)": lambda q, s: report_search.page(q, *report_search.where(_search()(s), s["team"])),
+    "search page (site)": lambda q, s: report_search.page(
+        q, *report_search.where(_search(site_id=lambda s: [s["site_id"]])(s), s["team"])),
+    "search page (drone + dates)": lambda q, s: report_search.page(
+        q, *report_search.where(_search(drone_id=lambda s: [s["drone_id"]], **{"from": lambda s: s["date"]})(s),
+                                s["team"])),
+    "search facets": lambda q, s: report_search.facets(q, *report_search.where(_search()(s), s["team"]), {}),
+    "text search": lambda q, s: text_search.text(q, "survey", s["team"]),
+    "file name search": lambda q, s: text_search.files(q, s["file"], s["team"]),
+}
+
+# Still written inline: (file, exact statement, params from the sample)
+INLINE = {
+    "latest manager login": (
+        "bot.py", "SELECT * FROM manager_logins WHERE telegram_id=%s ORDER BY id DESC LIMIT 1",
+        lambda s: (s["mgr_tg"],)),
+    "invitation by token": ("bot.py", "SELECT * FROM invitations WHERE token=%s", lambda s: (s["token"],)),
+    "pending join request": (
+        "bot.py", "SELECT * FROM join_requests WHERE telegram_id=%s AND invitation_id=%s AND status='pending' "
+        "ORDER BY id DESC LIMIT 1", lambda s: (s["tg"], s["invitation_id"])),
+    "pending join requests of manager": (
+        "bot.py", "SELECT * FROM join_requests WHERE manager_id=%s AND status='pending' ORDER BY created_at ASC LIMIT %s",
+        lambda s: (s["mgr"], 25)),
+    "employees of manager": (
+        "bot.py", "SELECT id, telegram_id, username, first_name, last_name, phone, is_active "
+        "FROM users WHERE role=%s AND manager_id=%s ORDER BY created_at DESC, id DESC LIMIT %s",
+        lambda s: (ROLE_EMPLOYEE, s["mgr"], 25)),
+    "session token": (
+        "managers_report/app.py", "SELECT session_token FROM manager_logins WHERE login = %s LIMIT 1",
+        lambda s: (s["login"],)),
+    "site coverage": (
+        "managers_report/app.py", "SELECT tile_key, grid_code, first_date, last_date, report_count "
+        "FROM grid_coverage WHERE site_id = %s ORDER BY tile_key", lambda s: (s["site_id"],)),
+}
+
+
+def statements(s):
+    """[(label, sql, params)] of every checked statement for the sample s."""
+    out = []
+    for label, fn in QUERIES.items():
+        got = capture(fn, s)
+        if got is None:
+            logger.info("%s: no statement for this sample", label)
+            continue
+        out.append((label,) + got)
+    for label, (_, sql, params) in INLINE.items():
+        out.append((label, sql, list(params(s))))
+    return out
+
+
+def _one(cur, sql, params=()):
+    cur.execute(sql, params)
+    return cur.fetchone()
+
+
+def sample(cur):
+    """Real ids from the database, so the optimizer sees representative values."""
+    s = {"mgr": 0, "mgr_tg": 0, "tg": 0, "team": [0], "login": "", "token": b"\0" * 16, "invitation_id": 0,
+         "report_id": 0, "date": date.today().isoformat(), "site_id": 0, "drone_id": 0, "grid": "H1R1A1",
+         "file": "R20", "change_id": 0}
+    row = _one(cur, "SELECT manager_id, COUNT(*) AS n FROM users WHERE role = %s AND manager_id IS NOT NULL "
+                    "GROUP BY manager_id ORDER BY n DESC LIMIT 1", (ROLE_EMPLOYEE,))
+    if row:
+        s["mgr"] = row["manager_id"]
+        cur.execute("SELECT telegram_id FROM users WHERE manager_id = %s AND role = %s", (s["mgr"], ROLE_EMPLOYEE))
+        s["team"] = [r["telegram_id"] for r in cur.fetchall()] or [0]
+        s["tg"] = s["team"][0]
+        m = _one(cur, "SELECT telegram_id FROM users WHERE id = %s", (s["mgr"],))
+        s["mgr_tg"] = m["telegram_id"] if m else 0
+    row = _one(cur, "SELECT login FROM manager_logins ORDER BY id DESC LIMIT 1")
+    s["login"] = row["login"] if row else ""
+    row = _one(cur, "SELECT id, token FROM invitations ORDER BY id DESC LIMIT 1")
+    if row:
+        s["invitation_id"], s["token"] = row["id"], row["token"]
+    row = _one(cur, "SELECT id, report_date, site_id, drone_id FROM reports ORDER BY id DESC LIMIT 1")
+    if row:
+        s.update(report_id=row["id"], date=str(row["report_date"]), site_id=row["site_id"] or 0,
+                 drone_id=row["drone_id"] or 0)
+    row = _one(cur, "SELECT item_key FROM report_grids ORDER BY report_id DESC LIMIT 1")
+    s["grid"] = row["item_key"] if row else s["grid"]
+    row = _one(cur, "SELECT uav_rover_file FROM report_flights ORDER BY id DESC LIMIT 1")
+    s["file"] = row["uav_rover_file"][:8] if row and len(row["uav_rover_file"]) >= 3 else s["file"]
+    s["change_id"] = max(0, report_changes.latest_id(cur) - 100)
+    return s
+
+
+def table_rows(cur):
+    cur.execute("SELECT TABLE_NAME AS t, TABLE_ROWS AS n FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE()")
+    return {r["t"]: int(r["n"] or 0) for r in cur.fetchall()}
+
+
+def check(conn, min_rows=1000, verbose=False):
+    """Returns [(label, table, type, key, rows)] of the plans that scan a table in full."""
+    bad = []
+    with conn.cursor(dictionary=True) as cur:
+        s = sample(cur)
+        sizes = table_rows(cur)
+        aliases = {"r": "reports", "u": "users", "d": "site_daily", "g": "report_grids", "c": "report_changes"}
+        for label, sql, params in statements(s):
+            cur.execute("EXPLAIN " + sql, params)
+            for p in cur.fetchall():
+                table = aliases.get(p["table"], p["table"]) or "-"
+                scan = p["type"] in FULL_SCANS and sizes.get(table, 0) >= min_rows
+                if scan:
+                    bad.append((label, table, p["type"], p["key"], p["rows"]))
+                if verbose or scan:
+                    print(f"{'FULL' if scan else 'ok  '} {label:<34} {table:<16} type={p['type']} "
+                          f"key={p['key']} rows={p['rows']}")
+    return bad
+
+
+if __name__ == "__main__":
+    import argparse
+    from dgps_data.config import connect
+
+    ap = argparse.ArgumentParser(description="EXPLAIN the hot queries; exit 1 on a full scan")
+    ap.add_argument("--min-rows", type=int, default=1000, help="ignore tables smaller than this")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    conn = connect()
+    try:
+        bad = check(conn, min_rows=args.min_rows, verbose=args.verbose)
+    finally:
+        conn.close()
+    if bad:
+        print(f"{len(bad)} full scan(s).")
+        sys.exit(1)
+    print(f"{len(QUERIES) + len(INLINE)} queries, no full scans.")
+    sys.exit(0)
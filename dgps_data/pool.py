@@ -0,0 +1,189 @@
+"""
+Bounded MySQL pool with admission control.
+
+mysql.connector's pool raises PoolError the moment all connections are out.
+BoundedPool puts a wait queue in front of it instead: a checkout waits up to
+checkout_timeout for a free connection, at most max_waiters callers queue, and
+anything beyond that (or a timeout) raises PoolSaturated, which the apps turn
+into 503 + Retry-After. Limiter caps how many requests of one kind (e.g. Excel
+exports) run at once, so they can't take every connection.
+
+Checkouts block the calling thread: use it from threads (Flask, FastAPI sync
+code / run_in_threadpool), not from an event loop. Checkouts are timed as a
+request phase and their cursors are tracked (dgps_data.timing / querylog).
+
+Sessions are not reset when a connection goes back (pool_reset_session=False),
+so the server-side prepared statements of dgps_data.repos survive from one
+checkout to the next; an uncommitted transaction is rolled back instead.
+"""
+import time
+import threading
+from collections import deque
+
+from mysql.connector import pooling
+
+from dgps_data import timing
+from dgps_data.querylog import TrackedConnection
+
+_RECENT = 1000  # waits kept for percentiles
+
+
+class PoolSaturated(Exception):
+    """No connection (or limiter slot) within the allowed wait; retry later."""
+
+    def __init__(self, name, reason, retry_after=2):
+        super().__init__(f"{name}: {reason}")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class _Gate:
+    """Semaphore + bounded wait queue + counters (shared by BoundedPool and Limiter)."""
+
+    def __init__(self, name, size, timeout, max_waiters, retry_after):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.retry_after = retry_after
+        self._sem = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._waits_ms = deque(maxlen=_RECENT)
+
+    def acquire(self):
+        if not self._sem.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_waiters:
+                    self.rejected += 1
+                    raise PoolSaturated(self.name, "wait queue full", self.retry_after)
+                self.waiting += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+            t0 = time.perf_counter()
+            try:
+                ok = self._sem.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            waited_ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self._waits_ms.append(waited_ms)
+                if not ok:
+                    self.timeouts += 1
+                    raise PoolSaturated(self.name, f"no slot within {self.timeout:g}s", self.retry_after)
+                self.waited += 1
+        else:
+            with self._lock:
+                self._waits_ms.append(0.0)
+        with self._lock:
+            self.in_use += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._sem.release()
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._waits_ms)
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "admitted": self.admitted,
+                "waited": self.waited,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "wait_ms_p50": round(_percentile(waits, 0.50), 2),
+                "wait_ms_p95": round(_percentile(waits, 0.95), 2),
+                "wait_ms_max": round(max(waits), 2) if waits else 0.0,
+            }
+
+
+class _Checkout(TrackedConnection):
+    """A pooled connection that gives its slot back exactly once on close()."""
+
+    def __init__(self, conn, gate):
+        super().__init__(conn)
+        self._gate = gate
+
+    def close(self):
+        gate, self._gate = self._gate, None
+        try:
+            try:
+                if gate is not None and self._conn.in_transaction:  # no session reset on return
+                    self._conn.rollback()
+            finally:
+                self._conn.close()
+        finally:
+            if gate is not None:
+                gate.release()
+
+    def __del__(self):
+        if self._gate is not None:
+            self.close()
+
+
+class BoundedPool:
+    def __init__(self, pool_name, pool_size, checkout_timeout=2.0, max_waiters=None, retry_after=2, **dbconfig):
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name=pool_name, pool_size=pool_size, pool_reset_session=False, **dbconfig
+        )
+        self._gate = _Gate(pool_name, pool_size, checkout_timeout,
+                           pool_size * 4 if max_waiters is None else max_waiters, retry_after)
+
+    @property
+    def pool_name(self):
+        return self._gate.name
+
+    def get_connection(self):
+        with timing.phase("db-checkout"):
+            self._gate.acquire()
+            try:
+                conn = self._pool.get_connection()
+            except Exception:
+                self._gate.release()
+                raise
+        return _Checkout(conn, self._gate)
+
+    def stats(self):
+        return self._gate.stats()
+
+
+class Limiter:
+    """
+    Per-endpoint concurrency cap:
+
+        EXPORTS = Limiter("exports", 2, timeout=0)
+        with EXPORTS:
+            ...
+    """
+
+    def __init__(self, name, limit, timeout=0.0, max_waiters=0, retry_after=5):
+        self._gate = _Gate(name, limit, timeout, max_waiters, retry_after)
+
+    def __enter__(self):
+        self._gate.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._gate.release()
+
+    def stats(self):
+        return self._gate.stats()
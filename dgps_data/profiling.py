@@ -0,0 +1,261 @@
+"""
+On-demand request profiling.
+
+A request is profiled (cProfile, from the first hook to the response) when
+
+  * it carries a valid `X-Profile` header, signed with PROFILE_SECRET
+    (`python -m dgps_data.profiling sign` prints one, valid PROFILE_HEADER_TTL s);
+  * an admin adds `?_profile=1` (dashboard only, see init_flask);
+  * or it is picked by PROFILE_SAMPLE_RATE (0..1).
+
+Each profile is written to PROFILE_DIR as <id>.prof (pstats, opens in snakeviz)
+plus <id>.json with route, status and timing; the newest PROFILE_KEEP are kept.
+The dashboard's /admin/profiles lists them. The response carries X-Profile-Id.
+
+Nothing is installed unless one of the switches is on (ENABLED): PROFILE_SECRET,
+PROFILE_SAMPLE_RATE > 0 or PROFILING=1, so requests pay nothing otherwise.
+Only one request is profiled at a time per process; others run unprofiled.
+Before Python 3.12 cProfile only sees the thread that enabled it, so under
+server.py work handed to the threadpool (DB calls) shows up as time awaited;
+from 3.12 it sees every thread, including other requests running meanwhile.
+"""
+import io
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import random
+import pstats
+import hashlib
+import logging
+import cProfile
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger("dgps_data.profiling")
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROFILE_DIR        = os.getenv("PROFILE_DIR", os.path.join(_ROOT, "profiles"))
+PROFILE_SECRET     = os.getenv("PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER_TTL = int(os.getenv("PROFILE_HEADER_TTL", "600"))
+PROFILE_KEEP       = int(os.getenv("PROFILE_KEEP", "200"))
+
+ENABLED = bool(PROFILE_SECRET) or PROFILE_SAMPLE_RATE > 0 or os.getenv("PROFILING") == "1"
+
+HEADER = "X-Profile"
+_ID_RE = re.compile(r"^\d{8}T\d{12}Z_[a-z]+_\d+$")
+
+# cProfile can't run two profilers at once (3.12+), and one request at a time
+# is plenty for diagnosis.
+_busy = threading.Lock()
+
+
+# ----------------- Triggers -----------------
+def sign(ts=None) -> str:
+    """Header value for X-Profile: '<unix ts>:<hmac>'."""
+    ts = str(int(ts if ts is not None else time.time()))
+    sig = hmac.new(PROFILE_SECRET.encode(), f"profile:{ts}".encode(), hashlib.sha256).hexdigest()
+    return f"{ts}:{sig}"
+
+
+def verify_header(value) -> bool:
+    if not PROFILE_SECRET or not value:
+        return False
+    ts, _, sig = value.partition(":")
+    if not ts.isdigit() or abs(time.time() - int(ts)) > PROFILE_HEADER_TTL:
+        return False
+    return hmac.compare_digest(sign(ts).partition(":")[2], sig)
+
+
+def sampled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+# ----------------- Profile lifecycle -----------------
+class Capture:
+    """One profiled request (holds the process-wide profiling slot until saved)."""
+
+    def __init__(self, reason, app):
+        self.reason = reason
+        self.app = app
+        self.created = datetime.now(timezone.utc)
+        self.id = f"{self.created.strftime('%Y%m%dT%H%M%S%fZ')}_{app}_{os.getpid()}"
+        self.prof = cProfile.Profile()
+        self.t0 = time.perf_counter()
+        self.prof.enable()
+
+    def stop(self):
+        self.prof.disable()
+        return (time.perf_counter() - self.t0) * 1000
+
+    def save(self, method, route, path, status, total_ms):
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            self.prof.dump_stats(os.path.join(PROFILE_DIR, self.id + ".prof"))
+            meta = {
+                "id": self.id, "app": self.app, "method": method, "route": route, "path": path,
+                "status": status, "total_ms": round(total_ms, 2), "reason": self.reason,
+                "created_at": self.created.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            with open(os.path.join(PROFILE_DIR, self.id + ".json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            logger.info("Profiled %s %s (%s, %.1f ms) -> %s", method, route, self.reason, total_ms, self.id)
+            _prune()
+            return self.id
+        except Exception as e:
+            logger.warning("Saving profile failed: %s", e)
+            return None
+        finally:
+            _busy.release()
+
+
+def begin(reason, app):
+    """Start profiling if the slot is free; None when another request holds it."""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        return Capture(reason, app)
+    except Exception as e:  # e.g. another profiler/debugger is active
+        _busy.release()
+        logger.warning("Cannot start profiler: %s", e)
+        return None
+
+
+def _prune():
+    metas = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
+    for name in metas[:-PROFILE_KEEP] if len(metas) > PROFILE_KEEP else []:
+        base = name[:-5]
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, base + ext))
+            except OSError:
+                pass
+
+
+# ----------------- Reading (viewer) -----------------
+def valid_id(pid) -> bool:
+    return bool(pid) and _ID_RE.match(pid) is not None
+
+
+def list_profiles(limit=100):
+    """Newest first: the .json metadata of each stored profile."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted((f for f in os.listdir(PROFILE_DIR) if f.endswith(".json")), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def prof_path(pid):
+    if not valid_id(pid):
+        return None
+    path = os.path.join(PROFILE_DIR, pid + ".prof")
+    return path if os.path.isfile(path) else None
+
+
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+
+def report(pid, sort="cumulative", limit=60):
+    """pstats text for one profile (None if unknown)."""
+    path = prof_path(pid)
+    if path is None:
+        return None
+    buf = io.StringIO()
+    st = pstats.Stats(path, stream=buf)
+    st.strip_dirs().sort_stats(sort if sort in SORT_KEYS else "cumulative").print_stats(limit)
+    return buf.getvalue()
+
+
+# ----------------- Framework glue -----------------
+class ASGIProfilingMiddleware:
+    """X-Profile header / sampling for server.py. Add only when ENABLED."""
+
+    def __init__(self, app, app_name="webapp"):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        reason = None
+        for k, v in scope.get("headers", ()):
+            if k == b"x-profile":
+                reason = "header" if verify_header(v.decode("latin-1")) else None
+                break
+        if reason is None and sampled():
+            reason = "sample"
+        cap = begin(reason, self.app_name) if reason else None
+        if cap is None:
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", cap.id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            total = cap.stop()
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            cap.save(scope.get("method", ""), route, scope.get("path", ""), status[0], total)
+
+
+def init_flask(app, is_admin, app_name="dashboard"):
+    """Header / admin `?_profile=1` / sampling for a Flask app; no-op unless ENABLED."""
+    if not ENABLED:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _profile_start():
+        reason = None
+        if request.args.get("_profile") == "1" and is_admin():
+            reason = "admin"
+        elif HEADER in request.headers:
+            reason = "header" if verify_header(request.headers[HEADER]) else None
+        elif sampled():
+            reason = "sample"
+        if reason:
+            g._profile = begin(reason, app_name)
+
+    @app.after_request
+    def _profile_status(resp):
+        cap = getattr(g, "_profile", None)
+        if cap is not None:
+            g._profile_status = resp.status_code
+            resp.headers["X-Profile-Id"] = cap.id
+        return resp
+
+    @app.teardown_request
+    def _profile_finish(exc):
+        cap = g.pop("_profile", None)
+        if cap is None:
+            return
+        total = cap.stop()
+        route = request.url_rule.rule if request.url_rule else request.path
+        cap.save(request.method, route, request.path, g.pop("_profile_status", 500), total)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["sign"]:
+        if not PROFILE_SECRET:
+            sys.exit("PROFILE_SECRET is not set.")
+        print(f"{HEADER}: {sign()}")
+    else:
+        sys.exit("usage: python -m dgps_data.profiling sign")
@@ -0,0 +1,322 @@
+"""
+Query fingerprints and the slow-query log.
+
+Every statement run through a tracked connection (BoundedPool checkouts in
+server.py and the dashboard, track() around bot.py's pool) is timed inside
+execute() and the fetch calls until the result set is exhausted; work the
+caller does between fetches is not counted. Statements are normalized into
+fingerprints ("SELECT ... WHERE id = ? AND x IN (...)") and STATS keeps
+count / total / max / p95 per fingerprint. Anything slower than SLOW_QUERY_MS
+is logged and queued for the dashboard's admin page, where it can be EXPLAINed.
+
+Bind parameters (session tokens, password hashes, invitation tokens...) are
+not kept unless SLOW_QUERY_PARAMS=1, and then each value is cut to
+SLOW_QUERY_PARAM_CHARS. Without them EXPLAIN binds NULLs, which can change the
+plan of an equality on a placeholder.
+
+start_flusher() writes each process's numbers to query_stats / slow_queries
+(migration 4) in the background, so the admin page sees all three apps.
+"""
+import os
+import re
+import time
+import socket
+import hashlib
+import logging
+import threading
+from collections import deque, defaultdict
+
+import orjson
+
+from dgps_data import timing
+
+logger = logging.getLogger("dgps_data.querylog")
+
+SLOW_QUERY_MS    = float(os.getenv("SLOW_QUERY_MS", "200"))
+FLUSH_INTERVAL_S = float(os.getenv("QUERY_STATS_FLUSH_S", "60"))
+SLOW_KEEP        = int(os.getenv("SLOW_QUERY_KEEP", "2000"))  # rows kept in slow_queries
+LOG_PARAMS       = os.getenv("SLOW_QUERY_PARAMS") == "1"         # opt-in: values are readable by admins
+PARAM_CHARS      = int(os.getenv("SLOW_QUERY_PARAM_CHARS", "64"))
+_RECENT = 200  # durations kept per fingerprint for p95
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRING_RE  = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE  = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE   = re.compile(r"%s|%\(\w+\)s")
+_INLIST_RE  = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS_RE    = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_WS_RE      = re.compile(r"\s+")
+
+
+def fingerprint(sql) -> str:
+    """Statement shape with literals and placeholders replaced: one entry per query, not per call."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    s = _COMMENT_RE.sub(" ", sql)
+    s = _STRING_RE.sub("?", s)
+    s = _PARAM_RE.sub("?", s)
+    s = _NUMBER_RE.sub("?", s)
+    s = _INLIST_RE.sub("(...)", s)
+    s = _ROWS_RE.sub(r"\1", s)
+    return _WS_RE.sub(" ", s).strip()
+
+
+def fp_id(fp: str) -> str:
+    return hashlib.sha1(fp.encode("utf-8")).hexdigest()[:16]
+
+
+def _truncate(v):
+    if isinstance(v, (bytes, bytearray)):
+        v = v.hex()
+    if isinstance(v, str) and len(v) > PARAM_CHARS:
+        return v[:PARAM_CHARS] + "..."
+    return v
+
+
+def loggable_params(params):
+    """Bind parameters as kept with a slow query: None unless SLOW_QUERY_PARAMS=1, else truncated."""
+    if not LOG_PARAMS or not params:
+        return None
+    if isinstance(params, dict):
+        return {k: _truncate(v) for k, v in params.items()}
+    return [_truncate(v) for v in params]
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._total = defaultdict(float)
+        self._max = defaultdict(float)
+        self._recent = defaultdict(lambda: deque(maxlen=_RECENT))
+        self._fps = {}
+        self._slow = deque(maxlen=500)  # waiting for the flusher
+
+    def record(self, sql, params, ms):
+        fp = fingerprint(sql)
+        key = fp_id(fp)
+        with self._lock:
+            self._fps[key] = fp
+            self._calls[key] += 1
+            self._total[key] += ms
+            if ms > self._max[key]:
+                self._max[key] = ms
+            self._recent[key].append(ms)
+        if ms >= SLOW_QUERY_MS:
+            t = timing.current()
+            route = getattr(t, "route", None) or ""
+            logger.warning("Slow query %.1f ms [%s] %s", ms, route or "-", fp)
+            stmt = sql.decode("utf-8", "replace") if isinstance(sql, (bytes, bytearray)) else sql
+            with self._lock:
+                self._slow.append((key, ms, route[:200], stmt, loggable_params(params)))
+
+    def snapshot(self, top=None):
+        with self._lock:
+            rows = [{
+                "fp_id": k,
+                "fingerprint": self._fps[k],
+                "calls": self._calls[k],
+                "total_ms": round(self._total[k], 2),
+                "avg_ms": round(self._total[k] / self._calls[k], 2),
+                "max_ms": round(self._max[k], 2),
+                "p95_ms": round(_percentile(self._recent[k], 0.95), 2),
+            } for k in self._calls]
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows[:top] if top else rows
+
+    def drain_slow(self):
+        with self._lock:
+            items = list(self._slow)
+            self._slow.clear()
+        return items
+
+
+STATS = QueryStats()
+
+
+# ----------------- Tracked cursor / connection -----------------
+def record(sql, params, ms):
+    """One finished statement: STATS, and a qN Server-Timing entry inside a timed request."""
+    t = timing.current()
+    if t is not None:
+        t.add_query(ms)
+    STATS.record(sql, params, ms)
+
+
+class TrackedCursor:
+    """
+    Cursor proxy: each statement is timed over execute() and its fetch calls
+    (until the result set is exhausted, or the next execute() / close()) and
+    recorded in STATS; inside a timed request it also becomes one qN entry of
+    Server-Timing. Time spent by the caller between fetches is not counted.
+    """
+
+    def __init__(self, cur):
+        self._cur = cur
+        self._pending = None  # [sql, params, ms so far]
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def _done(self):
+        if self._pending is None:
+            return
+        sql, params, ms = self._pending
+        self._pending = None
+        record(sql, params, ms)
+
+    def _timed(self, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += (time.perf_counter() - t0) * 1000
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._done()
+        self._pending = [operation, params, 0.0]
+        return self._timed(self._cur.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._done()
+        self._pending = [operation, None, 0.0]
+        return self._timed(self._cur.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        row = self._timed(self._cur.fetchone)
+        if row is None:
+            self._done()
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cur.fetchmany, *args, **kwargs)
+        if not rows:
+            self._done()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cur.fetchall)
+        self._done()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._done()
+        return self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrackedConnection:
+    """Connection proxy whose cursors are TrackedCursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TrackedCursor(self._conn.cursor(*args, **kwargs))
+
+    def close(self):
+        return self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def track(conn):
+    return TrackedConnection(conn)
+
+
+# ----------------- EXPLAIN -----------------
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "INSERT", "REPLACE", "WITH")
+
+
+def explain(cur, statement, params):
+    """EXPLAIN a logged statement (never executes it). Returns (columns, rows)."""
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if head not in EXPLAINABLE:
+        raise ValueError(f"Cannot EXPLAIN a {head or 'blank'} statement")
+    if not params and _PARAM_RE.search(statement):
+        statement = _PARAM_RE.sub("NULL", statement)  # parameters not logged (SLOW_QUERY_PARAMS)
+    cur.execute("EXPLAIN " + statement, params or None)
+    cols = [c[0] for c in cur.description]
+    return cols, cur.fetchall()
+
+
+# ----------------- Flush to query_stats / slow_queries -----------------
+def _flush(conn, app, source):
+    now_rows = STATS.snapshot()
+    slow = STATS.drain_slow()
+    with conn.cursor() as cur:
+        if now_rows:
+            cur.executemany(
+                "REPLACE INTO query_stats (source, fp_id, app, fingerprint, calls, total_ms, max_ms, p95_ms, updated_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, UTC_TIMESTAMP())",
+                [(source, r["fp_id"], app, r["fingerprint"], r["calls"], r["total_ms"], r["max_ms"], r["p95_ms"])
+                 for r in now_rows],
+            )
+        if slow:
+            cur.executemany(
+                "INSERT INTO slow_queries (app, fp_id, ms, route, statement, params) VALUES (%s, %s, %s, %s, %s, %s)",
+                [(app, key, round(ms, 2), route, stmt, orjson.dumps(params, default=str).decode() if params else None)
+                 for key, ms, route, stmt, params in slow],
+            )
+            cur.execute(
+                "DELETE FROM slow_queries WHERE id < "
+                "(SELECT min_id FROM (SELECT id AS min_id FROM slow_queries ORDER BY id DESC LIMIT 1 OFFSET %s) t)",
+                (SLOW_KEEP,),
+            )
+        # rows of processes gone for a day (restarts, old workers)
+        cur.execute("DELETE FROM query_stats WHERE updated_at < UTC_TIMESTAMP() - INTERVAL 1 DAY")
+
+
+def start_flusher(app, connect, interval=FLUSH_INTERVAL_S):
+    """
+    Background thread writing this process's stats every `interval` seconds.
+    connect() must return a plain (untracked) autocommit connection.
+    """
+    source = f"{app}:{socket.gethostname()}:{os.getpid()}"[:64]
+
+    def loop():
+        warned = False
+        while True:
+            time.sleep(interval)
+            try:
+                conn = connect()
+                try:
+                    _flush(conn, app, source)
+                finally:
+                    conn.close()
+                warned = False
+            except Exception as e:
+                if not warned:
+                    logger.warning("Query stats flush failed (%s); is migration 4 applied?", e)
+                    warned = True
+
+    th = threading.Thread(target=loop, name="querylog-flush", daemon=True)
+    th.start()
+    return th
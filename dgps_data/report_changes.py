@@ -0,0 +1,117 @@
+"""
+Report change log (report_changes, migration 10): the outbox of report events,
+followed by the dashboard's live feed and by outbox consumers (dgps_data.outbox).
+
+Writers append one row per report write on the same cursor, so a change is
+visible exactly when its report is committed:
+
+    report_changes.record(cur, "submitted", report_id, tg_id, report_date, payload={...})  # intake
+    report_changes.record(cur, "edited", ...) / ("deleted", ...)            # dashboard
+
+Readers follow the log by id (managers_report/live.py polls it once per process
+and fans the rows out to the manager's SSE clients):
+
+    rows = report_changes.since(cur, last_id)           # oldest first, with manager_id
+    rows = report_changes.since(cur, last_id, manager_id=7)
+
+Rows older than --days are pruned, never past a consumer's checkpoint:
+
+    python -m dgps_data.report_changes prune [--days 2]
+"""
+import sys
+import json
+import logging
+
+logger = logging.getLogger("dgps_data.report_changes")
+
+KINDS = ("submitted", "edited", "deleted")
+BATCH = 500
+
+
+def record(cur, kind, report_id, employee_tg_id, report_date, created_at=None, payload=None):
+    """
+    created_at: the report's; None for a new report (the change's own time is
+    used). payload: a small JSON-able dict for consumers (migration 11).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown change kind: {kind}")
+    cur.execute(
+        "INSERT INTO report_changes (kind, report_id, employee_telegram_id, report_date, report_created_at, payload) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        (kind, report_id, employee_tg_id, report_date, created_at,
+         json.dumps(payload, default=str) if payload is not None else None),
+    )
+
+
+def latest_id(cur):
+    cur.execute("SELECT COALESCE(MAX(id), 0) AS last_id FROM report_changes")
+    row = cur.fetchone()
+    return int(row["last_id"] if isinstance(row, dict) else row[0])
+
+
+def since(cur, last_id, manager_id=None, limit=BATCH):
+    """
+    Changes after last_id, oldest first, each with the employee's current
+    manager_id, the parsed payload and age_s (seconds since it was written).
+    """
+    sql = (
+        "SELECT c.id, c.kind, c.report_id, c.employee_telegram_id, c.report_date, "
+        "COALESCE(c.report_created_at, c.created_at) AS report_created_at, c.payload, "
+        "TIMESTAMPDIFF(SECOND, c.created_at, NOW()) AS age_s, "
+        "u.manager_id FROM report_changes c LEFT JOIN users u ON u.telegram_id = c.employee_telegram_id "
+        "WHERE c.id > %s"
+    )
+    params = [last_id]
+    if manager_id is not None:
+        sql += " AND u.manager_id = %s"
+        params.append(manager_id)
+    cur.execute(sql + " ORDER BY c.id LIMIT %s", params + [limit])
+    rows = cur.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(cur.column_names, r)) for r in rows]
+    for r in rows:
+        if isinstance(r["payload"], (str, bytes, bytearray)):
+            r["payload"] = json.loads(r["payload"])
+    return rows
+
+
+def prune(conn, days=2, batch=5000):
+    """
+    Delete changes older than `days`, in short batches, keeping everything an
+    outbox consumer hasn't checkpointed yet. Returns the number deleted.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(last_id) FROM outbox_checkpoints")
+        upto = cur.fetchone()[0]
+    where, params = "created_at < NOW() - INTERVAL %s DAY", [days]
+    if upto is not None:
+        where += " AND id <= %s"
+        params.append(upto)
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(f"DELETE FROM report_changes WHERE {where} ORDER BY id LIMIT %s", params + [batch])
+            n = cur.rowcount
+        conn.commit()
+        total += n
+        if n < batch:
+            return total
+
+
+if __name__ == "__main__":
+    import argparse
+    from dgps_data.config import connect
+
+    ap = argparse.ArgumentParser(description="Report change log maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("prune", help="delete old changes")
+    p.add_argument("--days", type=int, default=2)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    conn = connect()
+    try:
+        logger.info("Pruned %s changes", prune(conn, days=args.days))
+    finally:
+        conn.close()
+    sys.exit(0)
@@ -0,0 +1,153 @@
+"""
+Diff-based saving of a dashboard report edit.
+
+The edit form posts the whole report and every flight (with its flight_id).
+Instead of rewriting the report and re-inserting all flights, the submitted
+values are compared with the rows read under lock in the same transaction:
+
+    old, flights = report_edit.load(cur, report_id)     # FOR UPDATE; None if gone
+    changes = report_edit.changed_columns(old, new_values)
+    touched = report_edit.save_flights(cur, report_id, flights, submitted)
+    report_edit.update_report(cur, report_id, changes, touched)  # only the changed columns
+
+save_flights UPDATEs the flights whose values differ (changed columns only),
+DELETEs the ones no longer submitted with one statement and INSERTs the new
+ones with one executemany. A flight_id that isn't one of this report's flights
+is treated as a new flight. Fixing a remark is one UPDATE; saving an unchanged
+form writes nothing. Any write bumps reports.version (migration 9), which keys
+the dashboard's report preview cache. bench/edit_statements.py counts the
+statements of typical edits.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+FLIGHT_COLUMNS = ("flight_time_min", "area_sq_km", "uav_rover_file", "drone_base_file_no")
+JSON_COLUMNS = ("dgps_used_json", "dgps_operators_json", "grid_numbers_json", "gcp_points_json")
+
+
+def _dicts(cur):
+    rows = cur.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        names = cur.column_names
+        rows = [dict(zip(names, r)) for r in rows]
+    return rows
+
+
+def load(cur, report_id):
+    """(report row, flights in id order) with the report row locked; (None, []) if it doesn't exist."""
+    cur.execute("SELECT * FROM reports WHERE id = %s FOR UPDATE", (report_id,))
+    rows = _dicts(cur)
+    if not rows:
+        return None, []
+    cur.execute(
+        "SELECT id, flight_time_min, area_sq_km, uav_rover_file, drone_base_file_no "
+        "FROM report_flights WHERE report_id = %s ORDER BY id",
+        (report_id,),
+    )
+    return rows[0], _dicts(cur)
+
+
+# ----------------- Comparison -----------------
+def _norm(value):
+    """Comparable form: numbers as Decimal, dates as ISO strings, JSON parsed."""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value)).normalize()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _json(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def same(column, old, new):
+    if column in JSON_COLUMNS:
+        return _json(old) == _json(new)
+    if isinstance(old, Decimal) and isinstance(new, (int, float)) and not isinstance(new, bool):
+        # rounded to the column's scale the way MySQL stores it (0.1 + 0.2 == 0.300)
+        return Decimal(str(new)).quantize(old, rounding=ROUND_HALF_UP) == old
+    a, b = _norm(old), _norm(new)
+    if isinstance(a, Decimal) and isinstance(b, str):
+        try:
+            b = Decimal(b).normalize()
+        except InvalidOperation:
+            pass
+    return a == b
+
+
+def changed_columns(old, new):
+    """The items of `new` whose value differs from the `old` row."""
+    return {c: v for c, v in new.items() if not same(c, old.get(c), v)}
+
+
+# ----------------- Writes -----------------
+def update_report(cur, report_id, changes, flights_changed=False):
+    """Set the changed columns and bump the row version; nothing when neither report nor flights changed."""
+    if not changes and not flights_changed:
+        return
+    cols = list(changes)
+    cur.execute(
+        f"UPDATE reports SET {''.join(f'{c} = %s, ' for c in cols)}version = version + 1 WHERE id = %s",
+        [changes[c] for c in cols] + [report_id],
+    )
+
+
+def diff_flights(existing, submitted):
+    """
+    (updates, inserts, deleted ids). updates: [(flight id, {column: value})];
+    inserts: submitted dicts without a usable id. submitted: dicts with "id"
+    (str/int or None) and FLIGHT_COLUMNS.
+    """
+    by_id = {int(f["id"]): f for f in existing}
+    updates, inserts, kept = [], [], set()
+    for f in submitted:
+        try:
+            fid = int(f.get("id") or 0)
+        except (TypeError, ValueError):
+            fid = 0
+        old = by_id.get(fid)
+        if old is None or fid in kept:
+            inserts.append(f)
+            continue
+        kept.add(fid)
+        changes = changed_columns(old, {c: f[c] for c in FLIGHT_COLUMNS})
+        if changes:
+            updates.append((fid, changes))
+    deleted = [fid for fid in by_id if fid not in kept]
+    return updates, inserts, deleted
+
+
+def save_flights(cur, report_id, existing, submitted):
+    """Apply the diff; returns True when any flight row was written."""
+    updates, inserts, deleted = diff_flights(existing, submitted)
+    if deleted:
+        cur.execute(
+            f"DELETE FROM report_flights WHERE report_id = %s AND id IN ({','.join(['%s'] * len(deleted))})",
+            [report_id] + deleted,
+        )
+    for fid, changes in updates:
+        cols = list(changes)
+        cur.execute(
+            f"UPDATE report_flights SET {', '.join(f'{c} = %s' for c in cols)} WHERE id = %s AND report_id = %s",
+            [changes[c] for c in cols] + [fid, report_id],
+        )
+    if inserts:
+        cur.executemany(
+            "INSERT INTO report_flights (report_id, flight_time_min, area_sq_km, uav_rover_file, drone_base_file_no) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [(report_id,) + tuple(f[c] for c in FLIGHT_COLUMNS) for f in inserts],
+        )
+    return bool(updates or inserts or deleted)
@@ -0,0 +1,225 @@
+"""
+View Reports Excel export (dashboard "Download"), built in constant memory.
+
+The workbook is openpyxl write-only: appended rows go straight to the sheet's
+temp file. Reports come from unbuffered cursors (rows are read from the server
+while they are written), the summary in the tab's order and the detail sheet
+as reports LEFT JOIN report_flights in id order, so nothing is held per report
+or per flight. Peak memory does not grow with the row count
+(bench/export_memory.py).
+
+    plan = build_plan("sites", request.args, team, today)   # ExportError -> 400
+    rows = write_xlsx(conn, plan, path)                      # ExportError if no data
+
+Plain functions of a connection and the filters, no Flask, so the dashboard can
+also run them outside a request.
+"""
+import json
+
+from openpyxl import Workbook
+
+from dgps_data import masters, rollups
+
+TABS = ("date", "employee", "sites", "drones")
+
+DETAIL_HEADER = [
+    "Report ID", "Date", "Site Name", "Drone", "Pilot", "Copilot",
+    "DGPS Used", "DGPS Operators", "Grid Numbers", "GCP Points",
+    "Base Height (m)", "Total Area (sq km)", "Total Time (min)", "Remark", "Submitted At",
+    "Flight Time (min)", "Flight Area (sq km)", "UBX", "Base File",
+]
+NAME_HEADER = ["Employee First Name", "Employee Last Name"]
+
+_DETAIL_SQL = (
+    "SELECT r.id, r.employee_telegram_id, r.report_date, r.site_name, r.drone_name, r.pilot_name, "
+    "r.copilot_name, r.dgps_used_json, r.dgps_operators_json, r.grid_numbers_json, r.gcp_points_json, "
+    "r.base_height_m, r.total_area_sq_km, r.total_time_min, r.remark, r.created_at, "
+    "rf.flight_time_min, rf.area_sq_km, rf.uav_rover_file, rf.drone_base_file_no "
+    "FROM reports r LEFT JOIN report_flights rf ON rf.report_id = r.id "
+    "WHERE {where} ORDER BY r.id, rf.id"
+)
+
+
+class ExportError(Exception):
+    """Filters that can't produce a file; the message is shown to the manager."""
+
+
+def fmt_ist(dt):
+    # Same rendering as the dashboard's fmt_ist (timestamps are stored in IST).
+    if not dt:
+        return "-"
+    return dt.strftime("%d %b %Y %I:%M %p IST")
+
+
+def _csv(v):
+    """JSON list column -> 'a, b, c'."""
+    if isinstance(v, (bytes, bytearray)):
+        v = v.decode("utf-8", "replace")
+    if isinstance(v, list):
+        return ", ".join(str(x) for x in v)
+    if isinstance(v, str):
+        try:
+            parsed = json.loads(v)
+        except ValueError:
+            return v
+        if isinstance(parsed, list):
+            return ", ".join(str(x) for x in parsed)
+        return v
+    return str(v) if v is not None else ""
+
+
+def team_names(team):
+    """Team rows (dgps_data.teams) -> {telegram_id: (first, last, full)}."""
+    names = {}
+    for e in team:
+        fn = (e["first_name"] or "").strip()
+        ln = (e["last_name"] or "").strip()
+        names[e["telegram_id"]] = (fn, ln, (fn + " " + ln).strip() or (e["username"] or f"tg:{e['telegram_id']}"))
+    return names
+
+
+# ----------------- Filters -> plan -----------------
+def build_plan(tab, args, team, today):
+    """
+    Validate a tab's filters (args: mapping of query params) against the
+    manager's team. Returns a plain dict: where/params select the reports,
+    meta/header/footer describe the Summary sheet.
+    """
+    if tab not in TABS:
+        raise ExportError("Invalid tab.")
+    names = team_names(team)
+    if not names:
+        raise ExportError("No employees assigned.")
+    tgs = list(names)
+    in_team = f"r.employee_telegram_id IN ({','.join(['%s'] * len(tgs))})"
+    get = lambda k: (args.get(k) or "").strip()
+
+    if tab == "date":
+        mode = get("mode").lower() or "single"
+        if mode == "range":
+            d_from, d_to = get("from"), get("to")
+            if not d_from or not d_to:
+                raise ExportError("Please select From and To dates.")
+            if d_to > today:
+                raise ExportError("Future To date selected. No data.")
+            meta = [["Mode", "Range"], ["From", d_from], ["To", d_to]]
+            where, params = f"r.report_date BETWEEN %s AND %s AND {in_team}", [d_from, d_to] + tgs
+        else:
+            d = get("date")
+            if not d:
+                raise ExportError("Please select a date.")
+            if d > today:
+                raise ExportError("Future date selected. No data.")
+            meta = [["Mode", "Single"], ["Date", d]]
+            where, params = f"r.report_date = %s AND {in_team}", [d] + tgs
+        return {
+            "tab": tab, "where": where, "params": params, "names": names, "meta": meta,
+            "header": ["Sr. No.", "Employee First Name", "Employee Last Name", "Report Submitted At", "Report ID"],
+        }
+
+    if tab == "employee":
+        try:
+            tg = int(get("employee"))
+        except ValueError:
+            raise ExportError("Select an employee.")
+        if tg not in names:
+            raise ExportError("Employee not in your team.")
+        return {
+            "tab": tab, "where": "r.employee_telegram_id = %s", "params": [tg], "names": names,
+            "meta": [["Employee", " ".join(x for x in names[tg][:2] if x)]],
+            "header": ["Sr. No.", "Date", "Site Name", "Submitted At", "Report ID"],
+        }
+
+    kind = "site" if tab == "sites" else "drone"
+    rec_id = masters.parse_id(args.get(f"{kind}_id"))
+    if not rec_id:
+        raise ExportError(f"Select a {kind}.")
+    d = get("date")
+    where, params = f"{in_team} AND r.{kind}_id = %s", tgs + [rec_id]
+    if d:
+        where += " AND r.report_date = %s"
+        params.append(d)
+    return {
+        "tab": tab, "where": where, "params": params, "names": names, "kind": kind, "rec_id": rec_id, "date": d,
+        "header": ["Sr. No.", "Employee First Name", "Employee Last Name", "Date", "Submitted At", "Report ID"],
+    }
+
+
+# ----------------- Workbook -----------------
+def _summary_row(tab, i, r, names):
+    if tab == "employee":
+        return [i, r["report_date"], r["site_name"], fmt_ist(r["created_at"]), r["id"]]
+    fn, ln, _ = names.get(r["employee_telegram_id"], ("", "", ""))
+    if tab == "date":
+        return [i, fn, ln, fmt_ist(r["created_at"]), r["id"]]
+    return [i, fn, ln, r["report_date"], fmt_ist(r["created_at"]), r["id"]]
+
+
+def write_xlsx(conn, plan, path):
+    """
+    Write the workbook for `plan` to `path`. Returns the number of reports;
+    raises ExportError when the filters match nothing.
+    """
+    tab, names, where, params = plan["tab"], plan["names"], plan["where"], plan["params"]
+    wb = Workbook(write_only=True)
+    ws1 = wb.create_sheet("Summary")
+    ws2 = wb.create_sheet("Detailed Info")
+
+    with conn.cursor(dictionary=True, buffered=True) as cur:
+        if tab in ("sites", "drones"):
+            name = masters.name_for(cur, plan["kind"], plan["rec_id"]) or ""
+            if tab == "sites":
+                plan["meta"] = [["Site Name", name]] + ([["Date Filter", plan["date"]]] if plan["date"] else [])
+            else:
+                plan["meta"] = [["Drone", name], ["Date", plan["date"] or "-"]]
+        if tab == "drones":
+            agg = rollups.totals(cur, "drone", plan["rec_id"], employee_ids=names, report_date=plan["date"])
+
+    for row in plan["meta"]:
+        ws1.append(row)
+    ws1.append([])
+    ws1.append(plan["header"])
+
+    # Summary: newest first, streamed
+    count, total_area = 0, 0.0
+    with conn.cursor(dictionary=True, buffered=False) as cur:
+        cur.execute(
+            f"SELECT r.id, r.employee_telegram_id, r.report_date, r.site_name, r.created_at, r.total_area_sq_km "
+            f"FROM reports r WHERE {where} ORDER BY r.created_at DESC",
+            params,
+        )
+        for r in cur:
+            count += 1
+            ws1.append(_summary_row(tab, count, r, names))
+            total_area += float(r["total_area_sq_km"] or 0)
+    if not count:
+        raise ExportError("No data to download for current filters.")
+
+    if tab == "sites":
+        ws1.append([])
+        ws1.append(["Total Area (sq km)", round(total_area, 3)])
+    elif tab == "drones":
+        ws1.append([])
+        ws1.append(["Total Flights", agg["flights"]])
+        ws1.append(["Total Flight Time (min)", agg["minutes"]])
+
+    # Detailed Info: one line per flight (one per report without flights), streamed
+    with_names = tab != "employee"
+    ws2.append((NAME_HEADER + DETAIL_HEADER) if with_names else DETAIL_HEADER)
+    last_id, common, prefix = None, None, None
+    with conn.cursor(buffered=False) as cur:
+        cur.execute(_DETAIL_SQL.format(where=where), params)
+        for row in cur:
+            if row[0] != last_id:
+                last_id = row[0]
+                common = [
+                    row[0], row[2], row[3], row[4], row[5], row[6],
+                    _csv(row[7]), _csv(row[8]), _csv(row[9]), _csv(row[10]),
+                    row[11], row[12], row[13], row[14], fmt_ist(row[15]),
+                ]
+                prefix = list(names.get(row[1], ("", "", ""))[:2]) if with_names else []
+            flight = [("" if v is None else v) for v in row[16:20]]
+            ws2.append(prefix + common + flight)
+
+    wb.save(path)
+    return count
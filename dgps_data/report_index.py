@@ -0,0 +1,181 @@
+"""
+Child tables for the report list columns.
+
+dgps_used_json, dgps_operators_json, grid_numbers_json and gcp_points_json stay
+on reports (they are what the dashboard renders), and every entry is also
+written as a row of report_dgps / report_operators / report_grids / report_gcps
+so "which reports used X" is an index lookup instead of a JSON scan.
+report_grids rows also carry the decoded tile_key (grid_coverage.parse_grid,
+migration 14): "H43R012A17" and "H43R12A17" are different item_keys but the
+same tile.
+
+    python -m dgps_data.report_index backfill [--batch 1000]
+"""
+import re
+import sys
+import json
+import logging
+
+logger = logging.getLogger("dgps_data.report_index")
+
+# payload key -> (child table, reports JSON column)
+LIST_TABLES = {
+    "dgps_used":      ("report_dgps",      "dgps_used_json"),
+    "dgps_operators": ("report_operators", "dgps_operators_json"),
+    "grid_numbers":   ("report_grids",     "grid_numbers_json"),
+    "gcp_points":     ("report_gcps",      "gcp_points_json"),
+}
+
+# Lookup kinds exposed by the dashboard -> payload key
+LOOKUP_KINDS = {
+    "dgps": "dgps_used",
+    "operators": "dgps_operators",
+    "grids": "grid_numbers",
+    "gcps": "gcp_points",
+}
+
+ITEM_MAX = 100
+TILE_TABLE = "report_grids"  # child table with a tile_key column
+_WS_RE = re.compile(r"\s+")
+
+
+def item_key(value) -> str:
+    """Normalized lookup key: uppercase, whitespace removed ("R4S - 314" -> "R4S-314")."""
+    return _WS_RE.sub("", str(value or "")).upper()[:ITEM_MAX]
+
+
+def as_list(value):
+    """A list from a native list, a JSON string or a comma separated string."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8", "replace")
+    if isinstance(value, str):
+        s = value.strip()
+        if not s:
+            return []
+        try:
+            parsed = json.loads(s)
+            if isinstance(parsed, list):
+                return parsed
+        except Exception:
+            pass
+        return [x.strip() for x in s.split(",") if x.strip()]
+    return [value]
+
+
+def _tile_key(item):
+    from dgps_data.grid_coverage import parse_grid  # grid_coverage imports this module
+    p = parse_grid(item)
+    return p["tile_key"] if p else None
+
+
+def _rows(table, report_id, values):
+    rows = []
+    for v in as_list(values):
+        item = str(v).strip()[:ITEM_MAX]
+        if item:
+            row = (report_id, len(rows), item, item_key(item))
+            rows.append(row + (_tile_key(item),) if table == TILE_TABLE else row)
+    return rows
+
+
+def _insert_sql(table):
+    if table == TILE_TABLE:
+        return f"INSERT INTO {table} (report_id, seq, item, item_key, tile_key) VALUES (%s, %s, %s, %s, %s)"
+    return f"INSERT INTO {table} (report_id, seq, item, item_key) VALUES (%s, %s, %s, %s)"
+
+
+def write_children(cur, report_id, lists, replace=False, keys=None):
+    """
+    Write the child rows for one report. lists maps payload keys
+    (dgps_used, dgps_operators, grid_numbers, gcp_points) to lists or JSON strings.
+    Use replace=True when the report already has rows (edits); keys limits the
+    rewrite to those lists.
+    """
+    for key, (table, _) in LIST_TABLES.items():
+        if keys is not None and key not in keys:
+            continue
+        if replace:
+            cur.execute(f"DELETE FROM {table} WHERE report_id = %s", (report_id,))
+        rows = _rows(table, report_id, lists.get(key))
+        if rows:
+            cur.executemany(_insert_sql(table), rows)
+
+
+def lookup_sql(key, prefix=False):
+    """Team reports whose `key` list has an entry equal to / starting with %s (dashboard /api/lookup)."""
+    table = LIST_TABLES[key][0]
+    cond = "c.item_key LIKE %s" if prefix else "c.item_key = %s"
+    return (
+        "SELECT DISTINCT r.id, r.report_date, r.site_name, r.drone_name, c.item, u.first_name, u.last_name "
+        f"FROM {table} c JOIN reports r ON r.id = c.report_id "
+        "JOIN users u ON u.telegram_id = r.employee_telegram_id "
+        f"WHERE {cond} AND u.manager_id = %s ORDER BY r.report_date DESC, r.id DESC LIMIT 500"
+    )
+
+
+def delete_children(cur, report_id):
+    for table, _ in LIST_TABLES.values():
+        cur.execute(f"DELETE FROM {table} WHERE report_id = %s", (report_id,))
+
+
+# ----------------- Backfill -----------------
+def backfill(conn, batch=1000):
+    """
+    Rebuild child rows for every existing report, walking reports by id in
+    batches (keyset pagination, one transaction per batch). Safe to re-run.
+    """
+    json_cols = ", ".join(col for _, col in LIST_TABLES.values())
+    last_id = 0
+    total = 0
+    while True:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(
+                f"SELECT id, {json_cols} FROM reports WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, batch),
+            )
+            reports = cur.fetchall()
+        if not reports:
+            break
+
+        ids = [r["id"] for r in reports]
+        placeholders = ",".join(["%s"] * len(ids))
+        conn.start_transaction()
+        try:
+            with conn.cursor() as cur:
+                for key, (table, col) in LIST_TABLES.items():
+                    cur.execute(f"DELETE FROM {table} WHERE report_id IN ({placeholders})", ids)
+                    rows = [row for r in reports for row in _rows(table, r["id"], r[col])]
+                    if rows:
+                        cur.executemany(_insert_sql(table), rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        total += len(reports)
+        last_id = ids[-1]
+        logger.info("Backfilled %s reports (last id %s)", total, last_id)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+    from dgps_data.config import connect
+
+    ap = argparse.ArgumentParser(description="Report list child tables")
+    ap.add_argument("command", choices=("backfill",))
+    ap.add_argument("--batch", type=int, default=1000)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    conn = connect()
+    try:
+        n = backfill(conn, batch=args.batch)
+        print(f"Backfilled {n} reports.")
+    finally:
+        conn.close()
+    sys.exit(0)
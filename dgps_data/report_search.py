@@ -0,0 +1,139 @@
+"""
+Combined View Reports search: any mix of employees, sites, drones and a date
+range over the manager's team, with facet counts.
+
+Every filter is an index predicate on reports. The team scope is always an
+`employee_telegram_id IN (...)` list, and the (employee, site|drone,
+report_date) indexes of migration 3 lead with that column, so each combination
+is an index range read (tests/test_report_search.py checks the SQL and the
+index of every combination, bench/search_plans.py the real plans).
+
+    filters = report_search.parse(request.args, today)         # SearchError -> 400
+    where, params = report_search.where(filters, team_ids)
+    rows, next_cursor = report_search.page(cur, where, params, after, limit)
+    facets = report_search.facets(cur, where, params, names)
+
+Facets come from one GROUP BY over (site, drone, employee) folded in Python.
+MySQL has no GROUPING SETS, and WITH ROLLUP only gives nested subtotals.
+Counts are under all current filters.
+"""
+from datetime import date
+
+from dgps_data import keyset, masters
+
+MULTI = {"employee": "employee_telegram_id", "site_id": "site_id", "drone_id": "drone_id"}
+MAX_VALUES = 50  # per multi-valued filter
+
+
+class SearchError(Exception):
+    """Filters that can't be searched; the message is shown to the manager."""
+
+
+def _values(args, key):
+    """Repeated (?site_id=1&site_id=2) or comma-separated (?site_id=1,2) ids."""
+    raw = args.getlist(key) if hasattr(args, "getlist") else [args.get(key)]
+    ids = []
+    for v in raw:
+        for part in str(v or "").split(","):
+            if not part.strip():
+                continue
+            i = masters.parse_id(part)
+            if i is None:
+                raise SearchError(f"Invalid {key}.")
+            ids.append(i)
+    if len(ids) > MAX_VALUES:
+        raise SearchError(f"Too many values for {key}.")
+    return sorted(set(ids))
+
+
+def _date(args, key):
+    v = (args.get(key) or "").strip()
+    if not v:
+        return None
+    try:
+        return date.fromisoformat(v).isoformat()
+    except ValueError:
+        raise SearchError(f"Invalid {key} date.")
+
+
+def parse(args, today):
+    filters = {k: _values(args, k) for k in MULTI}
+    filters["from"], filters["to"] = _date(args, "from"), _date(args, "to")
+    if filters["from"] and filters["to"] and filters["from"] > filters["to"]:
+        raise SearchError("From date is after To date.")
+    if filters["from"] and filters["from"] > today:
+        raise SearchError("Future From date selected. No data.")
+    return filters
+
+
+def where(filters, team_ids):
+    """(sql, params) over reports r. Employees outside the team are dropped."""
+    team = set(team_ids)
+    emps = [e for e in filters["employee"] if e in team] if filters["employee"] else sorted(team)
+    if not emps:
+        return "1 = 0", []
+    clauses = [f"r.employee_telegram_id IN ({','.join(['%s'] * len(emps))})"]
+    params = list(emps)
+    for key in ("site_id", "drone_id"):
+        ids = filters[key]
+        if ids:
+            clauses.append(f"r.{MULTI[key]} IN ({','.join(['%s'] * len(ids))})")
+            params += ids
+    if filters["from"]:
+        clauses.append("r.report_date >= %s")
+        params.append(filters["from"])
+    if filters["to"]:
+        clauses.append("r.report_date <= %s")
+        params.append(filters["to"])
+    return " AND ".join(clauses), params
+
+
+def page_sql(where_sql, after_sql=""):
+    return (
+        "SELECT r.id, r.report_date, r.employee_telegram_id, r.site_id, r.site_name, r.drone_id, r.drone_name "
+        f"FROM reports r WHERE {where_sql}{after_sql} ORDER BY {keyset.order(desc=True)} LIMIT %s"
+    )
+
+
+def facet_sql(where_sql):
+    return (
+        "SELECT r.site_id, r.drone_id, r.employee_telegram_id, COUNT(*) AS n "
+        f"FROM reports r WHERE {where_sql} GROUP BY r.site_id, r.drone_id, r.employee_telegram_id"
+    )
+
+
+def page(cur, where_sql, params, after=None, limit=keyset.PAGE_SIZE):
+    """One keyset page, newest first: (rows, next cursor)."""
+    after_sql, after_params = keyset.after(after, desc=True)
+    cur.execute(page_sql(where_sql, after_sql), list(params) + after_params + [limit + 1])
+    return keyset.page(cur.fetchall(), limit)
+
+
+def facets(cur, where_sql, params, names):
+    """
+    {"total", "sites", "drones", "employees"}; each facet is a list of
+    {"id", "name", "count"}, largest first. names: report_export.team_names().
+    """
+    cur.execute(facet_sql(where_sql), params)
+    total, by = 0, {"site": {}, "drone": {}, "employee": {}}
+    for r in cur.fetchall():
+        n = int(r["n"])
+        total += n
+        for kind, col in (("site", "site_id"), ("drone", "drone_id"), ("employee", "employee_telegram_id")):
+            if r[col] is not None:
+                by[kind][r[col]] = by[kind].get(r[col], 0) + n
+
+    labels = {"employee": {tg: v[2] for tg, v in names.items()}}
+    for kind in ("site", "drone"):
+        ids = list(by[kind])
+        labels[kind] = {}
+        if ids:
+            table = masters.KINDS[kind][0]
+            cur.execute(f"SELECT id, name FROM {table} WHERE id IN ({','.join(['%s'] * len(ids))})", ids)
+            labels[kind] = {r["id"]: r["name"] for r in cur.fetchall()}
+
+    def facet(kind):
+        items = [{"id": k, "name": labels[kind].get(k) or str(k), "count": c} for k, c in by[kind].items()]
+        return sorted(items, key=lambda x: (-x["count"], x["name"]))
+
+    return {"total": total, "sites": facet("site"), "drones": facet("drone"), "employees": facet("employee")}
@@ -0,0 +1,45 @@
+"""
+Per-employee report version counters (report_versions, migration 6).
+
+Every write to an employee's reports (intake in server.py, edit / delete in the
+dashboard, master renames) bumps that employee's counter on the same cursor.
+A cache keyed by team_version() of the employees it covers is therefore stale
+exactly when one of their reports changed.
+"""
+
+
+def bump(cur, *employee_tg_ids):
+    for tg in {t for t in employee_tg_ids if t is not None}:
+        cur.execute(
+            "INSERT INTO report_versions (employee_telegram_id, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1",
+            (tg,),
+        )
+
+
+def bump_where(cur, where, params):
+    """Bump every employee with a report matching `where` (on reports r)."""
+    cur.execute(
+        "INSERT INTO report_versions (employee_telegram_id, version) "
+        f"SELECT DISTINCT r.employee_telegram_id, 1 FROM reports r WHERE {where} "
+        "ON DUPLICATE KEY UPDATE version = version + 1",
+        params,
+    )
+
+
+def team_version(cur, employee_tg_ids) -> str:
+    """
+    One token for a set of employees: changes whenever any of their counters
+    does (counters only grow, so count + sum is enough).
+    """
+    tgs = list(employee_tg_ids)
+    if not tgs:
+        return "0:0"
+    cur.execute(
+        f"SELECT COUNT(*) AS n, COALESCE(SUM(version), 0) AS total FROM report_versions "
+        f"WHERE employee_telegram_id IN ({','.join(['%s'] * len(tgs))})",
+        tgs,
+    )
+    row = cur.fetchone()
+    n, total = (row["n"], row["total"]) if isinstance(row, dict) else row
+    return f"{n}:{total}"
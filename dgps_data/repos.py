@@ -0,0 +1,186 @@
+"""
+Shared repositories for the per-request lookups of the bot, the intake API and
+the dashboard, run as server-side prepared statements.
+
+    with db_conn() as conn:
+        u = repos.Users(conn).by_telegram(tg_id)          # dict or None
+        sites = repos.Masters(conn).active("site")        # [{"id", "name"}]
+
+Each physical connection keeps its prepared statements (one prepared cursor per
+SQL text, LRU, at most STATEMENTS_PER_CONN) across pool checkouts; the pools
+don't reset sessions for that reason (dgps_data.pool). A statement is parsed
+and planned by the server once per connection, later calls only send the
+parameters (binary protocol). Rows are always plain dicts with str text
+columns, whatever the connector version hands back. bench/prepared_statements.py
+compares the latency with the text protocol.
+
+Statements are timed into the query stats like tracked cursors
+(dgps_data.querylog).
+"""
+import time
+from collections import OrderedDict
+
+from dgps_data import querylog
+
+STATEMENTS_PER_CONN = 64
+_BINARY_FLAG = 128  # mysql.connector.constants.FieldFlag.BINARY
+_JSON_TYPE = 245    # FieldType.JSON: flagged binary, but text
+
+
+def _raw(conn):
+    """The physical connection under the pool / tracking wrappers."""
+    while True:
+        inner = getattr(conn, "_conn", None) or getattr(conn, "_cnx", None)
+        if inner is None:
+            return conn
+        conn = inner
+
+
+class Statements:
+    """Prepared statements of one physical connection, by SQL text."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.connection_id = raw.connection_id
+        self._cursors = OrderedDict()
+
+    def _cursor(self, sql):
+        cur = self._cursors.pop(sql, None)
+        if cur is None:
+            while len(self._cursors) >= STATEMENTS_PER_CONN:
+                _, old = self._cursors.popitem(last=False)
+                try:
+                    old.close()  # deallocates it on the server
+                except Exception:
+                    pass
+            cur = self._raw.cursor(prepared=True)
+        self._cursors[sql] = cur
+        return cur
+
+    def run(self, sql, params=()):
+        """Execute; returns (cursor, rows as dicts or None for statements without a result)."""
+        cur = self._cursor(sql)
+        t0 = time.perf_counter()
+        try:
+            cur.execute(sql, tuple(params))
+            rows = None
+            if cur.description:
+                names = cur.column_names
+                text = [d[1] == _JSON_TYPE or not (d[7] & _BINARY_FLAG) for d in cur.description]
+                rows = [
+                    {n: (v.decode("utf-8") if t and isinstance(v, (bytes, bytearray)) else v)
+                     for n, v, t in zip(names, r, text)}
+                    for r in cur.fetchall()
+                ]
+        except Exception:
+            self._cursors.pop(sql, None)  # e.g. statement gone after a reconnect
+            raise
+        finally:
+            querylog.record(sql, params, (time.perf_counter() - t0) * 1000)
+        return cur, rows
+
+    def all(self, sql, params=()):
+        return self.run(sql, params)[1]
+
+    def one(self, sql, params=()):
+        rows = self.run(sql, params)[1]
+        return rows[0] if rows else None
+
+    def write(self, sql, params=()):
+        """(rowcount, lastrowid) of an INSERT / UPDATE / DELETE."""
+        cur = self.run(sql, params)[0]
+        return cur.rowcount, cur.lastrowid
+
+
+def statements(conn):
+    raw = _raw(conn)
+    st = getattr(raw, "_dgps_statements", None)
+    if st is None or st.connection_id != raw.connection_id:  # new or reconnected session
+        st = Statements(raw)
+        raw._dgps_statements = st
+    return st
+
+
+def _in(values):
+    return ",".join(["%s"] * len(values))
+
+
+# ----------------- Repositories -----------------
+class Users:
+    def __init__(self, conn):
+        self._q = statements(conn)
+
+    def by_telegram(self, telegram_id):
+        return self._q.one("SELECT * FROM users WHERE telegram_id = %s", (telegram_id,))
+
+    def by_id(self, user_id):
+        return self._q.one("SELECT * FROM users WHERE id = %s", (user_id,))
+
+    def active_by_telegram(self, telegram_id):
+        return self._q.one("SELECT * FROM users WHERE telegram_id = %s AND is_active = 1", (telegram_id,))
+
+    def staff_by_telegram(self, telegram_id, roles):
+        return self._q.one(
+            f"SELECT * FROM users WHERE telegram_id = %s AND is_active = 1 AND role IN ({_in(roles)})",
+            (telegram_id, *roles),
+        )
+
+    def id_for_telegram(self, telegram_id):
+        row = self._q.one("SELECT id FROM users WHERE telegram_id = %s LIMIT 1", (telegram_id,))
+        return row["id"] if row else None
+
+    def telegram_for_id(self, user_id):
+        row = self._q.one("SELECT telegram_id FROM users WHERE id = %s", (user_id,))
+        return row["telegram_id"] if row else None
+
+
+class Masters:
+    TABLES = {"site": "master_sites", "drone": "master_drones"}
+
+    def __init__(self, conn):
+        self._q = statements(conn)
+
+    def active(self, kind):
+        """[{"id", "name"}] of the active sites or drones, by name."""
+        return self._q.all(f"SELECT id, name FROM {self.TABLES[kind]} WHERE is_active = 1 ORDER BY name")
+
+
+class Reports:
+    def __init__(self, conn):
+        self._q = statements(conn)
+
+    def by_id(self, report_id):
+        return self._q.one("SELECT * FROM reports WHERE id = %s", (report_id,))
+
+    def version(self, report_id):
+        """reports.version (migration 9); None if the report doesn't exist."""
+        row = self._q.one("SELECT version FROM reports WHERE id = %s", (report_id,))
+        return row["version"] if row else None
+
+    def flights(self, report_id):
+        return self._q.all(
+            "SELECT id, flight_time_min, area_sq_km, uav_rover_file, drone_base_file_no "
+            "FROM report_flights WHERE report_id = %s ORDER BY id",
+            (report_id,),
+        )
+
+    def of_employee_on(self, report_date, telegram_id):
+        return self._q.all(
+            "SELECT id, report_date, site_name, drone_name, pilot_name, copilot_name, "
+            "base_height_m, created_at, dgps_used_json, dgps_operators_json, "
+            "grid_numbers_json, gcp_points_json, total_area_sq_km, total_time_min, remark "
+            "FROM reports WHERE report_date = %s AND employee_telegram_id = %s",
+            (report_date, telegram_id),
+        )
+
+    def submitted_on(self, report_date, telegram_ids):
+        """{telegram_id: {"id", "created_at"}} for the employees that reported that day."""
+        ids = list(telegram_ids)
+        if not ids:
+            return {}
+        rows = self._q.all(
+            f"SELECT id, employee_telegram_id, created_at FROM reports "
+            f"WHERE report_date = %s AND employee_telegram_id IN ({_in(ids)})",
+            (report_date, *ids),
+        )
+        return {r["employee_telegram_id"]: {"id": r["id"], "created_at": r["created_at"]} for r in rows}
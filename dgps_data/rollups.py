@@ -0,0 +1,236 @@
+"""
+Daily site / drone rollups for the View Reports totals.
+
+site_daily and drone_daily (migration 7) hold one row per (site|drone, date,
+employee): report count, flight count, flight minutes and flight area. Team
+totals are a SUM over the team's rows instead of a join over report_flights.
+Rows are keyed by employee, not manager, so moving an employee to another team
+needs no rewrite; totals() joins users for the manager.
+
+Writers keep them current in the same transaction as the report:
+
+    rollups.add_report(cur, tg_id, site_id, drone_id, report_date, flights)  # intake
+    old = rollups.snapshot(cur, report_id)       # edit / delete, before writing
+    rollups.apply(cur, old, -1)
+    rollups.apply(cur, rollups.snapshot(cur, report_id))                      # edit, after
+
+snapshot_of() builds the same dict from rows the caller already holds.
+
+reconcile() recomputes everything from reports / report_flights in batches of
+report ids and fixes only the rows that differ:
+
+    python -m dgps_data.rollups reconcile [--batch 5000] [--dry-run]
+"""
+import sys
+import logging
+from decimal import Decimal
+
+logger = logging.getLogger("dgps_data.rollups")
+
+# kind -> (table, key column on reports and on the rollup)
+TABLES = {"site": ("site_daily", "site_id"), "drone": ("drone_daily", "drone_id")}
+_ZERO = (0, 0, 0, Decimal("0"))
+
+
+def _row(row, *cols):
+    return tuple(row[c] for c in cols) if isinstance(row, dict) else tuple(row)
+
+
+# ----------------- Incremental maintenance -----------------
+def snapshot(cur, report_id):
+    """
+    A report's contribution to the rollups (None if it doesn't exist). Locks
+    the report row, so take it inside the writing transaction.
+    """
+    cur.execute(
+        "SELECT employee_telegram_id, site_id, drone_id, report_date FROM reports WHERE id = %s FOR UPDATE",
+        (report_id,),
+    )
+    r = cur.fetchone()
+    if not r:
+        return None
+    tg, site_id, drone_id, d = _row(r, "employee_telegram_id", "site_id", "drone_id", "report_date")
+    cur.execute(
+        "SELECT COUNT(*) AS n, COALESCE(SUM(flight_time_min), 0) AS m, COALESCE(SUM(area_sq_km), 0) AS a "
+        "FROM report_flights WHERE report_id = %s",
+        (report_id,),
+    )
+    n, m, a = _row(cur.fetchone(), "n", "m", "a")
+    return {"employee_telegram_id": tg, "site_id": site_id, "drone_id": drone_id, "report_date": d,
+            "flights": int(n), "minutes": int(m), "area": a}
+
+
+def snapshot_of(report, flights):
+    """snapshot() from a report row and its flight rows already read under lock."""
+    return {"employee_telegram_id": report["employee_telegram_id"], "site_id": report["site_id"],
+            "drone_id": report["drone_id"], "report_date": report["report_date"],
+            "flights": len(flights),
+            "minutes": int(sum(Decimal(str(f["flight_time_min"])) for f in flights)),
+            "area": sum((Decimal(str(f["area_sq_km"])) for f in flights), Decimal("0"))}
+
+
+def add_report(cur, tg_id, site_id, drone_id, report_date, flights):
+    """Fold a new report in; flights = [(minutes, area, ...), ...]."""
+    apply(cur, {
+        "employee_telegram_id": tg_id, "site_id": site_id, "drone_id": drone_id, "report_date": report_date,
+        "flights": len(flights),
+        "minutes": sum(int(f[0]) for f in flights),
+        "area": sum(Decimal(str(f[1])) for f in flights),
+    })
+
+
+def apply(cur, snap, sign=1):
+    """Add (sign=1) or take out (sign=-1) one report's snapshot."""
+    if not snap:
+        return
+    for kind, (table, col) in TABLES.items():
+        rec_id = snap[col]
+        if rec_id is None:
+            continue
+        key = (rec_id, snap["report_date"], snap["employee_telegram_id"])
+        cur.execute(
+            f"INSERT INTO {table} ({col}, report_date, employee_telegram_id, "
+            f"report_count, flight_count, total_min, total_area) VALUES (%s, %s, %s, %s, %s, %s, %s) "
+            f"ON DUPLICATE KEY UPDATE report_count = report_count + VALUES(report_count), "
+            f"flight_count = flight_count + VALUES(flight_count), total_min = total_min + VALUES(total_min), "
+            f"total_area = total_area + VALUES(total_area)",
+            key + (sign, sign * snap["flights"], sign * snap["minutes"], sign * Decimal(str(snap["area"]))),
+        )
+        if sign < 0:
+            cur.execute(
+                f"DELETE FROM {table} WHERE {col} = %s AND report_date = %s AND employee_telegram_id = %s "
+                f"AND report_count <= 0",
+                key,
+            )
+
+
+# ----------------- Reads -----------------
+def totals(cur, kind, rec_id, manager_id=None, employee_ids=None, report_date=None):
+    """
+    {reports, flights, minutes, area} for one site/drone, over a manager's
+    team (users.manager_id) or an explicit list of employees.
+    """
+    table, col = TABLES[kind]
+    where, params = [f"d.{col} = %s"], [rec_id]
+    join = ""
+    if manager_id is not None:
+        join = "JOIN users u ON u.telegram_id = d.employee_telegram_id "
+        where.append("u.manager_id = %s")
+        params.append(manager_id)
+    if employee_ids is not None:
+        ids = list(employee_ids)
+        if not ids:
+            return dict(zip(("reports", "flights", "minutes", "area"), _ZERO))
+        where.append(f"d.employee_telegram_id IN ({','.join(['%s'] * len(ids))})")
+        params += ids
+    if report_date:
+        where.append("d.report_date = %s")
+        params.append(report_date)
+    cur.execute(
+        f"SELECT COALESCE(SUM(d.report_count), 0) AS reports, COALESCE(SUM(d.flight_count), 0) AS flights, "
+        f"COALESCE(SUM(d.total_min), 0) AS minutes, COALESCE(SUM(d.total_area), 0) AS area "
+        f"FROM {table} d {join}WHERE {' AND '.join(where)}",
+        params,
+    )
+    reports, flights, minutes, area = _row(cur.fetchone(), "reports", "flights", "minutes", "area")
+    return {"reports": int(reports), "flights": int(flights), "minutes": int(minutes), "area": Decimal(area)}
+
+
+# ----------------- Reconciliation -----------------
+def _expected(conn, batch):
+    """Recompute both rollups from the reports, batch report ids at a time."""
+    agg = {kind: {} for kind in TABLES}
+    last_id = 0
+    while True:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT id FROM reports WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch))
+            ids = [r["id"] for r in cur.fetchall()]
+            if not ids:
+                break
+            cur.execute(
+                "SELECT r.employee_telegram_id, r.site_id, r.drone_id, r.report_date, COUNT(rf.id) AS flights, "
+                "COALESCE(SUM(rf.flight_time_min), 0) AS minutes, COALESCE(SUM(rf.area_sq_km), 0) AS area "
+                "FROM reports r LEFT JOIN report_flights rf ON rf.report_id = r.id "
+                "WHERE r.id BETWEEN %s AND %s GROUP BY r.id",
+                (ids[0], ids[-1]),
+            )
+            rows = cur.fetchall()
+        for r in rows:
+            for kind, (_, col) in TABLES.items():
+                if r[col] is None:
+                    continue
+                k = (r[col], r["report_date"], r["employee_telegram_id"])
+                n, f, m, a = agg[kind].get(k, _ZERO)
+                agg[kind][k] = (n + 1, f + int(r["flights"]), m + int(r["minutes"]), a + Decimal(r["area"]))
+        last_id = ids[-1]
+    return agg
+
+
+def reconcile(conn, batch=5000, dry_run=False):
+    """
+    Compare the rollups with a recomputation and fix the rows that differ.
+    Returns {kind: rows fixed}. Writes racing the recompute may be "fixed"
+    back wrongly; run it when intake is quiet (or twice).
+    """
+    expected = _expected(conn, batch)
+    fixed = {}
+    for kind, (table, col) in TABLES.items():
+        want = expected[kind]
+        have = {}
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(
+                f"SELECT {col} AS rec_id, report_date, employee_telegram_id, report_count, flight_count, "
+                f"total_min, total_area FROM {table}"
+            )
+            for r in cur.fetchall():
+                have[(r["rec_id"], r["report_date"], r["employee_telegram_id"])] = (
+                    int(r["report_count"]), int(r["flight_count"]), int(r["total_min"]), Decimal(r["total_area"]),
+                )
+        upserts = [k + v for k, v in want.items() if have.get(k) != v]
+        deletes = [k for k in have if k not in want]
+        fixed[kind] = len(upserts) + len(deletes)
+        if dry_run or not fixed[kind]:
+            continue
+        conn.start_transaction()
+        try:
+            with conn.cursor() as cur:
+                for i in range(0, len(deletes), batch):
+                    cur.executemany(
+                        f"DELETE FROM {table} WHERE {col} = %s AND report_date = %s AND employee_telegram_id = %s",
+                        deletes[i:i + batch],
+                    )
+                for i in range(0, len(upserts), batch):
+                    cur.executemany(
+                        f"INSERT INTO {table} ({col}, report_date, employee_telegram_id, "
+                        f"report_count, flight_count, total_min, total_area) VALUES (%s, %s, %s, %s, %s, %s, %s) "
+                        f"ON DUPLICATE KEY UPDATE report_count = VALUES(report_count), "
+                        f"flight_count = VALUES(flight_count), total_min = VALUES(total_min), "
+                        f"total_area = VALUES(total_area)",
+                        upserts[i:i + batch],
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info("Reconciled rollups%s: %s", " (dry run)" if dry_run else "", fixed)
+    return fixed
+
+
+if __name__ == "__main__":
+    import argparse
+    from dgps_data.config import connect
+
+    ap = argparse.ArgumentParser(description="Daily site / drone rollups")
+    ap.add_argument("command", choices=("reconcile",))
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--dry-run", action="store_true", help="only count the rows that differ")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    conn = connect()
+    try:
+        for kind, n in reconcile(conn, batch=args.batch, dry_run=args.dry_run).items():
+            print(f"{TABLES[kind][0]}: {n} rows {'differ' if args.dry_run else 'fixed'}")
+    finally:
+        conn.close()
+    sys.exit(0)
@@ -0,0 +1,89 @@
+"""
+Manager teams (active employees under a manager) with a version counter.
+
+Whoever changes team membership (bot.py: join approved, deactivation) calls
+bump() in the same transaction. The dashboard keeps each team in TeamCache:
+within check_ttl seconds it is used as is, after that one primary-key read of
+team_versions (migration 5) decides whether to reload the member list.
+
+members(m) is the active employees (pickers, new work). Report views that
+select by `u.manager_id` (the View Reports tabs, search) also show reports of
+deactivated members: members(m, include_inactive=True) is that same set.
+"""
+import time
+import threading
+
+ROLE_EMPLOYEE = 2
+
+
+def bump(cur, *manager_ids):
+    for mgr_id in {m for m in manager_ids if m is not None}:
+        cur.execute(
+            "INSERT INTO team_versions (manager_id, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1",
+            (mgr_id,),
+        )
+
+
+def version(cur, manager_id) -> int:
+    cur.execute("SELECT version FROM team_versions WHERE manager_id = %s", (manager_id,))
+    row = cur.fetchone()
+    if not row:
+        return 0
+    return row["version"] if isinstance(row, dict) else row[0]
+
+
+def load_members(cur, manager_id, include_inactive=False):
+    if include_inactive:
+        # everyone the tabs' `u.manager_id = %s` join matches
+        where, params = "u.manager_id = %s", (manager_id,)
+    else:
+        where, params = "u.role = %s AND u.is_active = 1 AND u.manager_id = %s", (ROLE_EMPLOYEE, manager_id)
+    cur.execute(
+        "SELECT u.telegram_id, u.first_name, u.last_name, u.username "
+        f"FROM users u WHERE {where} "
+        "ORDER BY u.first_name, u.last_name, u.id",
+        params,
+    )
+    return cur.fetchall()
+
+
+class TeamCache:
+    """
+    manager users.id -> member rows (dicts). `connect` returns a connection
+    usable as a context manager (the app's db_conn).
+    """
+
+    def __init__(self, connect, check_ttl=10.0):
+        self._connect = connect
+        self.check_ttl = check_ttl
+        self._lock = threading.Lock()
+        self._teams = {}  # (manager_id, include_inactive) -> [version, rows, checked_at]
+
+    def members(self, manager_id, include_inactive=False):
+        key = (manager_id, include_inactive)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._teams.get(key)
+            if entry and now - entry[2] < self.check_ttl:
+                return entry[1]
+        with self._connect() as conn, conn.cursor(dictionary=True) as cur:
+            v = version(cur, manager_id)
+            if entry and entry[0] == v:
+                rows = entry[1]
+            else:
+                rows = load_members(cur, manager_id, include_inactive)
+        with self._lock:
+            self._teams[key] = [v, rows, now]
+        return rows
+
+    def member_ids(self, manager_id):
+        return {r["telegram_id"] for r in self.members(manager_id)}
+
+    def invalidate(self, manager_id=None):
+        with self._lock:
+            if manager_id is None:
+                self._teams.clear()
+            else:
+                self._teams.pop((manager_id, False), None)
+                self._teams.pop((manager_id, True), None)
@@ -0,0 +1,124 @@
+"""
+Free-text search over the team's reports: remark / pilot / copilot words and
+flight file names.
+
+Words go through the FULLTEXT index on reports (remark, pilot_name,
+copilot_name; migration 12) in boolean mode: every word is required and
+prefix-matched ("rain del" finds "rain delay"), "quoted words" must appear as
+a phrase. Results are ranked by relevance, then newest; pages are offsets into
+the ranking, capped at MAX_OFFSET (a search is refined, not scrolled).
+
+File names (uav_rover_file, drone_base_file_no) are prefix lookups on their
+report_flights indexes, newest first and keyset paged like the tabs.
+
+    rows, next_offset = text_search.text(cur, q, team_ids, offset, limit)  # SearchError -> 400
+    rows, next_cursor = text_search.files(cur, q, team_ids, after, limit)
+
+bench/text_search.py measures both on a synthetic million-report table.
+"""
+import re
+
+from dgps_data import keyset
+from dgps_data.report_search import SearchError
+
+FT_COLUMNS = "r.remark, r.pilot_name, r.copilot_name"  # exactly the columns of ft_reports_text
+MIN_WORD = 3        # innodb_ft_min_token_size; shorter words are never indexed
+MAX_WORDS = 8
+MAX_OFFSET = 500
+REMARK_CHARS = 200  # remark excerpt in the results
+
+_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_COLUMNS = ("r.id, r.report_date, r.employee_telegram_id, r.site_name, r.drone_name, "
+            "r.pilot_name, r.copilot_name, LEFT(r.remark, %d) AS remark" % REMARK_CHARS)
+
+
+def boolean_query(q):
+    """User text -> an AGAINST(... IN BOOLEAN MODE) string with only +word* / +"phrase" terms."""
+    terms = []
+    for phrase, chunk in _TERM_RE.findall(q or ""):
+        if phrase:
+            words = [w for w in _WORD_RE.findall(phrase) if len(w) >= MIN_WORD]
+            if len(words) > 1:
+                terms.append('+"%s"' % " ".join(words))
+            elif words:
+                terms.append(f"+{words[0]}")
+        else:
+            terms += [f"+{w}*" for w in _WORD_RE.findall(chunk) if len(w) >= MIN_WORD]
+    if not terms:
+        raise SearchError(f"Enter at least one word of {MIN_WORD} or more letters.")
+    if len(terms) > MAX_WORDS:
+        raise SearchError(f"Use at most {MAX_WORDS} words.")
+    return " ".join(terms)
+
+
+def _team(n):
+    return f"r.employee_telegram_id IN ({','.join(['%s'] * n)})"
+
+
+def offset(value):
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return max(0, min(n, MAX_OFFSET))
+
+
+# ----------------- Words (FULLTEXT) -----------------
+def text_sql(team_size):
+    return (
+        f"SELECT {_COLUMNS}, MATCH({FT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) AS score "
+        f"FROM reports r WHERE MATCH({FT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) "
+        f"AND {_team(team_size)} ORDER BY score DESC, r.id DESC LIMIT %s OFFSET %s"
+    )
+
+
+def text(cur, q, team_ids, start=0, limit=keyset.PAGE_SIZE):
+    """(rows with score, next offset or None)."""
+    against = boolean_query(q)
+    team = list(team_ids)
+    if not team:
+        return [], None
+    cur.execute(text_sql(len(team)), [against, against] + team + [limit + 1, start])
+    rows = cur.fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (start + limit if start + limit <= MAX_OFFSET else None)
+    return rows, None
+
+
+# ----------------- File names -----------------
+def like_prefix(q):
+    """Text -> a LIKE 'prefix%' pattern matching it literally (backslash escaped first)."""
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def file_prefix(q):
+    """User text -> an escaped LIKE 'prefix%' pattern."""
+    q = (q or "").strip()
+    if len(q) < MIN_WORD:
+        raise SearchError(f"Enter at least {MIN_WORD} characters of the file name.")
+    return like_prefix(q)
+
+
+def files_sql(team_size, after_sql=""):
+    # UNION of the two prefix ranges (one index each) rather than an OR across two columns
+    return (
+        f"SELECT {_COLUMNS}, GROUP_CONCAT(DISTINCT m.file ORDER BY m.file SEPARATOR ', ') AS files "
+        "FROM (SELECT report_id, uav_rover_file AS file FROM report_flights WHERE uav_rover_file LIKE %s "
+        "      UNION SELECT report_id, drone_base_file_no FROM report_flights WHERE drone_base_file_no LIKE %s) m "
+        f"JOIN reports r ON r.id = m.report_id WHERE {_team(team_size)}{after_sql} "
+        f"GROUP BY r.id ORDER BY {keyset.order(desc=True)} LIMIT %s"
+    )
+
+
+def files(cur, q, team_ids, after=None, limit=keyset.PAGE_SIZE):
+    """(rows with the matching `files`, next keyset cursor or None)."""
+    like = file_prefix(q)
+    team = list(team_ids)
+    if not team:
+        return [], None
+    after_sql, after_params = keyset.after(after, desc=True)
+    cur.execute(files_sql(len(team), after_sql), [like, like] + team + after_params + [limit + 1])
+    return keyset.page(cur.fetchall(), limit)
@@ -0,0 +1,211 @@
+"""
+Per-request phase timings.
+
+A request gets a Timings object in a context variable (set by the ASGI
+middleware for server.py or the Flask hooks for the dashboard). Code marks its
+phases with
+
+    with timing.phase("auth"):
+        ...
+
+and BoundedPool adds "db-checkout" and querylog's cursors one entry per query. At the
+end of the request the phases go out in a Server-Timing header and into rolling
+per-route samples (STATS), which /metrics reports as percentiles. Outside a
+request phase() is a no-op.
+"""
+import os
+import time
+import threading
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager
+
+# Samples kept per route for the percentiles.
+WINDOW = int(os.getenv("TIMING_WINDOW", "1000"))
+# Per-query entries in the header (the db total always covers all of them).
+HEADER_MAX_QUERIES = 20
+SEND_HEADER = os.getenv("SERVER_TIMING_HEADER", "1") == "1"
+
+_current = contextvars.ContextVar("dgps_timings", default=None)
+
+
+class Timings:
+    def __init__(self, route=None):
+        self.route = route
+        self.t0 = time.perf_counter()
+        self.phases = defaultdict(float)  # name -> ms
+        self.queries = []                 # ms per query, in order
+
+    def add(self, name, ms):
+        self.phases[name] += ms
+
+    def add_query(self, ms):
+        self.queries.append(ms)
+        self.phases["db"] += ms
+
+    def total_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def header(self, total_ms):
+        parts = [f"{name};dur={ms:.2f}" for name, ms in self.phases.items() if name != "db"]
+        if self.queries:
+            parts.append(f'db;dur={self.phases["db"]:.2f};desc="{len(self.queries)} queries"')
+            parts += [f"q{i};dur={ms:.2f}" for i, ms in enumerate(self.queries[:HEADER_MAX_QUERIES], start=1)]
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+
+def start(route=None):
+    t = Timings(route)
+    return t, _current.set(t)
+
+
+def current():
+    return _current.get()
+
+
+def finish(route, timings, token):
+    total = timings.total_ms()
+    try:
+        _current.reset(token)
+    except ValueError:  # finished from another context
+        _current.set(None)
+    STATS.record(route, total, timings.phases, len(timings.queries))
+    return total
+
+
+@contextmanager
+def phase(name):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(name, (time.perf_counter() - t0) * 1000)
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class RouteStats:
+    """Rolling window of the last WINDOW requests per route."""
+
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+
+    def record(self, route, total_ms, phases, queries):
+        with self._lock:
+            self._samples[route].append((total_ms, dict(phases), queries))
+            self._counts[route] += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = {r: list(s) for r, s in self._samples.items()}
+            counts = dict(self._counts)
+        out = {}
+        for route, rows in samples.items():
+            totals = sorted(r[0] for r in rows)
+            by_phase = defaultdict(list)
+            for _, phases, _ in rows:
+                for name, ms in phases.items():
+                    by_phase[name].append(ms)
+            out[route] = {
+                "count": counts[route],
+                "window": len(rows),
+                "total_ms": {
+                    "p50": round(_percentile(totals, 0.50), 2),
+                    "p95": round(_percentile(totals, 0.95), 2),
+                    "p99": round(_percentile(totals, 0.99), 2),
+                    "max": round(totals[-1], 2),
+                },
+                "queries_avg": round(sum(r[2] for r in rows) / len(rows), 2),
+                "phases_ms": {
+                    name: {
+                        "p50": round(_percentile(sorted(v), 0.50), 2),
+                        "p95": round(_percentile(sorted(v), 0.95), 2),
+                    }
+                    for name, v in by_phase.items()
+                },
+            }
+        return out
+
+
+STATS = RouteStats()
+
+
+# ----------------- Framework glue -----------------
+class ASGITimingMiddleware:
+    """Server-Timing + route stats for an ASGI app (server.py)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings, token = start(scope.get("path"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and SEND_HEADER:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(timings.total_ms()).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "<other>"
+            finish(f"{scope['method']} {route}", timings, token)
+
+
+def init_flask(app):
+    """Server-Timing + route stats for a Flask app (managers_report)."""
+    from flask import g, request
+    from flask.json.provider import DefaultJSONProvider
+    from flask.signals import before_render_template, template_rendered
+
+    @app.before_request
+    def _timing_start():
+        g._timings, g._timings_token = start(request.path)
+
+    @app.after_request
+    def _timing_header(resp):
+        t = getattr(g, "_timings", None)
+        if t is not None and SEND_HEADER:
+            resp.headers["Server-Timing"] = t.header(t.total_ms())
+        return resp
+
+    @app.teardown_request
+    def _timing_finish(exc):
+        t = g.pop("_timings", None)
+        if t is not None:
+            route = request.url_rule.rule if request.url_rule else "<other>"
+            finish(f"{request.method} {route}", t, g.pop("_timings_token"))
+
+    def _render_start(sender, template, context, **extra):
+        g._render_t0 = time.perf_counter()
+
+    def _render_done(sender, template, context, **extra):
+        t0 = g.pop("_render_t0", None)
+        t = current()
+        if t0 is not None and t is not None:
+            t.add("render", (time.perf_counter() - t0) * 1000)
+
+    before_render_template.connect(_render_start, app, weak=False)
+    template_rendered.connect(_render_done, app, weak=False)
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        def response(self, *args, **kwargs):
+            with phase("serialize"):
+                return super().response(*args, **kwargs)
+
+    app.json = TimedJSONProvider(app)
@@ -0,0 +1,61 @@
+"""
+Small thread-safe in-process cache with per-entry expiry.
+
+For values that are read on every request but change rarely (session tokens,
+manager ids): a miss goes to the DB, writers call set()/pop() so this process
+sees their own change at once, other processes within `ttl` seconds.
+
+    TOKENS = TTLCache(ttl=30)
+    value = TOKENS.get(key, MISS)
+    if value is MISS:
+        value = load(key)
+        TOKENS.set(key, value)
+"""
+import time
+import threading
+from collections import OrderedDict
+
+MISS = object()
+
+
+class TTLCache:
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value), oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISS):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,57 @@
+"""
+SQL of the View Reports tabs (dashboard /api/view/date, employee, sites, drones).
+
+Each builder returns the tab's query as a dict (select, from, where, params,
+desc); page_sql() / count_sql() turn it into the keyset page and the first
+page's total. plan_check EXPLAINs the same statements.
+
+    tab = view_tabs.by_site(mgr_id, site_id, date_opt)
+    after_sql, after_params = keyset.after(after, tab["desc"])
+    cur.execute(view_tabs.page_sql(tab, after_sql), tab["params"] + after_params + [n + 1])
+"""
+from dgps_data import keyset
+
+TEAM_REPORTS = "reports r JOIN users u ON u.telegram_id = r.employee_telegram_id"
+TEAM_SELECT = "r.id, r.report_date, u.first_name, u.last_name"
+
+
+def _tab(select, from_, where, params, desc=True):
+    return {"select": select, "from": from_, "where": where, "params": list(params), "desc": desc}
+
+
+def by_date(mgr_id, d=None, d_from=None, d_to=None):
+    """One day, or d_from..d_to; oldest first, as submitted."""
+    if d_from is not None:
+        return _tab(TEAM_SELECT, TEAM_REPORTS, "u.manager_id = %s AND r.report_date BETWEEN %s AND %s",
+                    [mgr_id, d_from, d_to], desc=False)
+    return _tab(TEAM_SELECT, TEAM_REPORTS, "u.manager_id = %s AND r.report_date = %s", [mgr_id, d], desc=False)
+
+
+def by_employee(tg):
+    # one report per employee and date, so (report_date, id) is the date order
+    return _tab("r.id, r.report_date, r.site_name, r.created_at", "reports r", "r.employee_telegram_id = %s", [tg])
+
+
+def _by_master(col, mgr_id, rec_id, d=""):
+    where, params = f"u.manager_id = %s AND r.{col} = %s", [mgr_id, rec_id]
+    if d:
+        where += " AND r.report_date = %s"
+        params.append(d)
+    return _tab(TEAM_SELECT, TEAM_REPORTS, where, params)
+
+
+def by_site(mgr_id, site_id, d=""):
+    return _by_master("site_id", mgr_id, site_id, d)
+
+
+def by_drone(mgr_id, drone_id, d=""):
+    return _by_master("drone_id", mgr_id, drone_id, d)
+
+
+def page_sql(tab, after_sql=""):
+    return (f"SELECT {tab['select']} FROM {tab['from']} WHERE {tab['where']}{after_sql} "
+            f"ORDER BY {keyset.order(tab['desc'])} LIMIT %s")
+
+
+def count_sql(tab):
+    return f"SELECT COUNT(*) AS c FROM {tab['from']} WHERE {tab['where']}"
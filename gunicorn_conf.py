@@ -0,0 +1,52 @@
+# gunicorn_conf.py
+"""
+Production launch for server.py (gunicorn master + uvicorn workers):
+
+    gunicorn -c gunicorn_conf.py server:app
+    python server.py --prod                 # same thing
+
+Workers default to the CPU count; each worker gets its own MySQL pool, sized so
+that all workers together stay inside DB_CONN_BUDGET connections.
+
+Reloads:
+    kill -HUP <master>    graceful worker restart (config/env; code stays as preloaded)
+    kill -USR2 <master>   start a new master with new code, then -WINCH / -QUIT the old one
+"""
+import os
+import multiprocessing
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ----------------- Workers -----------------
+workers = int(os.getenv("WEB_WORKERS") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("WEB_BIND") or f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# ----------------- DB pool per worker -----------------
+# Total connections this service may hold (leave room for the bot and dashboard).
+DB_CONN_BUDGET = int(os.getenv("DB_CONN_BUDGET", "60"))
+# mysql-connector caps a pool at 32 connections.
+pool_size = max(1, min(32, DB_CONN_BUDGET // workers))
+os.environ.setdefault("DB_POOL_SIZE", str(pool_size))
+
+# ----------------- Lifecycle -----------------
+# Import the app once in the master (faster forks, import errors fail the deploy);
+# server.py builds its pool per worker at startup, not at import.
+preload_app = os.getenv("WEB_PRELOAD", "1") == "1"
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))           # UBX uploads can take a while
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def on_starting(server):
+    server.log.info("workers=%s, DB pool per worker=%s (budget %s)",
+                    workers, os.environ["DB_POOL_SIZE"], DB_CONN_BUDGET)
@@ -1,19 +1,30 @@
 import os
+import sys
 import uuid
 import json
+import hashlib
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    session, jsonify, flash, get_flashed_messages, send_file
+    session, jsonify, flash, get_flashed_messages, send_file, Response, make_response
 )
 #added chnage all things working
 import mysql.connector
-from mysql.connector import pooling
 import json
-import io
-from openpyxl import Workbook
+import tempfile
+
+# Shared modules (dgps_data) live in the repo root, one level up.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data import report_index, grid_coverage, masters, teams, report_export, report_versions, rollups, keyset, report_search
+from dgps_data import repos, report_edit, report_changes, outbox, text_search, view_tabs
+from dgps_data.pool import BoundedPool, Limiter, PoolSaturated
+from dgps_data import timing, querylog, profiling
+from dgps_data.ttlcache import TTLCache, MISS
+from dgps_data.export_jobs import ExportJobs, owner_of
+from dgps_data.live_feed import make_token
+from dgps_data.config import METRICS_HEADER, metrics_allowed
 
 # ----------------- Config -----------------
 load_dotenv()
@@ -25,6 +36,26 @@ MYSQL_DB   = os.getenv("MYSQL_DB", "tg_staffbot")
 MYSQL_USER = os.getenv("MYSQL_USER", "root")
 MYSQL_PASS = os.getenv("MYSQL_PASS", "root@303")
 
+MGR_POOL_SIZE       = int(os.getenv("MGR_POOL_SIZE", "5"))
+DB_CHECKOUT_TIMEOUT = float(os.getenv("DB_CHECKOUT_TIMEOUT", "2"))
+DB_MAX_WAITERS      = int(os.getenv("DB_MAX_WAITERS", str(MGR_POOL_SIZE * 4)))
+
+# Excel downloads running at once; keeps connections free for the views and edits.
+EXPORT_CONCURRENCY  = int(os.getenv("EXPORT_CONCURRENCY", "2"))
+
+ROLE_ADMIN = 0  # users.role, as in bot.py
+
+# Seconds a session_token check is trusted without re-reading manager_logins.
+# Login/logout in this process update it at once; other processes within this.
+SESSION_CHECK_TTL   = float(os.getenv("SESSION_CHECK_TTL", "30"))
+# Seconds a cached team list is used before checking team_versions again.
+TEAM_CHECK_TTL      = float(os.getenv("TEAM_CHECK_TTL", "10"))
+# Rendered report preview fragments, keyed by (report id, reports.version).
+PREVIEW_CACHE_TTL   = float(os.getenv("PREVIEW_CACHE_TTL", "3600"))
+PREVIEW_CACHE_SIZE  = int(os.getenv("PREVIEW_CACHE_SIZE", "2000"))
+# Live feed service (managers_report/live.py); "/live" when proxied on this origin.
+LIVE_URL            = os.getenv("LIVE_URL", "/live").rstrip("/")
+
 # Setup logging
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
@@ -32,6 +63,10 @@ logger = logging.getLogger(__name__)
 # ----------------- App -----------------
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = APP_SECRET
+# Server-Timing header + per-route percentiles (see /metrics)
+timing.init_flask(app)
+# Profiling on demand (X-Profile header, admin ?_profile=1, sampling); see /admin/profiles
+profiling.init_flask(app, is_admin=lambda: bool(session.get("is_admin")))
 
 # Register fmt_ist as a Jinja2 global function
 def fmt_ist(dt_utc_naive):
@@ -81,10 +116,21 @@ def _fromjson_filter(value):
 app.jinja_env.filters['fromjson'] = _fromjson_filter
 
 def _manager_user_id():
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute("SELECT id FROM users WHERE telegram_id = %s LIMIT 1", (session["manager_tg"],))
-        row = cur.fetchone()
-        return row["id"] if row else None
+    # Resolved at login; sessions from before that change look it up once.
+    if "manager_user_id" not in session:
+        with db_conn() as conn:
+            session["manager_user_id"] = repos.Users(conn).id_for_telegram(session["manager_tg"])
+    return session["manager_user_id"]
+
+def _team_members():
+    """Active employees under the logged-in manager (cached, see dgps_data.teams)."""
+    mgr_id = _manager_user_id()
+    return team_cache.members(mgr_id) if mgr_id else []
+
+def _report_team():
+    """Everyone whose reports the tabs show (`u.manager_id`), deactivated members included."""
+    mgr_id = _manager_user_id()
+    return team_cache.members(mgr_id, include_inactive=True) if mgr_id else []
 
 def _full_name(first_name, last_name, username, tg):
     fn = (first_name or "").strip()
@@ -102,11 +148,28 @@ dbconfig = {
     "password": MYSQL_PASS,
     "autocommit": True,
 }
-cnxpool = pooling.MySQLConnectionPool(pool_name="mgrpool", pool_size=5, **dbconfig)
+cnxpool = BoundedPool(
+    pool_name="mgrpool", pool_size=MGR_POOL_SIZE,
+    checkout_timeout=DB_CHECKOUT_TIMEOUT, max_waiters=DB_MAX_WAITERS, **dbconfig
+)
+export_limiter = Limiter("exports", EXPORT_CONCURRENCY)
+# Background Excel exports (worker processes + file cache in EXPORT_DIR)
+export_jobs = ExportJobs(dbconfig)
+team_cache = teams.TeamCache(lambda: db_conn(), TEAM_CHECK_TTL)
+# Query fingerprint stats -> query_stats / slow_queries (see /admin/queries)
+querylog.start_flusher("dashboard", lambda: mysql.connector.connect(**dbconfig))
 
 def db_conn():
     return cnxpool.get_connection()
 
+@app.errorhandler(PoolSaturated)
+def pool_saturated(e):
+    logger.warning(f"Saturated, 503 | {request.method} {request.path} | {e}")
+    resp = jsonify({"ok": False, "message": "Server busy, please retry shortly."})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
 # ----------------- Check for session_token column -----------------
 def has_session_token_column():
     try:
@@ -119,6 +182,26 @@ def has_session_token_column():
 
 SESSION_TOKEN_ENABLED = has_session_token_column()
 
+# login -> current manager_logins.session_token (None when logged out,
+# NO_LOGIN when the row is gone)
+session_tokens = TTLCache(SESSION_CHECK_TTL)
+# Versioned keys never go stale: an edit bumps reports.version and misses them.
+preview_cache = TTLCache(PREVIEW_CACHE_TTL, maxsize=PREVIEW_CACHE_SIZE)
+NO_LOGIN = object()
+
+def current_session_token(login_id):
+    token = session_tokens.get(login_id)
+    if token is MISS:
+        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            cur.execute(
+                "SELECT session_token FROM manager_logins WHERE login = %s LIMIT 1",
+                (login_id,)
+            )
+            row = cur.fetchone()
+        token = row["session_token"] if row else NO_LOGIN
+        session_tokens.set(login_id, token)
+    return token
+
 # ----------------- Time Helpers -----------------
 def today_ist_str():
     return datetime.now().strftime("%Y-%m-%d")
@@ -132,21 +215,29 @@ def login_required(view):
             return redirect(url_for("login", next=request.path))
         if SESSION_TOKEN_ENABLED:
             try:
-                with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-                    cur.execute(
-                        "SELECT session_token FROM manager_logins WHERE login = %s LIMIT 1",
-                        (session["manager_login"],)
-                    )
-                    row = cur.fetchone()
-                    if not row or row["session_token"] != session.get("session_token"):
-                        session.clear()
-                        flash("Session expired. Please log in again.", "danger")
-                        return redirect(url_for("login", next=request.path))
+                token = current_session_token(session["manager_login"])
+                if token is NO_LOGIN or token != session.get("session_token"):
+                    session.clear()
+                    flash("Session expired. Please log in again.", "danger")
+                    return redirect(url_for("login", next=request.path))
+            except PoolSaturated:
+                raise
             except Exception as e:
                 logger.warning(f"Session validation error: {e}")
         return view(*args, **kwargs)
     return wrapped
 
+def admin_required(view):
+    # Use under @login_required; is_admin is set at login from users.role.
+    from functools import wraps
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not session.get("is_admin"):
+            flash("Admins only.", "danger")
+            return redirect(url_for("dashboard"))
+        return view(*args, **kwargs)
+    return wrapped
+
 @app.route("/", methods=["GET"])
 def root():
     return redirect(url_for("dashboard") if session.get("manager_login") else url_for("login"))
@@ -192,12 +283,14 @@ def login():
                     "UPDATE manager_logins SET session_token = %s WHERE login = %s",
                     (new_token, login_id)
                 )
+            session_tokens.set(row["login"], new_token)
         except Exception as e:
+            session_tokens.pop(row["login"])
             logger.warning(f"Failed to update session_token: {e}")
 
     with db_conn() as conn, conn.cursor(dictionary=True) as cur:
         cur.execute(
-            "SELECT first_name, last_name "
+            "SELECT id, first_name, last_name, role "
             "FROM users WHERE telegram_id = %s LIMIT 1",
             (row["telegram_id"],)
         )
@@ -212,6 +305,8 @@ def login():
     session["manager_login"] = row["login"]
     session["manager_tg"] = row["telegram_id"]
     session["manager_name"] = manager_name
+    session["is_admin"] = bool(user and user["role"] == ROLE_ADMIN)
+    session["manager_user_id"] = user["id"] if user else None
     if SESSION_TOKEN_ENABLED:
         session["session_token"] = new_token
     session.permanent = True
@@ -228,7 +323,9 @@ def logout():
                     "UPDATE manager_logins SET session_token = NULL WHERE login = %s",
                     (session["manager_login"],)
                 )
+            session_tokens.set(session["manager_login"], None)
         except Exception as e:
+            session_tokens.pop(session["manager_login"])
             logger.warning(f"Failed to clear session_token: {e}")
     session.clear()
     return redirect(url_for("login"))
@@ -249,26 +346,14 @@ def dashboard():
 @login_required
 def view_report_page():
     # employees (under this manager), plus sites and drones for dropdowns
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(
-            "SELECT u.telegram_id, u.first_name, u.last_name, u.username "
-            "FROM users u "
-            "WHERE u.role = 2 AND u.is_active = 1 AND u.manager_id = "
-            "(SELECT id FROM users WHERE telegram_id = %s LIMIT 1) "
-            "ORDER BY u.first_name, u.last_name, u.id",
-            (session["manager_tg"],)
-        )
-        emps = cur.fetchall()
-        employees = [{
-            "telegram_id": e["telegram_id"],
-            "name": _full_name(e["first_name"], e["last_name"], e["username"], e["telegram_id"])
-        } for e in emps]
+    employees = [{
+        "telegram_id": e["telegram_id"],
+        "name": _full_name(e["first_name"], e["last_name"], e["username"], e["telegram_id"])
+    } for e in _team_members()]
 
-        cur.execute("SELECT name FROM master_sites WHERE is_active = 1 ORDER BY name")
-        sites = cur.fetchall()
-
-        cur.execute("SELECT name FROM master_drones WHERE is_active = 1 ORDER BY name")
-        drones = cur.fetchall()
+    with db_conn() as conn:
+        m = repos.Masters(conn)
+        sites, drones = m.active("site"), m.active("drone")
 
     # This renders your new tabbed UI template (you added this file separately)
     return render_template("view_report.html", employees=employees, sites=sites, drones=drones)
@@ -277,17 +362,7 @@ def view_report_page():
 @app.route("/edit-report", methods=["GET", "POST"])
 @login_required
 def edit_report_page():
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(
-            "SELECT u.telegram_id, u.first_name, u.last_name, u.username "
-            "FROM users u "
-            "WHERE u.role = 2 AND u.is_active = 1 AND u.manager_id = "
-            "(SELECT id FROM users WHERE telegram_id = %s LIMIT 1) "
-            "ORDER BY u.first_name, u.last_name, u.id",
-            (session["manager_tg"],)
-        )
-        emps = cur.fetchall()
-
+    emps = _team_members()
     employees = [
         {
             "telegram_id": e["telegram_id"],
@@ -309,19 +384,12 @@ def edit_report_page():
 @app.route("/api/track")
 @login_required
 def api_track():
+    # ?employee=<tg> returns just that row (the live feed re-checks one employee)
     date_str = request.args.get("date") or today_ist_str()
-    mgr_tg_id = session["manager_tg"]
-
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(
-            "SELECT u.telegram_id, u.first_name, u.last_name, u.username "
-            "FROM users u "
-            "WHERE u.role = 2 AND u.is_active = 1 AND u.manager_id = "
-            "(SELECT id FROM users WHERE telegram_id = %s LIMIT 1) "
-            "ORDER BY u.first_name, u.last_name, u.id",
-            (mgr_tg_id,)
-        )
-        emps = cur.fetchall()
+    emps = _team_members()
+    only = request.args.get("employee")
+    if only:
+        emps = [e for e in emps if str(e["telegram_id"]) == only]
 
     tg_ids = [e["telegram_id"] for e in emps]
     names = {}
@@ -332,15 +400,8 @@ def api_track():
 
     report_by_tg = {}
     if tg_ids:
-        placeholders = ",".join(["%s"] * len(tg_ids))
-        q = (
-            f"SELECT id, employee_telegram_id, created_at "
-            f"FROM reports WHERE report_date = %s AND employee_telegram_id IN ({placeholders})"
-        )
-        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            cur.execute(q, [date_str] + tg_ids)
-            for r in cur.fetchall():
-                report_by_tg[r["employee_telegram_id"]] = {"id": r["id"], "created_at": r["created_at"]}
+        with db_conn() as conn:
+            report_by_tg = repos.Reports(conn).submitted_on(date_str, tg_ids)
 
     rows = []
     for i, tg_id in enumerate(tg_ids, start=1):
@@ -348,6 +409,7 @@ def api_track():
         rows.append({
             "sr": i,
             "employee_telegram_id": tg_id,
+            "report_id": r["id"] if r else None,
             "name": names.get(tg_id, f"tg:{tg_id}"),
             "time": fmt_ist(r["created_at"]) if r else "-",
             "status": "Submitted" if r else "Not Submitted",
@@ -355,68 +417,61 @@ def api_track():
 
     return jsonify({"ok": True, "date": date_str, "rows": rows})
 
+@app.route("/api/live/token")
+@login_required
+def api_live_token():
+    # Signed manager id for the SSE service, which has no access to the session
+    mgr_id = _manager_user_id()
+    if not mgr_id:
+        return jsonify({"ok": False, "message": "Manager not found."}), 403
+    return jsonify({"ok": True, "url": f"{LIVE_URL}/events", "token": make_token(APP_SECRET, mgr_id)})
+
 @app.route("/api/reports")
 @login_required
 def api_reports():
     date_str = request.args.get("date") or today_ist_str()
     employee_tg_id = request.args.get("employee") or ""
-    mgr_tg_id = session["manager_tg"]
 
     if not employee_tg_id:
         return jsonify({"ok": True, "reports": []})
 
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(
-            "SELECT 1 FROM users u "
-            "WHERE u.telegram_id = %s AND u.role = 2 AND u.is_active = 1 AND u.manager_id = "
-            "(SELECT id FROM users WHERE telegram_id = %s LIMIT 1) LIMIT 1",
-            (employee_tg_id, mgr_tg_id)
-        )
-        if not cur.fetchone():
-            return jsonify({"ok": True, "reports": []})
+    if not any(str(e["telegram_id"]) == employee_tg_id for e in _team_members()):
+        return jsonify({"ok": True, "reports": []})
 
-        cur.execute(
-            "SELECT id, report_date, site_name, drone_name, pilot_name, copilot_name, "
-            "base_height_m, created_at, dgps_used_json, dgps_operators_json, "
-            "grid_numbers_json, gcp_points_json, total_area_sq_km, total_time_min, remark "
-            "FROM reports WHERE report_date = %s AND employee_telegram_id = %s",
-            (date_str, employee_tg_id)
-        )
-        reports = cur.fetchall()
+    with db_conn() as conn:
+        reports = repos.Reports(conn).of_employee_on(date_str, int(employee_tg_id))
 
     return jsonify({"ok": True, "reports": reports})
 
-def _get_report(report_id: int):
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(
-            "SELECT r.* "
-            "FROM reports r "
-            "WHERE r.id = %s",
-            (report_id,)
-        )
-        rep = cur.fetchone()
+def _get_report(report_id: int, with_masters=True):
+    # Read-only views pass with_masters=False: the site/drone lists are only for the edit form.
+    with db_conn() as conn:
+        rep = repos.Reports(conn).by_id(report_id)
         if not rep:
             return None, [], [], []
-        cur.execute(
-            "SELECT id, flight_time_min, area_sq_km, uav_rover_file, drone_base_file_no "
-            "FROM report_flights WHERE report_id = %s ORDER BY id",
-            (report_id,)
-        )
-        flights = cur.fetchall()
-        cur.execute(
-            "SELECT name FROM master_sites WHERE is_active = 1 ORDER BY name"
-        )
-        sites = cur.fetchall()
-        cur.execute(
-            "SELECT name FROM master_drones WHERE is_active = 1 ORDER BY name"
-        )
-        drones = cur.fetchall()
-        return rep, flights, sites, drones
+        flights = repos.Reports(conn).flights(report_id)
+        if not with_masters:
+            return rep, flights, [], []
+        m = repos.Masters(conn)
+        return rep, flights, m.active("site"), m.active("drone")
+
+# Changes with report_fragment.html, so browsers don't keep a fragment from an older template.
+with open(os.path.join(app.root_path, app.template_folder, "report_fragment.html"), "rb") as _f:
+    _FRAGMENT_TAG = hashlib.sha1(_f.read()).hexdigest()[:8]
+
+def _fragment_etag(report_id, version):
+    return f"r{report_id}.v{version}.{_FRAGMENT_TAG}"
+
+def _not_modified(etag):
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
 
 @app.route("/report/<int:report_id>", methods=["GET"])
 @login_required
 def report_detail(report_id):
-    rep, flights, _, _ = _get_report(report_id)
+    rep, flights, _, _ = _get_report(report_id, with_masters=False)
     if not rep:
         flash("Report not found.", "danger")
         return redirect(url_for("dashboard"))
@@ -425,13 +480,30 @@ def report_detail(report_id):
 @app.route("/report/<int:report_id>/preview", methods=["GET"])
 @login_required
 def report_preview(report_id):
-    rep, flights, _, _ = _get_report(report_id)
+    fragment = request.args.get("fragment") == "1" or request.headers.get("X-Requested-With") == "fetch"
+    if fragment and request.if_none_match:
+        # Revalidation: one primary-key read of the version, no render
+        with db_conn() as conn:
+            version = repos.Reports(conn).version(report_id)
+        if version is not None and request.if_none_match.contains(_fragment_etag(report_id, version)):
+            return _not_modified(_fragment_etag(report_id, version))
+
+    rep, flights, _, _ = _get_report(report_id, with_masters=False)
     if not rep:
         flash("Report not found.", "danger")
         return ("", 404)
     # If modal/JS asks for a fragment, return only the inner markup
-    if request.args.get("fragment") == "1" or request.headers.get("X-Requested-With") == "fetch":
-        return render_template("report_fragment.html", report=rep, flights=flights)
+    if fragment:
+        etag = _fragment_etag(report_id, rep["version"])
+        key = (report_id, rep["version"])
+        html = preview_cache.get(key)
+        if html is MISS:
+            html = render_template("report_fragment.html", report=rep, flights=flights)
+            preview_cache.set(key, html)
+        resp = make_response(html)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"  # revalidate with If-None-Match every time
+        return resp
     # otherwise return the full standalone page (what you already had)
     return render_template("report_detail.html", report=rep, flights=flights)
 
@@ -514,29 +586,55 @@ def report_edit(report_id):
     if errors:
         return jsonify({"ok": False, "message": "; ".join(errors)})
 
-    # --- Save ---
+    new_values = {
+        "report_date": report_date, "site_name": site_name, "drone_name": drone_name,
+        "pilot_name": pilot, "copilot_name": copilot, "base_height_m": base_h,
+        "dgps_used_json": dgps_used, "dgps_operators_json": dgps_operators,
+        "grid_numbers_json": grid_numbers, "gcp_points_json": gcp_points, "remark": remark,
+        "total_time_min": sum(f["flight_time_min"] for f in flights_data),
+        "total_area_sq_km": sum(f["area_sq_km"] for f in flights_data),
+    }
+    lists = {"dgps_used": dgps_used, "dgps_operators": dgps_operators,
+             "grid_numbers": grid_numbers, "gcp_points": gcp_points}
+
+    # --- Save: only what differs from the stored report (dgps_data.report_edit) ---
     try:
         with db_conn() as conn, conn.cursor() as cur:
-            cur.execute(
-                "UPDATE reports SET report_date=%s, site_name=%s, drone_name=%s, pilot_name=%s, copilot_name=%s, "
-                "base_height_m=%s, dgps_used_json=%s, dgps_operators_json=%s, grid_numbers_json=%s, "
-                "gcp_points_json=%s, remark=%s, total_time_min=%s, total_area_sq_km=%s "
-                "WHERE id=%s",
-                (
-                    report_date, site_name, drone_name, pilot, copilot, base_h,
-                    dgps_used, dgps_operators, grid_numbers, gcp_points, remark,
-                    sum(f["flight_time_min"] for f in flights_data),
-                    sum(f["area_sq_km"] for f in flights_data),
-                    report_id
-                )
-            )
-            cur.execute("DELETE FROM report_flights WHERE report_id=%s", (report_id,))
-            for f in flights_data:
-                cur.execute(
-                    "INSERT INTO report_flights (report_id, flight_time_min, area_sq_km, uav_rover_file, drone_base_file_no) "
-                    "VALUES (%s, %s, %s, %s, %s)",
-                    (report_id, f["flight_time_min"], f["area_sq_km"], f["uav_rover_file"], f["drone_base_file_no"])
-                )
+            site_id = masters.id_for(cur, "site", site_name)
+            drone_id = masters.id_for(cur, "drone", drone_name)
+            if site_id is None or drone_id is None:
+                return jsonify({"ok": False, "message": "Unknown site or drone."})
+            new_values.update(site_id=site_id, drone_id=drone_id)
+
+            # One transaction; the report row stays locked from the compare to the commit
+            conn.start_transaction()
+            old, old_flights = report_edit.load(cur, report_id)
+            if not old:
+                conn.rollback()
+                return jsonify({"ok": False, "message": "Report not found."})
+            changes = report_edit.changed_columns(old, new_values)
+            flights_changed = report_edit.save_flights(cur, report_id, old_flights, flights_data)
+            report_edit.update_report(cur, report_id, changes, flights_changed)  # also bumps reports.version
+            if not changes and not flights_changed:
+                conn.rollback()
+                return jsonify({"ok": True, "message": "No changes to save."})
+
+            changed_lists = [k for k, (_, col) in report_index.LIST_TABLES.items() if col in changes]
+            if changed_lists:
+                report_index.write_children(cur, report_id, lists, replace=True, keys=changed_lists)
+
+            # Coverage: recompute the tiles of the old and the new grid list
+            if changes.keys() & {"site_id", "report_date", "grid_numbers_json"}:
+                grid_coverage.refresh(cur, old["site_id"], old["grid_numbers_json"])
+                grid_coverage.refresh(cur, site_id, grid_numbers)
+            if flights_changed or changes.keys() & {"site_id", "drone_id", "report_date"}:
+                rollups.apply(cur, rollups.snapshot_of(old, old_flights), -1)
+                rollups.apply(cur, rollups.snapshot(cur, report_id))
+            report_versions.bump(cur, old["employee_telegram_id"])
+            report_changes.record(cur, "edited", report_id, old["employee_telegram_id"], report_date, old["created_at"])
+            conn.commit()
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.error(f"Failed to update report {report_id}: {e}")
         return jsonify({"ok": False, "message": "Failed to update report due to a server error."})
@@ -548,7 +646,23 @@ def report_edit(report_id):
 def report_delete(report_id):
     try:
         with db_conn() as conn, conn.cursor() as cur:
+            conn.start_transaction()
+            snap = rollups.snapshot(cur, report_id)
+            cur.execute(
+                "SELECT site_id, grid_numbers_json, employee_telegram_id, report_date, created_at FROM reports WHERE id = %s",
+                (report_id,),
+            )
+            old = cur.fetchone()
+            report_index.delete_children(cur, report_id)
             cur.execute("DELETE FROM reports WHERE id = %s", (report_id,))
+            if old:
+                grid_coverage.refresh(cur, old[0], old[1])
+                report_versions.bump(cur, old[2])
+                rollups.apply(cur, snap, -1)
+                report_changes.record(cur, "deleted", report_id, old[2], old[3], old[4])
+            conn.commit()
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.error(f"Failed to delete report {report_id}: {e}")
         return jsonify({"ok": False, "message": "Failed to delete report due to a server error."})
@@ -556,6 +670,26 @@ def report_delete(report_id):
 
 # ----------------- NEW APIs for View Reports Tabs -----------------
 
+def _ymd(d):
+    return d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d)
+
+def _view_page(cur, tab):
+    """
+    One keyset page (?after=<cursor>&limit=<n>) of a View Reports list
+    (dgps_data.view_tabs), ordered by (report_date, id). The total is counted
+    on the first page only.
+    """
+    after = request.args.get("after")
+    n = keyset.limit(request.args.get("limit"))
+    after_sql, after_params = keyset.after(after, tab["desc"])
+    cur.execute(view_tabs.page_sql(tab, after_sql), tab["params"] + after_params + [n + 1])
+    rows, next_cursor = keyset.page(cur.fetchall(), n)
+    total = None
+    if not keyset.parse(after):
+        cur.execute(view_tabs.count_sql(tab), tab["params"])
+        total = int(cur.fetchone()["c"])
+    return rows, next_cursor, total
+
 @app.route("/api/view/date", methods=["GET"])
 @login_required
 def api_view_date():
@@ -566,56 +700,35 @@ def api_view_date():
     if not mgr_id:
         return jsonify({"ok": True, "rows": [], "message": "Manager not found"})
 
-    rows = []
-    msg = None
+    if mode == "range":
+        dfrom = request.args.get("from")
+        dto = request.args.get("to")
+        if not dfrom or not dto:
+            return jsonify({"ok": False, "rows": [], "message": "Please select From and To dates"})
+        if dto > today:
+            return jsonify({"ok": True, "rows": [], "message": "Future 'To' date selected. No data."})
+        tab = view_tabs.by_date(mgr_id, d_from=dfrom, d_to=dto)
+    else:
+        d = request.args.get("date") or today
+        if d > today:
+            return jsonify({"ok": True, "rows": [], "message": "Future date selected. No data."})
+        tab = view_tabs.by_date(mgr_id, d)
 
     try:
         with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            if mode == "range":
-                dfrom = request.args.get("from")
-                dto = request.args.get("to")
-                if not dfrom or not dto:
-                    return jsonify({"ok": False, "rows": [], "message": "Please select From and To dates"})
-                if dto > today:
-                    msg = "Future 'To' date selected. No data."
-                    return jsonify({"ok": True, "rows": [], "message": msg})
-
-                cur.execute(
-                    "SELECT r.id, r.created_at, u.first_name, u.last_name "
-                    "FROM reports r "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.report_date BETWEEN %s AND %s "
-                    "ORDER BY r.created_at ASC, r.id ASC",
-                    (mgr_id, dfrom, dto)
-                )
-            else:
-                d = request.args.get("date") or today
-                if d > today:
-                    msg = "Future date selected. No data."
-                    return jsonify({"ok": True, "rows": [], "message": msg})
-
-                cur.execute(
-                    "SELECT r.id, r.created_at, u.first_name, u.last_name "
-                    "FROM reports r "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.report_date = %s "
-                    "ORDER BY r.created_at ASC, r.id ASC",
-                    (mgr_id, d)
-                )
-
-            data = cur.fetchall() or []
-            for i, r in enumerate(data, start=1):
-                rows.append({
-                    "sr": i,
-                    "first_name": r["first_name"] or "",
-                    "last_name": r["last_name"] or "",
-                    "id": r["id"],
-                })
+            data, next_cursor, total = _view_page(cur, tab)  # oldest first, as submitted
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.warning(f"/api/view/date error: {e}")
         return jsonify({"ok": False, "rows": [], "message": "Server error"})
 
-    return jsonify({"ok": True, "rows": rows, "message": msg})
+    rows = [{
+        "first_name": r["first_name"] or "",
+        "last_name": r["last_name"] or "",
+        "id": r["id"],
+    } for r in data]
+    return jsonify({"ok": True, "rows": rows, "next": next_cursor, "total": total, "message": None})
 
 @app.route("/api/view/employee", methods=["GET"])
 @login_required
@@ -628,7 +741,6 @@ def api_view_employee():
     if not mgr_id:
         return jsonify({"ok": True, "rows": [], "message": "Manager not found"})
 
-    rows = []
     try:
         with db_conn() as conn, conn.cursor(dictionary=True) as cur:
             # ensure this employee belongs to this manager
@@ -639,174 +751,264 @@ def api_view_employee():
             if not cur.fetchone():
                 return jsonify({"ok": True, "rows": [], "message": "Employee not under this manager"})
 
-            cur.execute(
-                "SELECT id, report_date, site_name, created_at "
-                "FROM reports WHERE employee_telegram_id = %s "
-                "ORDER BY report_date DESC, created_at DESC, id DESC",
-                (tg,)
-            )
-            data = cur.fetchall() or []
-            for i, r in enumerate(data, start=1):
-                rows.append({
-                    "sr": i,
-                    "date": r["report_date"].strftime("%Y-%m-%d") if hasattr(r["report_date"], "strftime") else str(r["report_date"]),
-                    "site_name": r["site_name"],
-                    "created_at": fmt_ist(r["created_at"]),
-                    "id": r["id"]
-                })
+            data, next_cursor, total = _view_page(cur, view_tabs.by_employee(tg))
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.warning(f"/api/view/employee error: {e}")
         return jsonify({"ok": False, "rows": [], "message": "Server error"})
 
-    return jsonify({"ok": True, "rows": rows})
+    rows = [{
+        "date": _ymd(r["report_date"]),
+        "site_name": r["site_name"],
+        "created_at": fmt_ist(r["created_at"]),
+        "id": r["id"]
+    } for r in data]
+    return jsonify({"ok": True, "rows": rows, "next": next_cursor, "total": total})
 
 @app.route("/api/view/sites", methods=["GET"])
 @login_required
 def api_view_sites():
-    site = (request.args.get("site") or "").strip()
+    site_id = masters.parse_id(request.args.get("site_id"))
     date_opt = (request.args.get("date") or "").strip()
-    if not site:
+    if not site_id:
         return jsonify({"ok": True, "rows": [], "total_area": "0.000", "message": "Select a site"})
 
     mgr_id = _manager_user_id()
     if not mgr_id:
         return jsonify({"ok": True, "rows": [], "total_area": "0.000", "message": "Manager not found"})
 
-    rows = []
-    total_area = 0.0
+    tab = view_tabs.by_site(mgr_id, site_id, date_opt)
 
+    total_area = None
     try:
         with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            # list rows
-            if date_opt:
-                cur.execute(
-                    "SELECT r.id, r.report_date, u.first_name, u.last_name "
-                    "FROM reports r "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.site_name = %s AND r.report_date = %s "
-                    "ORDER BY r.report_date DESC, r.id DESC",
-                    (mgr_id, site, date_opt)
-                )
-            else:
-                cur.execute(
-                    "SELECT r.id, r.report_date, u.first_name, u.last_name "
-                    "FROM reports r "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.site_name = %s "
-                    "ORDER BY r.report_date DESC, r.id DESC",
-                    (mgr_id, site)
-                )
-            data = cur.fetchall() or []
-            for i, r in enumerate(data, start=1):
-                rows.append({
-                    "sr": i,
-                    "first_name": r["first_name"] or "",
-                    "last_name": r["last_name"] or "",
-                    "date": r["report_date"].strftime("%Y-%m-%d") if hasattr(r["report_date"], "strftime") else str(r["report_date"]),
-                    "id": r["id"]
-                })
-
-            # total area from report_flights
-            if date_opt:
-                cur.execute(
-                    "SELECT COALESCE(SUM(rf.area_sq_km),0) AS tot "
-                    "FROM report_flights rf "
-                    "JOIN reports r ON r.id = rf.report_id "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.site_name = %s AND r.report_date = %s",
-                    (mgr_id, site, date_opt)
-                )
-            else:
-                cur.execute(
-                    "SELECT COALESCE(SUM(rf.area_sq_km),0) AS tot "
-                    "FROM report_flights rf "
-                    "JOIN reports r ON r.id = rf.report_id "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.site_name = %s",
-                    (mgr_id, site)
-                )
-            tr = cur.fetchone()
-            if tr and tr.get("tot") is not None:
-                total_area = float(tr["tot"])
+            data, next_cursor, total = _view_page(cur, tab)
+            if total is not None:
+                # total area from the daily rollup
+                total_area = float(rollups.totals(cur, "site", site_id, manager_id=mgr_id, report_date=date_opt)["area"])
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.warning(f"/api/view/sites error: {e}")
         return jsonify({"ok": False, "rows": [], "total_area": "0.000", "message": "Server error"})
 
-    return jsonify({"ok": True, "rows": rows, "total_area": f"{total_area:.3f}"})
+    rows = [{
+        "first_name": r["first_name"] or "",
+        "last_name": r["last_name"] or "",
+        "date": _ymd(r["report_date"]),
+        "id": r["id"]
+    } for r in data]
+    return jsonify({
+        "ok": True, "rows": rows, "next": next_cursor, "total": total,
+        "total_area": None if total_area is None else f"{total_area:.3f}",
+    })
 
 @app.route("/api/view/drones", methods=["GET"])
 @login_required
 def api_view_drones():
-    drone = (request.args.get("drone") or "").strip()
+    drone_id = masters.parse_id(request.args.get("drone_id"))
     date_opt = (request.args.get("date") or "").strip()
-    if not drone:
+    if not drone_id:
         return jsonify({"ok": True, "rows": [], "total_flights": 0, "message": "Select a drone"})
 
     mgr_id = _manager_user_id()
     if not mgr_id:
         return jsonify({"ok": True, "rows": [], "total_flights": 0, "message": "Manager not found"})
 
-    rows = []
-    total_flights = 0
+    tab = view_tabs.by_drone(mgr_id, drone_id, date_opt)
 
+    total_flights = None
     try:
         with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            # list rows
-            if date_opt:
-                cur.execute(
-                    "SELECT r.id, r.report_date, u.first_name, u.last_name "
-                    "FROM reports r "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.drone_name = %s AND r.report_date = %s "
-                    "ORDER BY r.report_date DESC, r.id DESC",
-                    (mgr_id, drone, date_opt)
-                )
+            data, next_cursor, total = _view_page(cur, tab)
+            if total is not None:
+                # total flights from the daily rollup
+                total_flights = rollups.totals(cur, "drone", drone_id, manager_id=mgr_id, report_date=date_opt)["flights"]
+    except PoolSaturated:
+        raise
+    except Exception as e:
+        logger.warning(f"/api/view/drones error: {e}")
+        return jsonify({"ok": False, "rows": [], "total_flights": 0, "message": "Server error"})
+
+    rows = [{
+        "first_name": r["first_name"] or "",
+        "last_name": r["last_name"] or "",
+        "date": _ymd(r["report_date"]),
+        "id": r["id"]
+    } for r in data]
+    return jsonify({"ok": True, "rows": rows, "next": next_cursor, "total": total, "total_flights": total_flights})
+
+@app.route("/api/view/search", methods=["GET"])
+@login_required
+def api_view_search():
+    """
+    Reports of the team matching any mix of ?employee=, ?site_id=, ?drone_id=
+    (repeated or comma-separated) and ?from= / ?to=, newest first and keyset
+    paged like the tabs (?after=, ?limit=). The first page also has the total
+    and per site / drone / employee counts.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    try:
+        filters = report_search.parse(request.args, today)
+    except report_search.SearchError as e:
+        return jsonify({"ok": False, "rows": [], "message": str(e)}), 400
+
+    team = _report_team()  # same team as the tabs
+    names = report_export.team_names(team)
+    where, params = report_search.where(filters, names)
+    after = request.args.get("after")
+
+    facets = None
+    try:
+        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            data, next_cursor = report_search.page(cur, where, params, after, keyset.limit(request.args.get("limit")))
+            if not keyset.parse(after):
+                facets = report_search.facets(cur, where, params, names)
+    except PoolSaturated:
+        raise
+    except Exception as e:
+        logger.warning(f"/api/view/search error: {e}")
+        return jsonify({"ok": False, "rows": [], "message": "Server error"})
+
+    rows = [{
+        "id": r["id"],
+        "date": _ymd(r["report_date"]),
+        "employee": names.get(r["employee_telegram_id"], ("", "", f"tg:{r['employee_telegram_id']}"))[2],
+        "site_name": r["site_name"],
+        "drone_name": r["drone_name"],
+    } for r in data]
+    return jsonify({
+        "ok": True, "rows": rows, "next": next_cursor,
+        "total": facets["total"] if facets else None, "facets": facets,
+    })
+
+@app.route("/api/view/find", methods=["GET"])
+@login_required
+def api_view_find():
+    """
+    Free-text search of the team's reports (dgps_data.text_search).
+    ?in=text (default): words of remark / pilot / copilot, best match first,
+    paged by ?offset=. ?in=files: flight file name prefix, newest first, paged
+    by ?after=. Both take ?q= and ?limit=.
+    """
+    q = (request.args.get("q") or "").strip()
+    where = request.args.get("in") or "text"
+    if where not in ("text", "files"):
+        return jsonify({"ok": False, "rows": [], "message": "Unknown search field."}), 400
+
+    team = _report_team()  # same team as the tabs
+    names = report_export.team_names(team)
+    limit = keyset.limit(request.args.get("limit"))
+    try:
+        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            if where == "text":
+                data, next_page = text_search.text(cur, q, list(names), text_search.offset(request.args.get("offset")), limit)
             else:
-                cur.execute(
-                    "SELECT r.id, r.report_date, u.first_name, u.last_name "
-                    "FROM reports r "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.drone_name = %s "
-                    "ORDER BY r.report_date DESC, r.id DESC",
-                    (mgr_id, drone)
-                )
-            data = cur.fetchall() or []
-            for i, r in enumerate(data, start=1):
+                data, next_page = text_search.files(cur, q, list(names), request.args.get("after"), limit)
+    except report_search.SearchError as e:
+        return jsonify({"ok": False, "rows": [], "message": str(e)}), 400
+    except PoolSaturated:
+        raise
+    except Exception as e:
+        logger.warning(f"/api/view/find error: {e}")
+        return jsonify({"ok": False, "rows": [], "message": "Server error"})
+
+    rows = [{
+        "id": r["id"],
+        "date": _ymd(r["report_date"]),
+        "employee": names.get(r["employee_telegram_id"], ("", "", f"tg:{r['employee_telegram_id']}"))[2],
+        "site_name": r["site_name"],
+        "drone_name": r["drone_name"],
+        "pilot_name": r["pilot_name"] or "",
+        "copilot_name": r["copilot_name"] or "",
+        "remark": r["remark"] or "",
+        "files": r.get("files") or "",
+        "score": round(float(r["score"]), 3) if "score" in r else None,
+    } for r in data]
+    return jsonify({"ok": True, "rows": rows, "next": next_page})
+
+@app.route("/api/view/coverage", methods=["GET"])
+@login_required
+def api_view_coverage():
+    """Grid coverage map of a site: one row per surveyed tile (sheet/row/col)."""
+    site_id = masters.parse_id(request.args.get("site_id"))
+    if not site_id:
+        return jsonify({"ok": True, "tiles": [], "message": "Select a site"})
+
+    tiles = []
+    try:
+        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            cur.execute(
+                "SELECT tile_key, grid_code, first_date, last_date, report_count "
+                "FROM grid_coverage WHERE site_id = %s ORDER BY tile_key",
+                (site_id,)
+            )
+            for r in cur.fetchall():
+                t = grid_coverage.decode_tile(int(r["tile_key"]))
+                tiles.append({
+                    "grid_code": r["grid_code"],
+                    "sheet": t["sheet"],
+                    "row": t["row"],
+                    "col": t["col"],
+                    "first_date": r["first_date"].strftime("%Y-%m-%d"),
+                    "last_date": r["last_date"].strftime("%Y-%m-%d"),
+                    "report_count": r["report_count"],
+                })
+    except PoolSaturated:
+        raise
+    except Exception as e:
+        logger.warning(f"/api/view/coverage error: {e}")
+        return jsonify({"ok": False, "tiles": [], "message": "Server error"})
+
+    return jsonify({"ok": True, "site_id": site_id, "tiles": tiles})
+
+# ----------------- Lookups over the report list child tables -----------------
+@app.route("/api/lookup/<kind>", methods=["GET"])
+@login_required
+def api_lookup(kind):
+    """
+    Reports of this manager's team whose list field contains a value:
+      /api/lookup/grids?q=H43R12A17     /api/lookup/dgps?q=R4S-314
+      /api/lookup/operators?q=Alice     /api/lookup/gcps?q=CP1
+    match=prefix turns it into a prefix search (still an index range scan).
+    """
+    key = report_index.LOOKUP_KINDS.get(kind)
+    if not key:
+        return jsonify({"ok": False, "rows": [], "message": "Unknown lookup."}), 404
+    q = report_index.item_key(request.args.get("q"))
+    if not q:
+        return jsonify({"ok": True, "rows": [], "message": "Enter a value"})
+
+    mgr_id = _manager_user_id()
+    if not mgr_id:
+        return jsonify({"ok": True, "rows": [], "message": "Manager not found"})
+
+    prefix = request.args.get("match") == "prefix"
+    arg = text_search.like_prefix(q) if prefix else q
+
+    rows = []
+    try:
+        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            cur.execute(report_index.lookup_sql(key, prefix), (arg, mgr_id))
+            for i, r in enumerate(cur.fetchall(), start=1):
                 rows.append({
                     "sr": i,
+                    "id": r["id"],
+                    "date": r["report_date"].strftime("%Y-%m-%d") if hasattr(r["report_date"], "strftime") else str(r["report_date"]),
+                    "site_name": r["site_name"],
+                    "drone_name": r["drone_name"],
+                    "item": r["item"],
                     "first_name": r["first_name"] or "",
                     "last_name": r["last_name"] or "",
-                    "date": r["report_date"].strftime("%Y-%m-%d") if hasattr(r["report_date"], "strftime") else str(r["report_date"]),
-                    "id": r["id"]
                 })
-
-            # total flights from report_flights
-            if date_opt:
-                cur.execute(
-                    "SELECT COUNT(*) AS c "
-                    "FROM report_flights rf "
-                    "JOIN reports r ON r.id = rf.report_id "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.drone_name = %s AND r.report_date = %s",
-                    (mgr_id, drone, date_opt)
-                )
-            else:
-                cur.execute(
-                    "SELECT COUNT(*) AS c "
-                    "FROM report_flights rf "
-                    "JOIN reports r ON r.id = rf.report_id "
-                    "JOIN users u ON u.telegram_id = r.employee_telegram_id "
-                    "WHERE u.manager_id = %s AND r.drone_name = %s",
-                    (mgr_id, drone)
-                )
-            tr = cur.fetchone()
-            if tr and tr.get("c") is not None:
-                total_flights = int(tr["c"])
+    except PoolSaturated:
+        raise
     except Exception as e:
-        logger.warning(f"/api/view/drones error: {e}")
-        return jsonify({"ok": False, "rows": [], "total_flights": 0, "message": "Server error"})
+        logger.warning(f"/api/lookup/{kind} error: {e}")
+        return jsonify({"ok": False, "rows": [], "message": "Server error"})
 
-    return jsonify({"ok": True, "rows": rows, "total_flights": total_flights})
+    return jsonify({"ok": True, "rows": rows})
 
 #download working code excel
 @app.get("/view-reports/download")
@@ -817,359 +1019,214 @@ def view_reports_download():
       - tab = date | employee | sites | drones
       - Returns an .xlsx with two sheets: 'Summary' and 'Detailed Info'
     Filters (per tab) come in as querystring params.
+    At most EXPORT_CONCURRENCY run at once; beyond that the client gets 503 + Retry-After.
     """
+    with export_limiter:
+        return _build_download()
+
+def _build_download():
     tab = (request.args.get("tab") or "").strip().lower()
-    if tab not in ("date", "employee", "sites", "drones"):
-        return jsonify({"ok": False, "message": "Invalid tab."}), 400
+    today = datetime.now().strftime("%Y-%m-%d")
+    try:
+        plan = report_export.build_plan(tab, request.args, _team_members(), today)
+    except report_export.ExportError as e:
+        return jsonify({"ok": False, "message": str(e)}), 400
+
+    # Written to a temp file (write-only workbook, unbuffered cursors), then
+    # streamed from disk; the DB connection is back in the pool before the
+    # client starts downloading.
+    fd, path = tempfile.mkstemp(prefix="view_reports_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        with timing.phase("render"):
+            with db_conn() as conn:
+                report_export.write_xlsx(conn, plan, path)
+    except report_export.ExportError as e:
+        os.remove(path)
+        return jsonify({"ok": False, "message": str(e)}), 400
+    except BaseException:
+        os.remove(path)
+        raise
+
+    # Removed on response close, which also runs when the body is never
+    # iterated (HEAD, client gone before the first chunk).
+    size = os.path.getsize(path)
+    f = open(path, "rb")
+
+    def _stream():
+        while True:
+            chunk = f.read(256 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+    def _cleanup():
+        f.close()
+        os.remove(path)
 
-    mgr_tg_id = session["manager_tg"]
+    fname = f"view_reports_{tab}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    resp = Response(
+        _stream(),
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={
+            "Content-Disposition": f'attachment; filename="{fname}"',
+            "Content-Length": str(size),
+        },
+    )
+    resp.call_on_close(_cleanup)
+    return resp
+
+
+# ----------------- Background exports -----------------
+@app.post("/view-reports/export")
+@login_required
+def view_reports_export():
+    """
+    Queue the active tab's Excel export (same filters as /view-reports/download).
+    Returns a job id to poll; the same filters on unchanged data reuse the
+    cached file.
+    """
+    tab = (request.values.get("tab") or "").strip().lower()
     today = datetime.now().strftime("%Y-%m-%d")
+    try:
+        plan = report_export.build_plan(tab, request.values, _team_members(), today)
+    except report_export.ExportError as e:
+        return jsonify({"ok": False, "message": str(e)}), 400
 
-    # Helper: get manager's employee tg list + names
-    def _team_employees():
-        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                "SELECT u.telegram_id, u.first_name, u.last_name, u.username "
-                "FROM users u "
-                "WHERE u.role = 2 AND u.is_active = 1 AND u.manager_id = "
-                "(SELECT id FROM users WHERE telegram_id = %s LIMIT 1) "
-                "ORDER BY u.first_name, u.last_name, u.id",
-                (mgr_tg_id,)
-            )
-            rows = cur.fetchall()
-        names = {}
-        tgs = []
-        for e in rows:
-            fn = (e["first_name"] or "").strip()
-            ln = (e["last_name"] or "").strip()
-            full = (fn + " " + ln).strip() or (e["username"] or f"tg:{e['telegram_id']}")
-            names[e["telegram_id"]] = (fn, ln, full)
-            tgs.append(e["telegram_id"])
-        return tgs, names
-
-    emp_tgs, emp_names = _team_employees()
-    if not emp_tgs:
-        return jsonify({"ok": False, "message": "No employees assigned."}), 400
-
-    def _rows_date():
-        mode = (request.args.get("mode") or "single").lower()
-        rows = []
-        summary_rows = []  # Sr., first_name, last_name, created_at, id
-        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            if mode == "range":
-                d_from = (request.args.get("from") or "").strip()
-                d_to = (request.args.get("to") or "").strip()
-                if not d_from or not d_to:
-                    return {"message": "Please select From and To dates.", "rows": [], "summary": [], "range": (d_from, d_to)}
-                if d_to > today:
-                    return {"message": "Future To date selected. No data.", "rows": [], "summary": [], "range": (d_from, d_to)}
-                placeholders = ",".join(["%s"] * len(emp_tgs))
-                cur.execute(
-                    f"SELECT r.id, r.employee_telegram_id, r.report_date, r.created_at "
-                    f"FROM reports r WHERE r.report_date BETWEEN %s AND %s AND r.employee_telegram_id IN ({placeholders}) "
-                    f"ORDER BY r.created_at DESC",
-                    [d_from, d_to] + emp_tgs
-                )
-                data = cur.fetchall()
-                sr = 1
-                for r in data:
-                    fn, ln, _ = emp_names.get(r["employee_telegram_id"], ("", "", ""))
-                    summary_rows.append([sr, fn, ln, fmt_ist(r["created_at"]), r["id"]])
-                    sr += 1
-                return {"rows": data, "summary": summary_rows, "mode": "range", "range": (d_from, d_to)}
-            else:
-                d = (request.args.get("date") or "").strip()
-                if not d:
-                    return {"message": "Please select a date.", "rows": [], "summary": [], "date": d}
-                if d > today:
-                    return {"message": "Future date selected. No data.", "rows": [], "summary": [], "date": d}
-                placeholders = ",".join(["%s"] * len(emp_tgs))
-                cur.execute(
-                    f"SELECT r.id, r.employee_telegram_id, r.report_date, r.created_at "
-                    f"FROM reports r WHERE r.report_date = %s AND r.employee_telegram_id IN ({placeholders}) "
-                    f"ORDER BY r.created_at DESC",
-                    [d] + emp_tgs
-                )
-                data = cur.fetchall()
-                sr = 1
-                for r in data:
-                    fn, ln, _ = emp_names.get(r["employee_telegram_id"], ("", "", ""))
-                    summary_rows.append([sr, fn, ln, fmt_ist(r["created_at"]), r["id"]])
-                    sr += 1
-                return {"rows": data, "summary": summary_rows, "mode": "single", "date": d}
-
-    def _rows_employee():
-        tg = (request.args.get("employee") or "").strip()
-        if not tg:
-            return {"message": "Select an employee.", "rows": [], "summary": [], "emp_name": ""}
-        try:
-            tg = int(tg)
-        except:
-            return {"message": "Invalid employee.", "rows": [], "summary": [], "emp_name": ""}
+    with db_conn() as conn:
+        job_id, status = export_jobs.submit(conn, _manager_user_id(), plan)
+    return jsonify({"ok": True, "job_id": job_id, "status": status})
 
-        if tg not in emp_names:
-            return {"message": "Employee not in your team.", "rows": [], "summary": [], "emp_name": ""}
+def _own_export(job_id):
+    return owner_of(job_id) == _manager_user_id()
 
-        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                "SELECT id, report_date, site_name, created_at "
-                "FROM reports WHERE employee_telegram_id = %s ORDER BY created_at DESC",
-                (tg,)
-            )
-            data = cur.fetchall()
-        # Summary rows: Sr., Date, Site, Submitted at, id
-        summary = []
-        for i, r in enumerate(data, start=1):
-            summary.append([i, r["report_date"], r["site_name"], fmt_ist(r["created_at"]), r["id"]])
-        return {"rows": data, "summary": summary, "emp_name": " ".join([x for x in emp_names[tg][:2] if x])}
-
-    def _rows_sites():
-        site = (request.args.get("site") or "").strip()
-        d = (request.args.get("date") or "").strip()
-        if not site:
-            return {"message": "Select a site.", "rows": [], "summary": [], "site": site, "date": d, "total_area": 0.0}
-
-        placeholders = ",".join(["%s"] * len(emp_tgs))
-        params = []
-        where = f"r.site_name = %s AND r.employee_telegram_id IN ({placeholders})"
-        params.append(site)
-        params += emp_tgs
-        if d:
-            where += " AND r.report_date = %s"
-            params.append(d)
+@app.get("/view-reports/export/<job_id>")
+@login_required
+def view_reports_export_status(job_id):
+    st = export_jobs.status(job_id) if _own_export(job_id) else None
+    if st is None:
+        return jsonify({"ok": False, "message": "Export not found."}), 404
+    out = {"ok": True, "job_id": job_id, **st}
+    if st["status"] == "done":
+        out["download_url"] = url_for("view_reports_export_download", job_id=job_id)
+    return jsonify(out)
+
+@app.get("/view-reports/export/<job_id>/download")
+@login_required
+def view_reports_export_download(job_id):
+    path = export_jobs.path(job_id)
+    if not _own_export(job_id) or not os.path.isfile(path):
+        return ("", 404)
+    tab = job_id.split("-")[1]
+    fname = f"view_reports_{tab}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return send_file(
+        path, as_attachment=True, download_name=fname,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
 
+# ----------------- Admin: query stats -----------------
+@app.route("/admin/queries", methods=["GET"])
+@login_required
+@admin_required
+def admin_queries():
+    top, slow, error = [], [], None
+    try:
         with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            # every process flushes its own rows; sum them per fingerprint
             cur.execute(
-                f"SELECT r.id, r.employee_telegram_id, r.report_date, r.created_at, r.total_area_sq_km "
-                f"FROM reports r WHERE {where} ORDER BY r.created_at DESC",
-                params
+                "SELECT fp_id, app, MIN(fingerprint) AS fingerprint, SUM(calls) AS calls, "
+                "SUM(total_ms) AS total_ms, MAX(max_ms) AS max_ms, MAX(p95_ms) AS p95_ms, "
+                "MAX(updated_at) AS updated_at "
+                "FROM query_stats GROUP BY fp_id, app ORDER BY total_ms DESC LIMIT 50"
             )
-            data = cur.fetchall()
-        summary = []
-        total_area = 0.0
-        for i, r in enumerate(data, start=1):
-            fn, ln, _ = emp_names.get(r["employee_telegram_id"], ("", "", ""))
-            summary.append([i, fn, ln, r["report_date"], fmt_ist(r["created_at"]), r["id"]])
-            try:
-                total_area += float(r["total_area_sq_km"] or 0)
-            except:
-                pass
-        return {"rows": data, "summary": summary, "site": site, "date": d, "total_area": round(total_area, 3)}
-
-    def _rows_drones():
-        drone = (request.args.get("drone") or "").strip()
-        d = (request.args.get("date") or "").strip()
-        if not drone:
-            return {"message": "Select a drone.", "rows": [], "summary": [], "drone": drone, "date": d, "total_flights": 0, "total_time": 0}
-
-        placeholders = ",".join(["%s"] * len(emp_tgs))
-        params = []
-        where = f"r.drone_name = %s AND r.employee_telegram_id IN ({placeholders})"
-        params.append(drone)
-        params += emp_tgs
-        if d:
-            where += " AND r.report_date = %s"
-            params.append(d)
-
-        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            top = cur.fetchall()
             cur.execute(
-                f"SELECT r.id, r.employee_telegram_id, r.report_date, r.created_at "
-                f"FROM reports r WHERE {where} ORDER BY r.created_at DESC",
-                params
+                "SELECT id, app, fp_id, ms, route, statement, created_at "
+                "FROM slow_queries ORDER BY id DESC LIMIT 50"
             )
-            data = cur.fetchall()
-
-            # flights count + total time from report_flights
-            if data:
-                ids = [x["id"] for x in data]
-                placeholders2 = ",".join(["%s"] * len(ids))
-                cur.execute(
-                    f"SELECT rf.report_id, COUNT(*) AS c, SUM(rf.flight_time_min) AS t "
-                    f"FROM report_flights rf WHERE rf.report_id IN ({placeholders2}) "
-                    f"GROUP BY rf.report_id",
-                    ids
-                )
-                agg = {row["report_id"]: (int(row["c"] or 0), int(row["t"] or 0)) for row in cur.fetchall()}
-            else:
-                agg = {}
-
-        summary = []
-        total_flights = 0
-        total_time = 0
-        for i, r in enumerate(data, start=1):
-            fn, ln, _ = emp_names.get(r["employee_telegram_id"], ("", "", ""))
-            c, t = agg.get(r["id"], (0, 0))
-            total_flights += c
-            total_time += t
-            summary.append([i, fn, ln, r["report_date"], fmt_ist(r["created_at"]), r["id"]])
-        return {"rows": data, "summary": summary, "drone": drone, "date": d, "total_flights": total_flights, "total_time": total_time}
-
-    # Pull rows & meta for the selected tab
-    if tab == "date":
-        payload = _rows_date()
-    elif tab == "employee":
-        payload = _rows_employee()
-    elif tab == "sites":
-        payload = _rows_sites()
-    else:
-        payload = _rows_drones()
-
-    rows = payload.get("rows", [])
-    summary_rows = payload.get("summary", [])
-    if not rows:
-        # no data — keep client button disabled normally, but guard here too
-        return jsonify({"ok": False, "message": "No data to download for current filters."}), 400
-
-    # ---------- Build workbook ----------
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Summary"
-    ws2 = wb.create_sheet("Detailed Info")
-
-    # HEADER + META for Summary
-    if tab == "date":
-        ws1.append(["Mode", (payload.get("mode") or "").capitalize()])
-        if payload.get("mode") == "range":
-            f, t = payload.get("range") or ("", "")
-            ws1.append(["From", f])
-            ws1.append(["To", t])
-        else:
-            ws1.append(["Date", payload.get("date", "")])
-        ws1.append([])  # gap
-        ws1.append(["Sr. No.", "Employee First Name", "Employee Last Name", "Report Submitted At", "Report ID"])
-        for row in summary_rows:
-            ws1.append(row)
-
-    elif tab == "employee":
-        ws1.append(["Employee", payload.get("emp_name", "")])
-        ws1.append([])
-        ws1.append(["Sr. No.", "Date", "Site Name", "Submitted At", "Report ID"])
-        for row in summary_rows:
-            ws1.append(row)
-
-    elif tab == "sites":
-        ws1.append(["Site Name", payload.get("site", "")])
-        if payload.get("date"):
-            ws1.append(["Date Filter", payload.get("date")])
-        ws1.append([])
-        ws1.append(["Sr. No.", "Employee First Name", "Employee Last Name", "Date", "Submitted At", "Report ID"])
-        for row in summary_rows:
-            ws1.append(row)
-        ws1.append([])
-        ws1.append(["Total Area (sq km)", payload.get("total_area", 0.0)])
-
-    else:  # drones
-        ws1.append(["Drone", payload.get("drone", "")])
-        ws1.append(["Date", payload.get("date", "") or "-"])
-        ws1.append([])
-        ws1.append(["Sr. No.", "Employee First Name", "Employee Last Name", "Date", "Submitted At", "Report ID"])
-        for row in summary_rows:
-            ws1.append(row)
-        ws1.append([])
-        ws1.append(["Total Flights", payload.get("total_flights", 0)])
-        ws1.append(["Total Flight Time (min)", payload.get("total_time", 0)])
-
-    # DETAILED INFO — join reports + report_flights (+ users for names when needed)
-    ids = [r["id"] for r in rows]
-    placeholders = ",".join(["%s"] * len(ids))
-    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
-        # pull reports
-        cur.execute(
-            f"SELECT r.id, r.employee_telegram_id, r.report_date, r.site_name, r.drone_name, r.pilot_name, r.copilot_name, "
-            f"r.dgps_used_json, r.dgps_operators_json, r.grid_numbers_json, r.gcp_points_json, "
-            f"r.base_height_m, r.total_area_sq_km, r.total_time_min, r.remark, r.created_at "
-            f"FROM reports r WHERE r.id IN ({placeholders})",
-            ids
-        )
-        rep_map = {row["id"]: row for row in cur.fetchall()}
+            slow = cur.fetchall()
+    except PoolSaturated:
+        raise
+    except Exception as e:
+        logger.warning(f"admin_queries failed: {e}")
+        error = "Query stats unavailable (run python -m dgps_data.migrations)."
+    return render_template(
+        "admin_queries.html",
+        top=top, slow=slow, error=error,
+        local=querylog.STATS.snapshot(top=20),
+        slow_ms=querylog.SLOW_QUERY_MS,
+    )
 
-        # flights
-        cur.execute(
-            f"SELECT rf.report_id, rf.flight_time_min, rf.area_sq_km, rf.uav_rover_file, rf.drone_base_file_no "
-            f"FROM report_flights rf WHERE rf.report_id IN ({placeholders}) ORDER BY rf.report_id, rf.id",
-            ids
-        )
-        fl_by_rep = {}
-        for rf in cur.fetchall():
-            fl_by_rep.setdefault(rf["report_id"], []).append(rf)
-
-    # headers for ws2 (no Telegram IDs)
-    if tab == "employee":
-        ws2.append([
-            "Report ID","Date","Site Name","Drone","Pilot","Copilot",
-            "DGPS Used","DGPS Operators","Grid Numbers","GCP Points",
-            "Base Height (m)","Total Area (sq km)","Total Time (min)","Remark","Submitted At",
-            "Flight Time (min)","Flight Area (sq km)","UBX","Base File"
-        ])
-    else:
-        ws2.append([
-            "Employee First Name","Employee Last Name",
-            "Report ID","Date","Site Name","Drone","Pilot","Copilot",
-            "DGPS Used","DGPS Operators","Grid Numbers","GCP Points",
-            "Base Height (m)","Total Area (sq km)","Total Time (min)","Remark","Submitted At",
-            "Flight Time (min)","Flight Area (sq km)","UBX","Base File"
-        ])
-
-    # helper to normalize JSON lists to CSV string
-    def _csv(v):
-        try:
-            if isinstance(v, list):
-                return ", ".join([str(x) for x in v])
-            if isinstance(v, str):
-                import json as _json
-                try:
-                    parsed = _json.loads(v)
-                    if isinstance(parsed, list):
-                        return ", ".join([str(x) for x in parsed])
-                except Exception:
-                    pass
-                return v
-            return str(v) if v is not None else ""
-        except Exception:
-            return str(v) if v is not None else ""
-
-    # write detailed rows
-    for rid in ids:
-        r = rep_map.get(rid)
-        if not r:
-            continue
-        # name fields (avoid telegram id)
-        fn, ln, _ = emp_names.get(r["employee_telegram_id"], ("", "", ""))
-        # JSON stringify nicely
-        used = _csv(r["dgps_used_json"])
-        ops  = _csv(r["dgps_operators_json"])
-        grid = _csv(r["grid_numbers_json"])
-        gcp  = _csv(r["gcp_points_json"])
-
-        flights = fl_by_rep.get(rid, []) or [None]  # at least one line per report
-        for rf in flights:
-            flight_vals = (
-                (rf["flight_time_min"] if rf else ""),
-                (rf["area_sq_km"] if rf else ""),
-                (rf["uav_rover_file"] if rf else ""),
-                (rf["drone_base_file_no"] if rf else "")
-            )
-            common = [
-                r["id"], r["report_date"], r["site_name"], r["drone_name"], r["pilot_name"], r["copilot_name"],
-                used, ops, grid, gcp,
-                r["base_height_m"], r["total_area_sq_km"], r["total_time_min"], r["remark"], fmt_ist(r["created_at"])
-            ]
-            if tab == "employee":
-                ws2.append([*common, *flight_vals])
-            else:
-                ws2.append([fn, ln, *common, *flight_vals])
+@app.route("/admin/queries/explain/<int:slow_id>", methods=["POST"])
+@login_required
+@admin_required
+def admin_query_explain(slow_id):
+    try:
+        with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT statement, params FROM slow_queries WHERE id = %s", (slow_id,))
+            row = cur.fetchone()
+        if not row:
+            return jsonify({"ok": False, "message": "Not found."}), 404
+        params = json.loads(row["params"]) if row["params"] else None
+        if isinstance(params, list):
+            params = tuple(params)
+        with db_conn() as conn, conn.cursor() as cur:
+            cols, rows = querylog.explain(cur, row["statement"], params)
+        rows = [[v.decode() if isinstance(v, (bytes, bytearray)) else v for v in r] for r in rows]
+        return jsonify({"ok": True, "columns": cols, "rows": rows})
+    except PoolSaturated:
+        raise
+    except ValueError as e:
+        return jsonify({"ok": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"EXPLAIN failed for slow query {slow_id}: {e}")
+        return jsonify({"ok": False, "message": str(e)}), 500
 
-    # stream it
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    fname = f"view_reports_{tab}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    return send_file(output,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                     as_attachment=True,
-                     download_name=fname)
+# ----------------- Admin: request profiles -----------------
+@app.route("/admin/profiles", methods=["GET"])
+@app.route("/admin/profiles/<pid>", methods=["GET"])
+@login_required
+@admin_required
+def admin_profiles(pid=None):
+    sort = request.args.get("sort", "cumulative")
+    text = None
+    if pid is not None:
+        text = profiling.report(pid, sort=sort)
+        if text is None:
+            flash("Profile not found.", "danger")
+            return redirect(url_for("admin_profiles"))
+    return render_template(
+        "admin_profiles.html",
+        profiles=profiling.list_profiles(), selected=pid, text=text, sort=sort,
+        sort_keys=profiling.SORT_KEYS, enabled=profiling.ENABLED,
+    )
 
+@app.route("/admin/profiles/<pid>/download", methods=["GET"])
+@login_required
+@admin_required
+def admin_profile_download(pid):
+    path = profiling.prof_path(pid)
+    if path is None:
+        return ("", 404)
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=pid + ".prof")
 
+# ----------------- Metrics (METRICS_TOKEN) -----------------
+@app.get("/metrics")
+def metrics():
+    if not metrics_allowed(request.headers.get(METRICS_HEADER)):
+        return ("", 404)
+    with db_conn() as conn, conn.cursor(dictionary=True) as cur:
+        outbox_lag = outbox.lag(cur)
+    return jsonify({
+        "pid": os.getpid(),
+        "pools": {"mgrpool": cnxpool.stats()},
+        "limiters": {"exports": export_limiter.stats()},
+        "export_jobs": export_jobs.stats(),
+        "outbox": outbox_lag,  # consumer lag (e.g. the bot's report notifications)
+        "caches": {"session_tokens": session_tokens.stats(), "report_previews": preview_cache.stats()},
+        "routes": timing.STATS.snapshot(),
+        "queries": querylog.STATS.snapshot(top=20),
+    })
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=9000, debug=True)
@@ -0,0 +1,125 @@
+"""
+Live report feed for the dashboard (Server-Sent Events).
+
+A small asyncio service next to the Flask dashboard: each open Track tab keeps
+one EventSource on GET /live/events and receives "report" events (submitted /
+edited / deleted) for the manager's team, fed by report_changes through one
+poller per process (dgps_data.live_feed). Idle clients are coroutines, not
+threads, so one uvicorn process holds hundreds of them.
+
+    python managers_report/live.py            # uvicorn on LIVE_PORT (default 9001)
+
+Serve it on the dashboard's origin by proxying /live/ to it (buffering off),
+or set LIVE_URL for the dashboard and LIVE_ALLOW_ORIGIN here. The browser
+authenticates with a token from the dashboard's /api/live/token.
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Shared modules (dgps_data) live in the repo root, one level up.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dgps_data.live_feed import Hub, read_token
+from dgps_data.config import METRICS_HEADER, metrics_allowed
+
+load_dotenv()
+
+APP_SECRET        = os.getenv("FLASK_SECRET_KEY", "change-me")  # same key as the dashboard
+LIVE_PORT         = int(os.getenv("LIVE_PORT", "9001"))
+LIVE_POLL_S       = float(os.getenv("LIVE_POLL_S", "1"))
+LIVE_TOKEN_TTL    = int(os.getenv("LIVE_TOKEN_TTL", "3600"))
+LIVE_HEARTBEAT_S  = float(os.getenv("LIVE_HEARTBEAT_S", "20"))
+LIVE_ALLOW_ORIGIN = os.getenv("LIVE_ALLOW_ORIGIN", "")  # only when the dashboard is on another origin
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Dashboard live feed", version="1.0")
+hub = Hub(poll_s=LIVE_POLL_S)
+
+
+@app.on_event("startup")
+async def start_hub():
+    app.state.hub_task = asyncio.create_task(hub.run())
+
+
+@app.on_event("shutdown")
+async def stop_hub():
+    app.state.hub_task.cancel()
+
+
+def _event(row):
+    """One SSE message; `time` in the Track table's format (fmt_ist in app.py)."""
+    created = row["report_created_at"]
+    data = {
+        "kind": row["kind"],
+        "report_id": row["report_id"],
+        "employee_telegram_id": row["employee_telegram_id"],
+        "report_date": row["report_date"].isoformat(),
+        "time": created.strftime("%d %b %Y %I:%M %p IST") if created else "-",
+    }
+    return f"id: {row['id']}\nevent: report\ndata: {json.dumps(data)}\n\n"
+
+
+def _headers():
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # no proxy buffering
+    if LIVE_ALLOW_ORIGIN:
+        headers["Access-Control-Allow-Origin"] = LIVE_ALLOW_ORIGIN
+    return headers
+
+
+@app.get("/live/events")
+async def events(request: Request, token: str = ""):
+    manager_id = read_token(APP_SECRET, token, LIVE_TOKEN_TTL)
+    if manager_id is None:
+        # EventSource gives up on a non-200; the page fetches a new token and reopens
+        return JSONResponse({"ok": False, "message": "Invalid or expired token."}, status_code=401,
+                            headers=_headers())
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        last_id = 0
+
+    async def stream():
+        q = hub.subscribe(manager_id)
+        try:
+            yield "retry: 3000\n\n"
+            replayed = set()
+            if last_id:
+                for row in await hub.backlog(manager_id, last_id):
+                    replayed.add(row["id"])
+                    yield _event(row)
+            while True:
+                try:
+                    row = await asyncio.wait_for(q.get(), LIVE_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if row is None:  # fell too far behind; the browser reconnects with Last-Event-ID
+                    break
+                if row["id"] not in replayed:
+                    yield _event(row)
+        finally:
+            hub.unsubscribe(manager_id, q)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=_headers())
+
+
+@app.get("/live/metrics")
+async def metrics(request: Request):
+    if not metrics_allowed(request.headers.get(METRICS_HEADER)):  # same token as the apps' /metrics
+        return JSONResponse({}, status_code=404)
+    return {"pid": os.getpid(), "hub": hub.stats()}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=LIVE_PORT)
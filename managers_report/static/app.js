@@ -76,19 +76,18 @@ MGR.fetchTrack = async function() {
     const tbody = document.getElementById('trackTableBody');
     if (!tbody) return;
     tbody.innerHTML = '';
+    tbody.dataset.date = data.date || date;
     (data.rows || []).forEach(row => {
       const tr = document.createElement('tr');
       tr.className = 'border-b border-gray-200';
+      tr.dataset.tg = row.employee_telegram_id;
       tr.innerHTML = `
         <td class="p-3">${row.sr}</td>
         <td class="p-3">${row.name}</td>
-        <td class="p-3">${row.time}</td>
-        <td class="p-3">
-          <span class="${row.status === 'Submitted' ? 'text-green-600' : 'text-red-600'}">
-            ${row.status}
-          </span>
-        </td>
+        <td class="p-3 track-time"></td>
+        <td class="p-3 track-status"></td>
       `;
+      MGR.setTrackStatus(tr, row.report_id, row.time);
       tbody.appendChild(tr);
     });
   } catch (err) {
@@ -97,6 +96,72 @@ MGR.fetchTrack = async function() {
   }
 };
 
+MGR.setTrackStatus = function(tr, reportId, time) {
+  const submitted = reportId != null;
+  tr.dataset.report = submitted ? reportId : '';
+  tr.querySelector('.track-time').textContent = submitted ? time : '-';
+  tr.querySelector('.track-status').innerHTML = submitted
+    ? '<span class="text-green-600">Submitted</span>'
+    : '<span class="text-red-600">Not Submitted</span>';
+};
+
+// -------------------- Track live feed (SSE, managers_report/live.py) --------------------
+// Patches the Track rows in place as the team's reports are submitted, edited or deleted.
+MGR.startLive = async function() {
+  let source = null;
+  let retry = 5000;
+  const connect = async () => {
+    try {
+      const res = await fetch('/api/live/token');
+      const data = await res.json();
+      if (!data.ok) return;
+      source = new EventSource(`${data.url}?token=${encodeURIComponent(data.token)}`);
+      source.addEventListener('open', () => { retry = 5000; });
+      source.addEventListener('report', (e) => MGR.applyLiveChange(JSON.parse(e.data)));
+      source.addEventListener('error', () => {
+        // Network drops reconnect by themselves; a rejected token closes the source
+        if (source.readyState === EventSource.CLOSED) {
+          setTimeout(connect, retry);
+          retry = Math.min(retry * 2, 60000);
+        }
+      });
+    } catch (err) {
+      console.error('Live feed unavailable:', err);
+      setTimeout(connect, retry);
+      retry = Math.min(retry * 2, 60000);
+    }
+  };
+  connect();
+};
+
+MGR.applyLiveChange = function(change) {
+  const tbody = document.getElementById('trackTableBody');
+  if (!tbody) return;
+  const tr = tbody.querySelector(`tr[data-tg="${change.employee_telegram_id}"]`);
+  if (!tr) return;
+  const onShownDate = change.report_date === tbody.dataset.date;
+  if (change.kind !== 'deleted' && onShownDate) {
+    MGR.setTrackStatus(tr, change.report_id, change.time);
+  } else if (tr.dataset.report === String(change.report_id)) {
+    // deleted, or edited onto another date: the employee may have another report that day
+    MGR.refreshTrackRow(tr, change.employee_telegram_id, tbody.dataset.date);
+  }
+};
+
+MGR.refreshTrackRow = async function(tr, tg, date) {
+  try {
+    const res = await fetch(`/api/track?date=${encodeURIComponent(date)}&employee=${encodeURIComponent(tg)}`);
+    if (!res.ok) throw new Error('Failed to load track status');
+    const data = await res.json();
+    const tbody = document.getElementById('trackTableBody');
+    if (!tbody || tbody.dataset.date !== date || !tr.isConnected) return;  // date changed meanwhile
+    const row = (data.rows || [])[0];
+    MGR.setTrackStatus(tr, row ? row.report_id : null, row ? row.time : '-');
+  } catch (err) {
+    console.error('Error refreshing track row:', err);
+  }
+};
+
 // -------------------- Reports (right table) --------------------
 MGR.fetchReports = async function() {
   const datePicker = document.getElementById('datePicker');
@@ -306,7 +371,10 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 
   if (document.getElementById('reportsTableBody')) MGR.fetchReports();
-  if (document.getElementById('trackTableBody')) MGR.fetchTrack();
+  if (document.getElementById('trackTableBody')) {
+    MGR.fetchTrack();
+    MGR.startLive();
+  }
 });
 
 // -------------------- View Reports (Tabbed) --------------------
@@ -393,34 +461,53 @@ document.addEventListener('DOMContentLoaded', () => {
     if (tab === 'sites') {
       const site = document.getElementById('vrSiteSelect')?.value || '';
       const d    = document.getElementById('vrSiteDate')?.value || '';
-      return `${base}&site=${encodeURIComponent(site)}&date=${encodeURIComponent(d)}`;
+      return `${base}&site_id=${encodeURIComponent(site)}&date=${encodeURIComponent(d)}`;
     }
 
     if (tab === 'drones') {
       const dr = document.getElementById('vrDroneSelect')?.value || '';
       const d  = document.getElementById('vrDroneDate')?.value || '';
-      return `${base}&drone=${encodeURIComponent(dr)}&date=${encodeURIComponent(d)}`;
+      return `${base}&drone_id=${encodeURIComponent(dr)}&date=${encodeURIComponent(d)}`;
     }
 
     return base;
   }
 
   // ---- Download buttons (per tab) ----
-  document.getElementById('vrDateDownload')?.addEventListener('click', (e) => {
-    e.preventDefault();
-    if (!e.currentTarget.disabled) window.location.href = downloadUrlForCurrentTab('date');
-  });
-  document.getElementById('vrEmpDownload')?.addEventListener('click', (e) => {
-    e.preventDefault();
-    if (!e.currentTarget.disabled) window.location.href = downloadUrlForCurrentTab('employee');
-  });
-  document.getElementById('vrSiteDownload')?.addEventListener('click', (e) => {
-    e.preventDefault();
-    if (!e.currentTarget.disabled) window.location.href = downloadUrlForCurrentTab('sites');
-  });
-  document.getElementById('vrDroneDownload')?.addEventListener('click', (e) => {
-    e.preventDefault();
-    if (!e.currentTarget.disabled) window.location.href = downloadUrlForCurrentTab('drones');
+  // The export runs as a background job on the server: queue it, poll until the
+  // file is ready, then download it. Unchanged data is served from the cache.
+  async function startExport(tab, btn) {
+    const url = downloadUrlForCurrentTab(tab).replace('/view-reports/download', '/view-reports/export');
+    const label = btn.textContent;
+    btn.disabled = true;
+    btn.textContent = 'Preparing…';
+    try {
+      let res = await fetch(url, { method: 'POST' });
+      let data = await res.json();
+      while (data.ok && data.status !== 'done' && data.status !== 'failed') {
+        await new Promise(r => setTimeout(r, 1500));
+        res = await fetch('/view-reports/export/' + encodeURIComponent(data.job_id));
+        data = await res.json();
+      }
+      if (data.ok && data.status === 'done') {
+        window.location.href = data.download_url;
+      } else {
+        alert(data.message || 'Export failed.');
+      }
+    } catch (err) {
+      alert('Error preparing download: ' + err.message);
+    } finally {
+      btn.textContent = label;
+      btn.disabled = false;
+    }
+  }
+
+  [['vrDateDownload', 'date'], ['vrEmpDownload', 'employee'],
+   ['vrSiteDownload', 'sites'], ['vrDroneDownload', 'drones']].forEach(([id, tab]) => {
+    document.getElementById(id)?.addEventListener('click', (e) => {
+      e.preventDefault();
+      if (!e.currentTarget.disabled) startExport(tab, e.currentTarget);
+    });
   });
 
   // ---- Helpers ----
@@ -430,6 +517,110 @@ document.addEventListener('DOMContentLoaded', () => {
     return res.json();
   }
 
+  // ---- Paged tables ----
+  // The /api/view/* lists come a page at a time (keyset cursor in `next`, row
+  // count in `total` on the first page). Only loaded pages are in the DOM; the
+  // next one is fetched when the footer under the table scrolls into view.
+  function makePager(tbodyId, renderRow) {
+    const tbody = document.getElementById(tbodyId);
+    if (!tbody) return null;
+    const footer = document.createElement('div');
+    footer.className = 'p-3 text-center text-sm text-gray-500';
+    (tbody.closest('.mobile-table') || tbody.parentElement).appendChild(footer);
+
+    const st = { url: null, next: null, count: 0, total: 0, gen: 0, loading: false };
+
+    function footerVisible() {
+      if (footer.offsetParent === null) return false;  // tab hidden
+      return footer.getBoundingClientRect().top < window.innerHeight;
+    }
+
+    async function fetchPage() {
+      const gen = st.gen;
+      let url = st.url;
+      if (st.next) url += `&after=${encodeURIComponent(st.next)}`;
+      const data = await fetchJSON(url);
+      if (gen !== st.gen) return null;  // filters changed meanwhile
+      if (data.total != null) st.total = data.total;
+      const frag = document.createDocumentFragment();
+      (data.rows || []).forEach(r => {
+        const tr = document.createElement('tr');
+        tr.className = 'border-b border-gray-200';
+        tr.innerHTML = renderRow(r, ++st.count);
+        frag.appendChild(tr);
+      });
+      tbody.appendChild(frag);
+      st.next = data.next || null;
+      footer.textContent = st.count ? `Showing ${st.count} of ${st.total}` : '';
+      return data;
+    }
+
+    async function more() {
+      if (st.loading || !st.next) return;
+      st.loading = true;
+      try {
+        const data = await fetchPage();
+        // a short page may leave the footer on screen; keep going until it isn't
+        if (data && st.next && footerVisible()) setTimeout(more, 0);
+      } catch (e) {
+        console.error(e);
+      } finally {
+        st.loading = false;
+      }
+    }
+
+    new IntersectionObserver((entries) => {
+      if (entries.some(e => e.isIntersecting)) more();
+    }).observe(footer);
+
+    return {
+      // First page of a new filter; resolves to its JSON (null if superseded).
+      async load(url) {
+        const gen = ++st.gen;
+        Object.assign(st, { url, next: null, count: 0, total: 0, loading: true });
+        tbody.innerHTML = '';
+        footer.textContent = '';
+        try {
+          return await fetchPage();
+        } finally {
+          if (gen === st.gen) {
+            st.loading = false;
+            if (st.next && footerVisible()) setTimeout(more, 0);
+          }
+        }
+      }
+    };
+  }
+
+  const viewLink = (id) =>
+    `<td class="p-3"><a class="text-blue-600 hover:underline cursor-pointer" onclick="MGR.viewReport(${id})">View</a></td>`;
+
+  const pagers = {
+    date: makePager('vrDateTbody', (r, sr) => `
+          <td class="p-3">${sr}</td>
+          <td class="p-3">${r.first_name || '-'}</td>
+          <td class="p-3">${r.last_name || '-'}</td>
+          ${viewLink(r.id)}`),
+    employee: makePager('vrEmpTbody', (r, sr) => `
+          <td class="p-3">${sr}</td>
+          <td class="p-3">${r.date}</td>
+          <td class="p-3">${r.site_name}</td>
+          <td class="p-3">${r.created_at}</td>
+          ${viewLink(r.id)}`),
+    sites: makePager('vrSiteTbody', (r, sr) => `
+          <td class="p-3">${sr}</td>
+          <td class="p-3">${r.first_name || '-'}</td>
+          <td class="p-3">${r.last_name || '-'}</td>
+          <td class="p-3">${r.date}</td>
+          ${viewLink(r.id)}`),
+    drones: makePager('vrDroneTbody', (r, sr) => `
+          <td class="p-3">${sr}</td>
+          <td class="p-3">${r.first_name || '-'}</td>
+          <td class="p-3">${r.last_name || '-'}</td>
+          <td class="p-3">${r.date}</td>
+          ${viewLink(r.id)}`),
+  };
+
   // ---- Loaders (each enables/disables download based on filters + rows) ----
   async function loadDateTab() {
     const mode = (modeSel?.value || 'single').toLowerCase();
@@ -456,22 +647,8 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     try {
-      const data = await fetchJSON(url);
-      const tbody = document.getElementById('vrDateTbody');
-      tbody.innerHTML = '';
-      (data.rows || []).forEach(r => {
-        const tr = document.createElement('tr');
-        tr.className = 'border-b border-gray-200';
-        tr.innerHTML = `
-          <td class="p-3">${r.sr}</td>
-          <td class="p-3">${r.first_name || '-'}</td>
-          <td class="p-3">${r.last_name || '-'}</td>
-          <td class="p-3">
-            <a class="text-blue-600 hover:underline cursor-pointer" onclick="MGR.viewReport(${r.id})">View</a>
-          </td>
-        `;
-        tbody.appendChild(tr);
-      });
+      const data = await pagers.date.load(url);
+      if (!data) return;
       const hasRows   = (data.rows || []).length > 0;
       const filtersOk = (mode === 'range') ? (fromDate?.value && toDate?.value) : !!(singleDate?.value);
       setDownloadEnabled('date', hasRows && !!filtersOk);
@@ -494,23 +671,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const url = `/api/view/employee?employee=${encodeURIComponent(tg)}`;
 
     try {
-      const data = await fetchJSON(url);
-      const tbody = document.getElementById('vrEmpTbody');
-      tbody.innerHTML = '';
-      (data.rows || []).forEach(r => {
-        const tr = document.createElement('tr');
-        tr.className = 'border-b border-gray-200';
-        tr.innerHTML = `
-          <td class="p-3">${r.sr}</td>
-          <td class="p-3">${r.date}</td>
-          <td class="p-3">${r.site_name}</td>
-          <td class="p-3">${r.created_at}</td>
-          <td class="p-3">
-            <a class="text-blue-600 hover:underline cursor-pointer" onclick="MGR.viewReport(${r.id})">View</a>
-          </td>
-        `;
-        tbody.appendChild(tr);
-      });
+      const data = await pagers.employee.load(url);
+      if (!data) return;
       const hasRows = (data.rows || []).length > 0;
       const filtersOk = !!tg;
       setDownloadEnabled('employee', hasRows && filtersOk);
@@ -530,29 +692,13 @@ document.addEventListener('DOMContentLoaded', () => {
       setDownloadEnabled('sites', false);
       return;
     }
-    let url = `/api/view/sites?site=${encodeURIComponent(site)}`;
+    let url = `/api/view/sites?site_id=${encodeURIComponent(site)}`;
     if (d) url += `&date=${encodeURIComponent(d)}`;
 
     try {
-      const data = await fetchJSON(url);
-      const tbody = document.getElementById('vrSiteTbody');
-      const totalEl = document.getElementById('vrSiteTotalArea');
-      tbody.innerHTML = '';
-      (data.rows || []).forEach(r => {
-        const tr = document.createElement('tr');
-        tr.className = 'border-b border-gray-200';
-        tr.innerHTML = `
-          <td class="p-3">${r.sr}</td>
-          <td class="p-3">${r.first_name || '-'}</td>
-          <td class="p-3">${r.last_name || '-'}</td>
-          <td class="p-3">${r.date}</td>
-          <td class="p-3">
-            <a class="text-blue-600 hover:underline cursor-pointer" onclick="MGR.viewReport(${r.id})">View</a>
-          </td>
-        `;
-        tbody.appendChild(tr);
-      });
-      totalEl.textContent = data.total_area || '0.000';
+      const data = await pagers.sites.load(url);
+      if (!data) return;
+      document.getElementById('vrSiteTotalArea').textContent = data.total_area || '0.000';
       const hasRows = (data.rows || []).length > 0;
       const filtersOk = !!site;
       setDownloadEnabled('sites', hasRows && filtersOk);
@@ -572,29 +718,13 @@ document.addEventListener('DOMContentLoaded', () => {
       setDownloadEnabled('drones', false);
       return;
     }
-    let url = `/api/view/drones?drone=${encodeURIComponent(dr)}`;
+    let url = `/api/view/drones?drone_id=${encodeURIComponent(dr)}`;
     if (d) url += `&date=${encodeURIComponent(d)}`;
 
     try {
-      const data = await fetchJSON(url);
-      const tbody = document.getElementById('vrDroneTbody');
-      const totalEl = document.getElementById('vrDroneTotalFlights');
-      tbody.innerHTML = '';
-      (data.rows || []).forEach(r => {
-        const tr = document.createElement('tr');
-        tr.className = 'border-b border-gray-200';
-        tr.innerHTML = `
-          <td class="p-3">${r.sr}</td>
-          <td class="p-3">${r.first_name || '-'}</td>
-          <td class="p-3">${r.last_name || '-'}</td>
-          <td class="p-3">${r.date}</td>
-          <td class="p-3">
-            <a class="text-blue-600 hover:underline cursor-pointer" onclick="MGR.viewReport(${r.id})">View</a>
-          </td>
-        `;
-        tbody.appendChild(tr);
-      });
-      totalEl.textContent = data.total_flights ?? 0;
+      const data = await pagers.drones.load(url);
+      if (!data) return;
+      document.getElementById('vrDroneTotalFlights').textContent = data.total_flights ?? 0;
       const hasRows = (data.rows || []).length > 0;
       const filtersOk = !!dr;
       setDownloadEnabled('drones', hasRows && filtersOk);
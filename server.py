@@ -1,18 +1,31 @@
 import os
 import hmac
+import asyncio
 import json
 import hashlib
 import logging
-from datetime import datetime, timezone
+import tempfile
+from datetime import date, datetime, timezone
+from typing import List, Optional
 from urllib.parse import parse_qsl
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator, model_validator
+import orjson
 
 import mysql.connector
-from mysql.connector import pooling, errors as mysql_errors
+from mysql.connector import errors as mysql_errors
+
+import ubx_log
+from dgps_data import report_index, grid_coverage, masters, report_versions, repos, rollups, report_changes
+from dgps_data.pool import BoundedPool, Limiter, PoolSaturated
+from dgps_data import timing, querylog, profiling
+from dgps_data.config import connect as db_connect_plain
+from dgps_data.config import METRICS_HEADER, metrics_allowed
 
 # ------------------ Config & Logging ------------------
 load_dotenv()
@@ -25,6 +38,18 @@ MYSQL_USER  = os.getenv("MYSQL_USER", "root")
 MYSQL_PASS  = os.getenv("MYSQL_PASS", "")
 WEBAPP_DIR  = os.path.join(os.path.dirname(__file__), "webapp")
 
+# Per-process pool size; gunicorn_conf.py sets it from the DB connection budget / workers.
+DB_POOL_SIZE        = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_STARTUP_RETRIES  = int(os.getenv("DB_STARTUP_RETRIES", "5"))
+# Admission control: how long a request waits for a connection, and how many may wait.
+DB_CHECKOUT_TIMEOUT = float(os.getenv("DB_CHECKOUT_TIMEOUT", "2"))
+DB_MAX_WAITERS      = int(os.getenv("DB_MAX_WAITERS", str(DB_POOL_SIZE * 4)))
+# Concurrent UBX log scans per process (CPU/disk heavy; the rest is left to report submissions).
+UBX_CONCURRENCY     = int(os.getenv("UBX_CONCURRENCY", "2"))
+
+UBX_MAX_MB             = int(os.getenv("UBX_MAX_MB", "512"))
+UBX_TIME_TOLERANCE_MIN = float(os.getenv("UBX_TIME_TOLERANCE_MIN", "2"))
+
 logger = logging.getLogger("report_webapp")
 logger.setLevel(logging.INFO)
 _sh = logging.StreamHandler()
@@ -38,9 +63,11 @@ if not os.path.isdir(WEBAPP_DIR):
 def create_pool():
     # consume_results=True helps avoid "Unread result found" when using pooled connections.
     # If your connector is older and doesn't support it, it will be ignored safely.
-    return pooling.MySQLConnectionPool(
+    return BoundedPool(
         pool_name="reportpool",
-        pool_size=5,
+        pool_size=DB_POOL_SIZE,
+        checkout_timeout=DB_CHECKOUT_TIMEOUT,
+        max_waiters=DB_MAX_WAITERS,
         host=MYSQL_HOST,
         port=MYSQL_PORT,
         database=MYSQL_DB,
@@ -50,22 +77,39 @@ def create_pool():
         consume_results=True,  # <— key helper
     )
 
-try:
-    cnxpool = create_pool()
-except Exception as e:
-    cnxpool = None
-    logger.error("MySQL pool creation failed: %s", e)
+# Created per process on first use / at startup, never at import: with gunicorn
+# --preload the app is imported in the master, and sockets must not be shared
+# across forked workers.
+cnxpool = None
 
-def db_conn():
+def init_pool():
+    global cnxpool
     if cnxpool is None:
+        try:
+            cnxpool = create_pool()
+        except Exception as e:
+            logger.error("MySQL pool creation failed: %s", e)
+    return cnxpool
+
+def db_conn():
+    if init_pool() is None:
         raise HTTPException(status_code=500, detail="DB pool not initialized")
     return cnxpool.get_connection()
 
+def db_ping():
+    with db_conn() as conn, conn.cursor(buffered=True) as cur:
+        cur.execute("SELECT 1")
+        cur.fetchall()
+
 # ------------------ Telegram WebApp verify ------------------
 def _get_secret_key(bot_token: str) -> bytes:
     return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
 
 def verify_init_data(init_data: str, bot_token: str, max_age_sec: int = 86400) -> dict:
+    with timing.phase("auth"):
+        return _verify_init_data(init_data, bot_token, max_age_sec)
+
+def _verify_init_data(init_data: str, bot_token: str, max_age_sec: int) -> dict:
     if not init_data:
         raise HTTPException(status_code=401, detail="Missing initData")
     try:
@@ -100,26 +144,128 @@ def verify_init_data(init_data: str, bot_token: str, max_age_sec: int = 86400) -
         logger.exception("verify_init_data failed")
         raise HTTPException(status_code=401, detail=f"initData parse error: {e}")
 
+# ------------------ Request models / JSON ------------------
+class FlightIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    flight_time_min: float = 0
+    area_sq_km: float = 0
+    uav_rover_file: str = ""
+    drone_base_file_no: str = ""
+
+class ReportIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    report_date: date
+    # Provide EITHER ids OR names for site/drone
+    site_id: Optional[int] = None
+    drone_id: Optional[int] = None
+    site_name: Optional[str] = None
+    drone_name: Optional[str] = None
+    base_height_m: float
+    pilot_name: str
+    copilot_name: str
+    dgps_used: List[str]
+    dgps_operators: List[str]
+    grid_numbers: List[str]
+    gcp_points: List[str]
+    remark: Optional[str] = ""
+
+    @field_validator("remark")
+    @classmethod
+    def _remark(cls, v):
+        return v or ""  # null or missing is an empty remark, as before the typed models
+
+    @model_validator(mode="after")
+    def _site_and_drone(self):
+        has_ids = self.site_id is not None and self.drone_id is not None
+        has_names = self.site_name is not None and self.drone_name is not None
+        if not (has_ids or has_names):
+            raise ValueError("Provide site/drone by id or by name")
+        return self
+
+class CreateReportIn(BaseModel):
+    init_data: str = ""
+    report: ReportIn
+    flights: List[FlightIn] = []
+
+def _validation_detail(e: ValidationError) -> str:
+    """Turn pydantic errors into the short messages the WebApp shows."""
+    errs = e.errors()
+    missing = [".".join(str(p) for p in err["loc"][1:] or err["loc"]) for err in errs if err["type"] == "missing"]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    err = errs[0]
+    if err["loc"] and err["loc"][0] == "flights":
+        return "Each flight needs time>0, area>0, UBX, Base File"
+    if err["type"] == "value_error":
+        return str(err["ctx"]["error"])
+    return f"Invalid {'.'.join(str(p) for p in err['loc'])}: {err['msg']}"
+
+def json_col(value) -> str:
+    # JSON columns: orjson writes UTF-8 as-is (same as ensure_ascii=False), compact.
+    return orjson.dumps(value).decode("utf-8")
+
+async def json_body(req: Request) -> dict:
+    try:
+        body = orjson.loads(await req.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    return body
+
+class TimedORJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        with timing.phase("serialize"):
+            return super().render(content)
+
 # ------------------ FastAPI app ------------------
-app = FastAPI(title="Report WebApp", version="1.0")
+app = FastAPI(title="Report WebApp", version="1.0", default_response_class=TimedORJSONResponse)
+# Server-Timing header + per-route percentiles (see /metrics)
+app.add_middleware(timing.ASGITimingMiddleware)
+# Signed X-Profile header / sampling (see dgps_data.profiling); not installed when off
+if profiling.ENABLED:
+    app.add_middleware(profiling.ASGIProfilingMiddleware)
+
+ubx_limiter = Limiter("ubx_summary", UBX_CONCURRENCY)
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated(req: Request, exc: PoolSaturated):
+    logger.warning("Saturated, 503 | %s %s | %s", req.method, req.url.path, exc)
+    return ORJSONResponse(
+        {"detail": "Server busy, please retry shortly."},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Serve static WebApp
 app.mount("/webapp", StaticFiles(directory=WEBAPP_DIR), name="webapp")
 
+# Set once this process has a working pool; /api/ready reports it.
+_ready = False
+
 @app.on_event("startup")
-async def startup_log():
-    logger.info("=== WebApp starting ===")
+async def startup_check():
+    global _ready
+    logger.info("=== WebApp starting (pid %s, pool size %s) ===", os.getpid(), DB_POOL_SIZE)
     logger.info("BOT_TOKEN set: %s", "YES" if BOT_TOKEN else "NO (verify will fail)")
     index_path = os.path.join(WEBAPP_DIR, "index.html")
     logger.info("WEBAPP_DIR: %s (index.html: %s)", WEBAPP_DIR, "FOUND" if os.path.isfile(index_path) else "MISSING")
 
-    # Light DB ping
-    try:
-        with db_conn() as conn, conn.cursor(buffered=True) as cur:
-            cur.execute("SELECT 1")
-        logger.info("DB: OK (connected to %s:%s/%s)", MYSQL_HOST, MYSQL_PORT, MYSQL_DB)
-    except Exception as e:
-        logger.error("DB ping failed: %s", e)
+    querylog.start_flusher("webapp", db_connect_plain)
+
+    # Readiness: build this worker's pool and check a connection, with backoff.
+    for attempt in range(1, DB_STARTUP_RETRIES + 1):
+        try:
+            await run_in_threadpool(db_ping)
+            _ready = True
+            logger.info("DB: OK (connected to %s:%s/%s)", MYSQL_HOST, MYSQL_PORT, MYSQL_DB)
+            return
+        except Exception as e:
+            logger.error("DB check failed (attempt %s/%s): %s", attempt, DB_STARTUP_RETRIES, e)
+            await asyncio.sleep(min(2 ** attempt, 10))
+    logger.error("DB not reachable; /api/ready stays 503 until it is")
 
 @app.get("/")
 async def root_index():
@@ -132,19 +278,31 @@ async def root_index():
 async def health():
     return {"ok": True, "service": "webapp", "db": MYSQL_DB}
 
+# Readiness for the load balancer / deploy script: 200 only when this worker can reach the DB.
+@app.get("/api/ready")
+async def ready():
+    global _ready
+    try:
+        await run_in_threadpool(db_ping)
+        _ready = True
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        _ready = False
+    if not _ready:
+        return JSONResponse({"ok": False, "ready": False, "pid": os.getpid()}, status_code=503)
+    return {"ok": True, "ready": True, "pid": os.getpid()}
+
 # Verify session & that the user is an ACTIVE EMPLOYEE (role=2)
 @app.post("/api/verify")
 async def api_verify(req: Request):
     if not BOT_TOKEN:
         raise HTTPException(status_code=500, detail="BOT_TOKEN not configured")
-    body = await req.json()
+    body = await json_body(req)
     init_data = body.get("init_data")
     verified = verify_init_data(init_data, BOT_TOKEN)
 
     tg_id = int(verified["user"]["id"])
-    with db_conn() as conn, conn.cursor(dictionary=True, buffered=True) as cur:
-        cur.execute("SELECT id, role, is_active, first_name, last_name FROM users WHERE telegram_id=%s", (tg_id,))
-        u = cur.fetchone()
+    u = await run_in_threadpool(_employee_row, tg_id)
 
     if not u:
         raise HTTPException(status_code=403, detail="User not found in system")
@@ -154,25 +312,86 @@ async def api_verify(req: Request):
     full_name = f"{u.get('first_name') or ''} {u.get('last_name') or ''}".strip()
     return {"ok": True, "telegram_id": tg_id, "name": full_name}
 
-# Masters for dropdowns
+def _employee_row(tg_id):
+    with db_conn() as conn:
+        return repos.Users(conn).by_telegram(tg_id)
+
+# Masters for dropdowns (sync: FastAPI runs it in the threadpool)
 @app.get("/api/masters")
-async def get_masters():
+def get_masters():
     try:
-        with db_conn() as conn, conn.cursor(dictionary=True, buffered=True) as cur:
-            cur.execute("SELECT id, name FROM master_sites WHERE is_active=1 ORDER BY name")
-            sites = cur.fetchall()
-            cur.execute("SELECT id, name FROM master_drones WHERE is_active=1 ORDER BY name")
-            drones = cur.fetchall()
+        with db_conn() as conn:
+            m = repos.Masters(conn)
+            sites, drones = m.active("site"), m.active("drone")
         return {"ok": True, "sites": sites, "drones": drones}
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.exception("masters failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Rover log summary: prefill / validate flight_time_min from the UBX log itself
+@app.post("/api/ubx/summary")
+async def ubx_summary(req: Request):
+    """
+    Body: the raw UBX rover log (application/octet-stream).
+    Header X-Init-Data: Telegram WebApp initData.
+    Query ?flight_time_min=N (optional): check a typed value against the log.
+    """
+    if not BOT_TOKEN:
+        raise HTTPException(status_code=500, detail="BOT_TOKEN not configured")
+    verify_init_data(req.headers.get("X-Init-Data", ""), BOT_TOKEN)
+
+    with ubx_limiter:
+        summary = await _ubx_scan_upload(req)
+
+    check = None
+    typed = req.query_params.get("flight_time_min")
+    if typed:
+        try:
+            check = ubx_log.check_flight_time(summary, float(typed), UBX_TIME_TOLERANCE_MIN)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="flight_time_min must be a number")
+
+    logger.info("UBX summary | %s bytes=%s epochs=%s %.1f MB/s",
+                summary["file"], summary["bytes"], summary["epochs"], summary["mb_per_s"] or 0)
+    return {"ok": True, "summary": summary, "tolerance_min": UBX_TIME_TOLERANCE_MIN, "flight_time_check": check}
+
+async def _ubx_scan_upload(req: Request):
+    limit = UBX_MAX_MB * 1024 * 1024
+    fd, path = tempfile.mkstemp(suffix=".ubx")
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as fh:
+            async for chunk in req.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"Log exceeds {UBX_MAX_MB} MB")
+                fh.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty log")
+        # numpy scan runs off the event loop
+        summary = await run_in_threadpool(ubx_log.summarize, path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("ubx_summary failed")
+        raise HTTPException(status_code=400, detail=f"Could not read log: {e}")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    if not summary["epochs"]:
+        raise HTTPException(status_code=422, detail="No NAV-PVT epochs with valid time found in log")
+    return summary
+
 # Create report (writes to reports + report_flights)
 @app.post("/api/reports")
 async def create_report(req: Request):
     """
-    Body:
+    Body (validated as CreateReportIn):
     {
       "init_data": "<tg webapp initData>",
       "report": {
@@ -198,102 +417,96 @@ async def create_report(req: Request):
     if not BOT_TOKEN:
         raise HTTPException(status_code=500, detail="BOT_TOKEN not configured")
 
-    body = await req.json()
-    init_data = body.get("init_data", "")
-    verified = verify_init_data(init_data, BOT_TOKEN)
+    # Parse + validate the whole body in one pass (pydantic-core reads the JSON bytes directly)
+    try:
+        raw = await req.body()
+        with timing.phase("parse"):
+            body = CreateReportIn.model_validate_json(raw)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=_validation_detail(e))
+    verified = verify_init_data(body.init_data, BOT_TOKEN)
     tg_id = int(verified["user"]["id"])
 
-    payload = body.get("report") or {}
-    flights = body.get("flights") or []
-
-    # Basic validation (allow either ids OR names for site/drone)
-    required_base = [
-        "report_date", "base_height_m",
-        "pilot_name", "copilot_name",
-        "dgps_used", "dgps_operators",
-        "grid_numbers", "gcp_points", "remark"
-    ]
-    missing = [f for f in required_base if f not in payload]
-    if missing:
-        raise HTTPException(status_code=400, detail=f"Missing fields: {', '.join(missing)}")
-
-    has_ids = ("site_id" in payload and "drone_id" in payload)
-    has_names = ("site_name" in payload and "drone_name" in payload)
-    if not (has_ids or has_names):
-        raise HTTPException(status_code=400, detail="Provide site/drone by id or by name")
+    payload = body.report.model_dump()
+    flights = body.flights
 
-    if not isinstance(flights, list) or len(flights) == 0:
+    if len(flights) == 0:
         raise HTTPException(status_code=400, detail="At least one flight required")
     if len(flights) > 10:
         raise HTTPException(status_code=400, detail="Flights cannot exceed 10")
 
+    return await run_in_threadpool(_insert_report, tg_id, payload, flights)
+
+def _insert_report(tg_id, payload, flights):
+    # Blocking part of create_report; runs in the threadpool so pool waits don't stall the event loop.
     # Use a SINGLE connection & buffered cursor for the entire flow
     try:
         with db_conn() as conn:
             conn.start_transaction()
             with conn.cursor(dictionary=True, buffered=True) as cur:
-                # Ensure user is active employee (on same conn/cursor)
-                cur.execute("SELECT role, is_active FROM users WHERE telegram_id=%s", (tg_id,))
-                u = cur.fetchone()
+                # Ensure user is active employee (same connection, inside the transaction)
+                u = repos.Users(conn).by_telegram(tg_id)
                 if not u or u["role"] != 2 or u["is_active"] != 1:
                     raise HTTPException(status_code=403, detail="Only active employees can submit reports")
 
-                # Resolve site_name/drone_name if ids were sent
-                site_name = (payload.get("site_name") or "").strip()
-                drone_name = (payload.get("drone_name") or "").strip()
-                if not site_name and "site_id" in payload:
-                    cur.execute("SELECT name FROM master_sites WHERE id=%s", (int(payload["site_id"]),))
-                    r = cur.fetchone()
-                    if not r:
+                # Resolve site/drone to both id and name (whichever was sent)
+                site_name = payload["site_name"] or ""
+                drone_name = payload["drone_name"] or ""
+                if not site_name and payload["site_id"] is not None:
+                    site_id = int(payload["site_id"])
+                    site_name = masters.name_for(cur, "site", site_id)
+                    if site_name is None:
                         raise HTTPException(status_code=400, detail="Invalid site_id")
-                    site_name = r["name"]
-                if not drone_name and "drone_id" in payload:
-                    cur.execute("SELECT name FROM master_drones WHERE id=%s", (int(payload["drone_id"]),))
-                    r = cur.fetchone()
-                    if not r:
+                else:
+                    site_id = masters.id_for(cur, "site", site_name)
+                if not drone_name and payload["drone_id"] is not None:
+                    drone_id = int(payload["drone_id"])
+                    drone_name = masters.name_for(cur, "drone", drone_id)
+                    if drone_name is None:
                         raise HTTPException(status_code=400, detail="Invalid drone_id")
-                    drone_name = r["name"]
+                else:
+                    drone_id = masters.id_for(cur, "drone", drone_name)
 
                 # Compute totals from flights (server-side)
                 total_time_min = 0
                 total_area_sq_km = 0.0
                 norm_flights = []
                 for f in flights:
-                    t = int(f.get("flight_time_min", 0))
-                    a = float(f.get("area_sq_km", 0.0))
-                    ufile = (f.get("uav_rover_file") or "").strip()
-                    bfile = (f.get("drone_base_file_no") or "").strip()
+                    t = int(f.flight_time_min)
+                    a = f.area_sq_km
+                    ufile = f.uav_rover_file
+                    bfile = f.drone_base_file_no
                     if t <= 0 or a <= 0 or not ufile or not bfile:
                         raise HTTPException(status_code=400, detail="Each flight needs time>0, area>0, UBX, Base File")
                     total_time_min += t
                     total_area_sq_km += a
                     norm_flights.append((t, a, ufile, bfile))
 
-                # Insert report (names are stored; no FK)
+                # Insert report (ids are the FKs; names are kept as the display copy)
                 cur.execute(
                     """
                     INSERT INTO reports (
                         employee_telegram_id, report_date,
-                        site_name, drone_name, base_height_m,
+                        site_id, site_name, drone_id, drone_name, base_height_m,
                         pilot_name, copilot_name,
                         dgps_used_json, dgps_operators_json, grid_numbers_json, gcp_points_json,
                         total_area_sq_km, total_time_min,
                         remark
                     )
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
                     """,
                     (
                         tg_id,
                         payload["report_date"],
-                        site_name, drone_name, float(payload["base_height_m"]),
-                        payload["pilot_name"].strip(),
-                        payload["copilot_name"].strip(),
-                        json.dumps(payload["dgps_used"], ensure_ascii=False),
-                        json.dumps(payload["dgps_operators"], ensure_ascii=False),
-                        json.dumps(payload["grid_numbers"], ensure_ascii=False),
-                        json.dumps(payload["gcp_points"], ensure_ascii=False),
+                        site_id, site_name, drone_id, drone_name, payload["base_height_m"],
+                        payload["pilot_name"],
+                        payload["copilot_name"],
+                        json_col(payload["dgps_used"]),
+                        json_col(payload["dgps_operators"]),
+                        json_col(payload["grid_numbers"]),
+                        json_col(payload["gcp_points"]),
                         total_area_sq_km, total_time_min,
-                        (payload.get("remark") or "").strip(),
+                        payload["remark"],
                     ),
                 )
                 report_id = cur.lastrowid
@@ -309,11 +522,22 @@ async def create_report(req: Request):
                         (report_id, t, a, ufile, bfile),
                     )
 
+                # Index the list fields (report_dgps / report_operators / report_grids / report_gcps)
+                report_index.write_children(cur, report_id, payload)
+                grid_coverage.add_report(cur, site_id, payload["report_date"], payload["grid_numbers"])
+                report_versions.bump(cur, tg_id)
+                rollups.add_report(cur, tg_id, site_id, drone_id, payload["report_date"], norm_flights)
+                # Outbox: dashboard live feed, manager notifications in the bot
+                report_changes.record(cur, "submitted", report_id, tg_id, payload["report_date"], payload={
+                    "site_name": site_name, "drone_name": drone_name, "flights": len(norm_flights),
+                    "total_time_min": total_time_min, "total_area_sq_km": total_area_sq_km,
+                })
+
             conn.commit()
         return {"ok": True, "report_id": report_id}
 
-    except HTTPException:
-        # Raised intentionally above
+    except (HTTPException, PoolSaturated):
+        # Raised intentionally above / pool full (-> 503)
         raise
 
     except mysql_errors.IntegrityError as e:
@@ -328,9 +552,33 @@ async def create_report(req: Request):
         logger.exception("create_report failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ------------------ Metrics (METRICS_TOKEN) ------------------
+@app.get("/metrics")
+async def metrics(req: Request):
+    if not metrics_allowed(req.headers.get(METRICS_HEADER)):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "pid": os.getpid(),
+        "pools": {"reportpool": cnxpool.stats() if cnxpool is not None else None},
+        "limiters": {"ubx_summary": ubx_limiter.stats()},
+        "routes": timing.STATS.snapshot(),
+        "queries": querylog.STATS.snapshot(top=20),
+    }
+
 # ------------------ Run with `python server.py` ------------------
 if __name__ == "__main__":
+    import sys
     import uvicorn
     port = int(os.getenv("PORT", "8000"))
-    logger.info("Starting Uvicorn on 0.0.0.0:%s", port)
-    uvicorn.run("server:app", host="0.0.0.0", port=port, reload=True)
+    if "--prod" in sys.argv[1:] or os.getenv("APP_ENV", "").lower() == "production":
+        if os.name == "nt":
+            # gunicorn doesn't run on Windows; plain uvicorn workers, no reload.
+            import gunicorn_conf
+            logger.info("Starting Uvicorn (prod) on 0.0.0.0:%s with %s workers", port, gunicorn_conf.workers)
+            uvicorn.run("server:app", host="0.0.0.0", port=port, workers=gunicorn_conf.workers,
+                        proxy_headers=True, log_level="info")
+        else:
+            os.execvp("gunicorn", ["gunicorn", "-c", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn_conf.py"), "server:app"])
+    else:
+        logger.info("Starting Uvicorn (dev, reload) on 0.0.0.0:%s", port)
+        uvicorn.run("server:app", host="0.0.0.0", port=port, reload=True)
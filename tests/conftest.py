@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Shared modules (dgps_data) live in the repo root, one level up.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
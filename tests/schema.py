@@ -0,0 +1,34 @@
+"""Indexes declared by dgps_data.migrations, read from the SQL text of its steps."""
+import re
+
+from dgps_data.migrations import MIGRATIONS
+
+_TABLE_RE = re.compile(r"(?:CREATE TABLE IF NOT EXISTS|ALTER TABLE)\s+(\w+)", re.I)
+_KEY_RE = re.compile(r"(?:UNIQUE |FULLTEXT )?KEY (\w+) \(([^)]*)\)", re.I)
+
+
+def _ensure_index_args(step):
+    # _ensure_index / _ensure_fulltext steps close over (table, name, cols)
+    cells = dict(zip(step.__code__.co_freevars, (c.cell_contents for c in step.__closure__ or ())))
+    if {"table", "name", "cols"} <= set(cells):
+        return cells["table"], cells["name"], list(cells["cols"])
+    return None
+
+
+def indexes():
+    """{(table, index name): [columns]}."""
+    out = {}
+    for _, _, steps in MIGRATIONS:
+        for step in steps:
+            if callable(step):
+                args = _ensure_index_args(step)
+                if args:
+                    out[args[:2]] = args[2]
+                continue
+            m = _TABLE_RE.search(step)
+            if not m:
+                continue
+            table = m.group(1)
+            for name, cols in _KEY_RE.findall(step):
+                out[(table, name)] = [c.strip() for c in cols.split(",")]
+    return out
@@ -0,0 +1,76 @@
+"""grid_coverage.refresh over reports that spell the same tile differently."""
+from datetime import date
+
+from dgps_data import grid_coverage, report_index
+
+SITE = 7
+
+
+class FakeCursor:
+    """Just enough of report_grids JOIN reports for refresh(); records the writes."""
+
+    def __init__(self, reports):
+        # reports: {report_id: (site_id, report_date, [grid codes])}
+        self.reports = reports
+        self.grids = [row for rid, (_, _, codes) in reports.items()
+                      for row in report_index._rows("report_grids", rid, codes)]
+        self.deleted = []
+        self.upserted = []
+        self._result = []
+
+    def execute(self, sql, params):
+        assert "g.tile_key IN" in sql
+        *tiles, site_id = params
+        self._result = [
+            (tile, rid, self.reports[rid][1])
+            for rid, _, _, _, tile in self.grids
+            if tile in tiles and self.reports[rid][0] == site_id
+        ]
+
+    def fetchall(self):
+        return self._result
+
+    def executemany(self, sql, rows):
+        (self.deleted if sql.startswith("DELETE") else self.upserted).extend(rows)
+
+
+def test_spellings_share_a_tile():
+    keys = {grid_coverage.parse_grid(c)["tile_key"] for c in ("H43R012A17", "h43r12a017", "H43R12A17")}
+    assert len(keys) == 1
+
+
+def test_grid_rows_carry_the_tile_key():
+    rows = report_index._rows("report_grids", 1, ["H43R012A17", "not a grid"])
+    assert rows[0][4] == grid_coverage.parse_grid("H43R12A17")["tile_key"]
+    assert rows[1][4] is None
+    assert len(report_index._rows("report_dgps", 1, ["R4S-314"])[0]) == 4
+
+
+def test_refresh_counts_other_spellings():
+    cur = FakeCursor({
+        1: (SITE, date(2024, 5, 1), ["H43R012A17"]),
+        2: (SITE, date(2024, 5, 3), ["H43R12A017", "H43R12A18"]),
+        3: (SITE, date(2024, 5, 9), ["H43R12A17"]),
+    })
+    # report 3 was edited; its tile is still covered by reports 1 and 2
+    grid_coverage.refresh(cur, SITE, ["H43R12A17"])
+    tile = grid_coverage.parse_grid("H43R12A17")["tile_key"]
+    assert cur.deleted == []
+    assert cur.upserted == [(SITE, tile, "H43R12A17", date(2024, 5, 1), date(2024, 5, 9), 3)]
+
+
+def test_refresh_after_delete_keeps_tile_of_other_spelling():
+    cur = FakeCursor({
+        1: (SITE, date(2024, 5, 1), ["H43R012A17"]),
+    })
+    # the report spelled "H43R12A17" is gone; report 1 still covers the tile
+    grid_coverage.refresh(cur, SITE, ["H43R12A17"])
+    assert cur.deleted == []
+    assert [r[5] for r in cur.upserted] == [1]
+
+
+def test_refresh_deletes_uncovered_tile():
+    cur = FakeCursor({1: (SITE + 1, date(2024, 5, 1), ["H43R12A17"])})
+    grid_coverage.refresh(cur, SITE, ["H43R12A17"])
+    assert cur.deleted == [(SITE, grid_coverage.parse_grid("H43R12A17")["tile_key"])]
+    assert cur.upserted == []
@@ -0,0 +1,42 @@
+"""
+plan_check checks the statements the apps actually run: every QUERIES entry
+captures a statement from the real code with matching parameters, and every
+INLINE statement still appears verbatim in the file it was taken from.
+"""
+import ast
+from pathlib import Path
+
+import pytest
+
+from dgps_data import plan_check
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE = {"mgr": 3, "mgr_tg": 900, "tg": 100000, "team": [100000, 100001, 100020], "login": "boss",
+          "token": b"\0" * 16, "invitation_id": 7, "report_id": 42, "date": "2024-03-01", "site_id": 17,
+          "drone_id": 5, "grid": "H1R2A3", "file": "R20240301", "change_id": 0}
+
+
+@pytest.mark.parametrize("label", list(plan_check.QUERIES))
+def test_captures_the_real_statement(label):
+    got = plan_check.capture(plan_check.QUERIES[label], SAMPLE)
+    assert got is not None, f"{label}: no statement executed"
+    sql, params = got
+    assert sql.lstrip().upper().startswith("SELECT")
+    assert sql.count("%s") == len(params)
+
+
+def _constants(path):
+    tree = ast.parse((ROOT / path).read_text(encoding="utf-8"))
+    return {n.value for n in ast.walk(tree) if isinstance(n, ast.Constant) and isinstance(n.value, str)}
+
+
+@pytest.mark.parametrize("label", list(plan_check.INLINE))
+def test_inline_statement_is_still_in_source(label):
+    path, sql, params = plan_check.INLINE[label]
+    assert sql in _constants(path), f"{label}: statement no longer in {path}"
+    assert sql.count("%s") == len(params(SAMPLE))
+
+
+def test_statements_cover_every_query():
+    labels = [label for label, _, _ in plan_check.statements(SAMPLE)]
+    assert labels == list(plan_check.QUERIES) + list(plan_check.INLINE)
@@ -0,0 +1,76 @@
+"""
+Plan regression for /api/view/search without a database: the SQL and
+parameters of every filter combination, and the migration index each one
+relies on (bench/search_plans.py EXPLAINs the same statements on real data).
+"""
+import itertools
+
+import pytest
+
+from dgps_data import keyset, report_search
+from schema import indexes
+
+TEAM = [100000, 100001, 100020]
+SAMPLE = {"employee": [100000, 100020], "site_id": [17], "drone_id": [5, 6], "from": "2024-01-01", "to": "2024-03-31"}
+
+
+def combos():
+    keys = list(SAMPLE)
+    for n in range(len(keys) + 1):
+        for chosen in itertools.combinations(keys, n):
+            filters = {"employee": [], "site_id": [], "drone_id": [], "from": None, "to": None}
+            for k in chosen:
+                filters[k] = SAMPLE[k]
+            yield "+".join(chosen) or "team", filters
+
+
+def expected_index(filters):
+    """(index, columns its range covers) the optimizer should pick for reports r."""
+    if filters["site_id"]:
+        return "idx_reports_emp_site_date", ["employee_telegram_id", "site_id"]
+    if filters["drone_id"]:
+        return "idx_reports_emp_drone_date", ["employee_telegram_id", "drone_id"]
+    return "uq_emp_date", ["employee_telegram_id"]
+
+
+CASES = list(combos())
+
+
+@pytest.mark.parametrize("label,filters", CASES, ids=[c[0] for c in CASES])
+def test_where_and_params(label, filters):
+    where, params = report_search.where(filters, TEAM)
+    assert where.startswith("r.employee_telegram_id IN (")
+    assert where.count("%s") == len(params)
+    emps = filters["employee"] or TEAM
+    assert params[:len(emps)] == sorted(emps)
+    for key in ("site_id", "drone_id"):
+        if filters[key]:
+            assert f"r.{key} IN ({','.join(['%s'] * len(filters[key]))})" in where
+    assert ("r.report_date >= %s" in where) == bool(filters["from"])
+    assert ("r.report_date <= %s" in where) == bool(filters["to"])
+
+    after_sql, after_params = keyset.after("2024-02-01.42", desc=True)
+    page = report_search.page_sql(where, after_sql)
+    assert page.count("%s") == len(params) + len(after_params) + 1  # + LIMIT
+    assert page.endswith(f"ORDER BY {keyset.order(desc=True)} LIMIT %s")
+    assert report_search.facet_sql(where).count("%s") == len(params)
+
+
+@pytest.mark.parametrize("label,filters", CASES, ids=[c[0] for c in CASES])
+def test_index_covers_the_predicates(label, filters):
+    name, lead = expected_index(filters)
+    cols = indexes().get(("reports", name))
+    assert cols, f"{name} is not declared by any migration"
+    # equality / IN columns first, then report_date for the range and the keyset ORDER BY
+    assert cols[:len(lead)] == lead
+    assert cols[len(lead)] == "report_date"
+    where, _ = report_search.where(filters, TEAM)
+    for col in lead:
+        assert f"r.{col} IN (" in where
+
+
+def test_employees_outside_the_team_are_dropped():
+    filters = dict(next(f for _, f in CASES if not f["employee"]), employee=[100000, 999])
+    where, params = report_search.where(filters, TEAM)
+    assert params == [100000]
+    assert report_search.where(dict(filters, employee=[999]), TEAM) == ("1 = 0", [])
@@ -0,0 +1,21 @@
+"""LIKE prefix escaping shared by the file-name search and /api/lookup."""
+import pytest
+
+from dgps_data import text_search
+
+
+@pytest.mark.parametrize("q,pattern", [
+    ("R2024", "R2024%"),
+    ("H1_R2", "H1\\_R2%"),
+    ("50%", "50\\%%"),
+    ("a\\_b", "a\\\\\\_b%"),  # a literal backslash stays literal and does not escape the _
+    ("x\\", "x\\\\%"),        # a trailing backslash does not escape the wildcard
+])
+def test_like_prefix(q, pattern):
+    assert text_search.like_prefix(q) == pattern
+
+
+def test_file_prefix_needs_min_chars():
+    with pytest.raises(text_search.SearchError):
+        text_search.file_prefix("a")
+    assert text_search.file_prefix(" R_1 ") == "R\\_1%"
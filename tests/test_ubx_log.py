@@ -0,0 +1,52 @@
+"""scan_frames on hand-built logs: overlapping candidates and checksums."""
+import numpy as np
+
+import ubx_log
+
+
+def _offsets(data, window=ubx_log.SCAN_WINDOW):
+    buf = np.frombuffer(bytes(data), dtype=np.uint8)
+    return [int(o) for batch in ubx_log.scan_frames(buf, window) for o in batch[0]]
+
+
+def _ck(body):
+    a = b = 0
+    for x in body:
+        a = (a + x) & 0xFF
+        b = (b + a) & 0xFF
+    return bytes([a, b])
+
+
+def test_back_to_back_frames():
+    a = ubx_log._frame(0x01, 0x02, b"abcd")
+    b = ubx_log._frame(0x02, 0x15, bytes(40))
+    assert _offsets(a + b + a) == [0, len(a), len(a) + len(b)]
+
+
+def test_frame_inside_a_payload_is_dropped():
+    inner = ubx_log._frame(0x05, 0x01, b"xy")
+    outer = ubx_log._frame(0x02, 0x15, bytes(2) + inner + bytes(2))
+    assert _offsets(outer) == [0]
+
+
+def test_frame_overlapping_only_a_dropped_candidate_is_kept():
+    # A valid candidate starts near the end of frame a's payload and runs into
+    # frame c; it is dropped (it overlaps a), so it must not drop c as well.
+    lb = 3 + 2 + ubx_log.HEADER_LEN + 4
+    a = ubx_log._frame(0x02, 0x15, bytes(8) + bytes([ubx_log.SYNC_1, ubx_log.SYNC_2, 0x03, 0x04, lb, 0]) + b"kkk")
+    c_head = bytes([ubx_log.SYNC_1, ubx_log.SYNC_2, 0x0A, 0x04, 8, 0])
+    ck_b = _ck(bytes([0x03, 0x04, lb, 0]) + b"kkk" + a[-2:] + c_head + b"mmmm")
+    c = ubx_log._frame(0x0A, 0x04, b"mmmm" + ck_b + b"zz")
+    b_at = len(a) - 2 - 3 - ubx_log.HEADER_LEN
+    assert _offsets((a + c)[b_at:]) == [0]  # the candidate is valid on its own
+    assert _offsets(a + c) == [0, len(a)]
+
+
+def test_checksums_across_windows():
+    rng = np.random.default_rng(7)
+    frames = [ubx_log._frame(1, 2, bytes(rng.integers(0, 256, int(n), dtype=np.uint8)))
+              for n in rng.integers(0, 600, 50)]
+    data = bytearray(b"".join(frames))
+    data[len(frames[0]) + len(frames[1]) - 1] ^= 0xFF  # CK_B of frame 1
+    starts = np.cumsum([0] + [len(f) for f in frames[:-1]])
+    assert _offsets(data, window=1024) == [int(s) for i, s in enumerate(starts) if i != 1]
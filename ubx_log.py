@@ -0,0 +1,336 @@
+# ubx_log.py
+"""
+u-blox UBX rover log scanner.
+
+The log is memory-mapped and scanned window by window: sync bytes (0xB5 0x62)
+are located with NumPy, candidate frames are checksum-verified in bulk (from
+running byte sums) and every NAV-PVT payload is decoded in one structured view.
+No Python loop ever walks the file byte by byte.
+
+    python ubx_log.py <file.ubx> [...]     # print a summary per log
+    python ubx_log.py --bench 256          # synthesize a 256 MB log and report MB/s
+"""
+import os
+import sys
+import time
+import json
+import logging
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger("ubx_log")
+
+# ----------------- UBX constants -----------------
+SYNC_1 = 0xB5
+SYNC_2 = 0x62
+HEADER_LEN = 6          # sync(2) + class(1) + id(1) + length(2)
+FRAME_OVERHEAD = 8      # header + checksum(2)
+MAX_PAYLOAD = 8192      # anything longer is a false sync inside binary data
+
+NAV_PVT_CLASS = 0x01
+NAV_PVT_ID = 0x07
+NAV_PVT_LEN = 92
+
+# Window size for the vectorized scan. The temporaries are the checksum's two
+# running sums (2 bytes per scanned byte, ~16 MB for 8 MB) plus a few int64
+# arrays per sync candidate, whatever the size of the log.
+SCAN_WINDOW = int(os.getenv("UBX_SCAN_WINDOW_MB", "8")) * 1024 * 1024
+
+# An epoch interval larger than GAP_FACTOR x the median interval counts as a gap.
+GAP_FACTOR = 2.5
+
+FIX_TYPES = {
+    0: "no_fix",
+    1: "dead_reckoning",
+    2: "2d",
+    3: "3d",
+    4: "gnss_dr",
+    5: "time_only",
+}
+
+# NAV-PVT payload (UBX protocol spec, 92 bytes, little endian)
+PVT_DTYPE = np.dtype([
+    ("iTOW", "<u4"),
+    ("year", "<u2"), ("month", "u1"), ("day", "u1"),
+    ("hour", "u1"), ("min", "u1"), ("sec", "u1"), ("valid", "u1"),
+    ("tAcc", "<u4"), ("nano", "<i4"),
+    ("fixType", "u1"), ("flags", "u1"), ("flags2", "u1"), ("numSV", "u1"),
+    ("lon", "<i4"), ("lat", "<i4"), ("height", "<i4"), ("hMSL", "<i4"),
+    ("hAcc", "<u4"), ("vAcc", "<u4"),
+    ("_rest", "V44"),
+])
+assert PVT_DTYPE.itemsize == NAV_PVT_LEN
+
+VALID_DATE_TIME = 0x03  # validDate | validTime bits of NAV-PVT.valid
+
+
+# ----------------- Low-level scanning -----------------
+def open_log(path):
+    """Memory-map a log file read-only as a uint8 array (empty array for empty files)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _checksum_ok(buf, starts, lengths):
+    """
+    Fletcher-8 check of every candidate frame (sorted starts) at once, from two
+    running sums over the span the frames cover.
+    """
+    lo = int(starts[0]) + 2
+    end = starts + HEADER_LEN + lengths  # one past the body: class, id, length(2), payload
+    # s1[k] = sum(b[lo:lo + k]), s2[k] = s1[1] + ... + s1[k]. For a body b[p:q]
+    # CK_A = s1[q] - s1[p] and CK_B = s2[q] - s2[p] - (q - p) * s1[p]; only the
+    # low byte matters, so uint8 wrap-around is exact.
+    s1 = np.zeros(int(end.max()) - lo + 1, dtype=np.uint8)
+    np.cumsum(buf[lo:lo + len(s1) - 1], dtype=np.uint8, out=s1[1:])
+    s2 = np.zeros_like(s1)
+    np.cumsum(s1[1:], dtype=np.uint8, out=s2[1:])
+    p, q = starts + 2 - lo, end - lo
+    ck_a = s1[q] - s1[p]
+    ck_b = s2[q] - s2[p] - (lengths + 4).astype(np.uint8) * s1[p]
+    return (ck_a == buf[end]) & (ck_b == buf[end + 1])
+
+
+def scan_frames(buf, window=SCAN_WINDOW):
+    """
+    Yield (offsets, msg_class, msg_id, payload_len) arrays for every valid frame,
+    one batch per scan window. Offsets point at the first sync byte.
+    """
+    size = len(buf)
+    last_end = 0
+    for start in range(0, size, window):
+        stop = min(start + window, size)
+        win = buf[start:min(stop + 1, size)]
+        if len(win) < 2:
+            break
+        hits = np.flatnonzero((win[:-1] == SYNC_1) & (win[1:] == SYNC_2)).astype(np.int64) + start
+        hits = hits[hits + FRAME_OVERHEAD <= size]
+        if not len(hits):
+            continue
+
+        lengths = buf[hits + 4].astype(np.int64) | (buf[hits + 5].astype(np.int64) << 8)
+        plausible = (lengths <= MAX_PAYLOAD) & (hits + FRAME_OVERHEAD + lengths <= size)
+        hits, lengths = hits[plausible], lengths[plausible]
+
+        if not len(hits):
+            continue
+        valid = _checksum_ok(buf, hits, lengths)
+        hits, lengths = hits[valid], lengths[valid]
+        if not len(hits):
+            continue
+
+        # A sync pair inside an accepted frame's payload that also happens to pass
+        # the checksum is dropped: frames must not overlap. A candidate clear of
+        # every earlier candidate is kept outright; the few that overlap one are
+        # settled in order against the end of the frames actually kept, so a
+        # frame is not lost for overlapping a candidate that was itself dropped.
+        ends = hits + FRAME_OVERHEAD + lengths
+        keep = hits >= np.maximum.accumulate(np.concatenate(([last_end], ends[:-1])))
+        contested = np.flatnonzero(~keep)
+        if len(contested):
+            sure_end = np.maximum.accumulate(np.concatenate(([last_end], np.where(keep, ends, 0)[:-1])))
+            end = last_end
+            for i in contested:
+                if hits[i] >= max(end, int(sure_end[i])):
+                    keep[i] = True
+                    end = int(ends[i])
+        hits, lengths, ends = hits[keep], lengths[keep], ends[keep]
+        if not len(hits):
+            continue
+        last_end = max(last_end, int(ends.max()))
+
+        yield hits, buf[hits + 2], buf[hits + 3], lengths
+
+
+def _decode_pvt(buf, offsets):
+    """Decode NAV-PVT payloads at the given frame offsets into a structured array."""
+    if not len(offsets):
+        return np.zeros(0, dtype=PVT_DTYPE)
+    idx = offsets[:, None] + HEADER_LEN + np.arange(NAV_PVT_LEN)
+    raw = np.ascontiguousarray(buf[idx])
+    return raw.view(PVT_DTYPE).reshape(-1)
+
+
+def _epoch_ms(pvt):
+    """UTC epoch milliseconds from NAV-PVT date/time fields (vectorized civil-to-days)."""
+    y = pvt["year"].astype(np.int64)
+    m = pvt["month"].astype(np.int64)
+    d = pvt["day"].astype(np.int64)
+    y = y - (m <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    doy = (153 * ((m + 9) % 12) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+    secs = ((days * 24 + pvt["hour"]) * 60 + pvt["min"]) * 60 + pvt["sec"]
+    return secs * 1000 + np.floor_divide(pvt["nano"].astype(np.int64), 1_000_000)
+
+
+def read_nav_pvt(buf, window=SCAN_WINDOW):
+    """Yield decoded NAV-PVT batches (structured arrays) from a mapped log."""
+    for offsets, cls, mid, lengths in scan_frames(buf, window):
+        sel = (cls == NAV_PVT_CLASS) & (mid == NAV_PVT_ID) & (lengths == NAV_PVT_LEN)
+        if sel.any():
+            yield _decode_pvt(buf, offsets[sel])
+
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")[:-4] + "Z"
+
+
+# ----------------- Summary -----------------
+def summarize(path, window=SCAN_WINDOW):
+    """
+    Scan a rover log and return a dict with frame counts, first/last GNSS epoch,
+    epoch count, fix-type distribution, gaps and the derived flight time.
+    """
+    t0 = time.perf_counter()
+    buf = open_log(path)
+    size = len(buf)
+
+    frames = 0
+    framed_bytes = 0
+    epoch_batches = []
+    fix_counts = np.zeros(256, dtype=np.int64)
+    for offsets, cls, mid, lengths in scan_frames(buf, window):
+        frames += len(offsets)
+        framed_bytes += int((lengths + FRAME_OVERHEAD).sum())
+        sel = (cls == NAV_PVT_CLASS) & (mid == NAV_PVT_ID) & (lengths == NAV_PVT_LEN)
+        if not sel.any():
+            continue
+        pvt = _decode_pvt(buf, offsets[sel])
+        pvt = pvt[(pvt["valid"] & VALID_DATE_TIME) == VALID_DATE_TIME]
+        if len(pvt):
+            fix_counts += np.bincount(pvt["fixType"], minlength=256)
+            epoch_batches.append(_epoch_ms(pvt))
+
+    epochs = np.concatenate(epoch_batches) if epoch_batches else np.zeros(0, dtype=np.int64)
+    # Sorted and de-duplicated: a log stitched from several sessions may repeat epochs.
+    epochs = np.unique(epochs)
+
+    summary = {
+        "file": os.path.basename(path),
+        "bytes": size,
+        "frames": frames,
+        "unframed_bytes": size - framed_bytes,
+        "epochs": int(len(epochs)),
+        "first_epoch": None,
+        "last_epoch": None,
+        "duration_s": 0.0,
+        "flight_time_min": 0,
+        "rate_hz": None,
+        "fix_types": {FIX_TYPES.get(i, str(i)): int(c) for i, c in enumerate(fix_counts) if c},
+        "gaps": [],
+        "gap_total_s": 0.0,
+    }
+
+    if len(epochs):
+        first, last = int(epochs[0]), int(epochs[-1])
+        duration_s = (last - first) / 1000.0
+        summary.update({
+            "first_epoch": _iso(first),
+            "last_epoch": _iso(last),
+            "duration_s": round(duration_s, 3),
+            "flight_time_min": max(1, int(round(duration_s / 60.0))) if duration_s > 0 else 0,
+        })
+    if len(epochs) > 2:
+        steps = np.diff(epochs)
+        median = float(np.median(steps))
+        if median > 0:
+            summary["rate_hz"] = round(1000.0 / median, 2)
+            where = np.flatnonzero(steps > GAP_FACTOR * median)
+            summary["gaps"] = [
+                {"start": _iso(int(epochs[i])), "end": _iso(int(epochs[i + 1])),
+                 "seconds": round(float(steps[i]) / 1000.0, 3)}
+                for i in where
+            ]
+            summary["gap_total_s"] = round(float(steps[where].sum()) / 1000.0, 3)
+
+    elapsed = time.perf_counter() - t0
+    summary["scan_s"] = round(elapsed, 4)
+    summary["mb_per_s"] = round(size / 1e6 / elapsed, 1) if elapsed > 0 else None
+    return summary
+
+
+def check_flight_time(summary, flight_time_min, tolerance_min=2):
+    """
+    Compare a typed flight time against a log summary.
+    Returns None when they agree (or the log has no epochs), else a message.
+    """
+    derived = summary.get("flight_time_min") or 0
+    if not derived:
+        return None
+    if abs(float(flight_time_min) - derived) > tolerance_min:
+        return (f"Entered flight time {flight_time_min} min does not match the rover log "
+                f"({derived} min from {summary['first_epoch']} to {summary['last_epoch']}).")
+    return None
+
+
+# ----------------- Benchmark -----------------
+def _frame(cls, mid, payload):
+    body = bytes([cls, mid, len(payload) & 0xFF, len(payload) >> 8]) + payload
+    arr = np.frombuffer(body, dtype=np.uint8).astype(np.uint32)
+    ck_a = int(arr.sum()) & 0xFF
+    ck_b = int(arr @ np.arange(len(arr), 0, -1, dtype=np.uint32)) & 0xFF
+    return bytes([SYNC_1, SYNC_2]) + body + bytes([ck_a, ck_b])
+
+
+def _synthetic_chunk(start_ms, epochs, rate_hz=5):
+    """A run of NAV-PVT epochs at rate_hz, each followed by a RXM-RAWX-sized frame."""
+    out = bytearray()
+    step = 1000 // rate_hz
+    rng = np.random.default_rng(start_ms & 0xFFFF)
+    rawx = _frame(0x02, 0x15, bytes(rng.integers(0, 256, 16 + 32 * 20, dtype=np.uint8)))
+    for i in range(epochs):
+        ms = start_ms + i * step
+        dt = datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
+        rec = np.zeros(1, dtype=PVT_DTYPE)
+        rec["iTOW"] = ms % (7 * 86400 * 1000)
+        rec["year"], rec["month"], rec["day"] = dt.year, dt.month, dt.day
+        rec["hour"], rec["min"], rec["sec"] = dt.hour, dt.minute, dt.second
+        rec["nano"] = (ms % 1000) * 1_000_000
+        rec["valid"] = 0x07
+        rec["fixType"] = 3
+        rec["numSV"] = 18
+        out += _frame(NAV_PVT_CLASS, NAV_PVT_ID, rec.tobytes())
+        out += rawx
+    return bytes(out)
+
+
+def bench(size_mb=256):
+    """Write a synthetic log of roughly size_mb and report scan throughput."""
+    base_ms = 1_700_000_000_000
+    block = _synthetic_chunk(base_ms, 300)  # one minute at 5 Hz
+    per_block_ms = 60_000
+    reps = max(1, int(size_mb * 1024 * 1024 // len(block)))
+    fd, path = tempfile.mkstemp(suffix=".ubx")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for r in range(reps):
+                if r:
+                    block = _synthetic_chunk(base_ms + r * per_block_ms, 300)
+                fh.write(block)
+                fh.write(b"\xb5\x62\xff\xff junk")  # truncated frame between sessions
+        # Warm the page cache, then measure.
+        summarize(path)
+        s = summarize(path)
+        print(json.dumps({k: s[k] for k in ("bytes", "frames", "epochs", "scan_s", "mb_per_s")}, indent=2))
+        return s
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    if args[0] == "--bench":
+        bench(int(args[1]) if len(args) > 1 else 256)
+        sys.exit(0)
+    for p in args:
+        print(json.dumps(summarize(p), indent=2))